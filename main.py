@@ -1,8 +1,24 @@
+import argparse
+
 from utils.board import Board
 from utils.engine import Engine
+from utils.players import make_player
+from utils.profiling import CAPTURES, Profiler
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    # IA optionnelle en argument, ex: python main.py mcts:time=2
+    parser.add_argument('player', nargs='?', default=None)
+    parser.add_argument('--profile', metavar='PATH', help="rapport de "
+                        "performance par tour (.json ou .csv)")
+    parser.add_argument('--capture', choices=CAPTURES, default=None)
+    parser.add_argument('--ponder', action='store_true', help="l'IA "
+                        "réfléchit pendant le tour du joueur et classe les "
+                        "indices")
+    args = parser.parse_args()
+    ai = make_player(args.player) if args.player else None
+
     size = input("Entrez la taille du plateau (inf à 26 et pair): ")
     while not size.isdigit() \
             or int(size) < 4 or int(size) > 26 \
@@ -20,7 +36,12 @@ if __name__ == '__main__':
     board = Board(width, height)
     board.make_board()
 
-    engine = Engine(board, players)
+    engine = Engine(board, players, ai, args.ponder)
+    profiler = None
+    if args.profile:
+        profiler = Profiler(args.capture)
+        profiler.attach(engine)
+        profiler.start()
     engine.start()
 
     try:
@@ -28,3 +49,7 @@ if __name__ == '__main__':
             engine.get_action()
     except (KeyboardInterrupt, EOFError):
         engine.stop()
+    finally:
+        if profiler is not None:
+            profiler.stop()
+            profiler.write(args.profile)
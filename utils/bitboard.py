@@ -0,0 +1,189 @@
+"""Opérations sur les bitboards (un entier Python par joueur).
+
+La case ``(row, col)`` correspond au bit ``row * width + col``. Un plateau
+8x8 tient dans un mot de 64 bits, les plus grands (jusqu'à 26x26) utilisent
+simplement des entiers Python plus longs, avec les mêmes opérations.
+"""
+from typing import Iterator, List, Tuple
+
+
+if hasattr(int, 'bit_count'):
+    popcount = int.bit_count
+else:  # Python < 3.10
+    def popcount(bits: int) -> int:
+        return bin(bits).count('1')
+
+
+DIRECTIONS = [
+    (-1, -1), (0, -1), (1, -1),
+    (-1, 0), (1, 0),
+    (-1, 1), (0, 1), (1, 1)]
+
+
+class Geometry:
+    """Masques et décalages pré-calculés pour une taille de plateau"""
+    __slots__ = ('width', 'height', 'size', 'full', 'shifts', 'neighbours',
+                 'lines')
+
+    def __init__(self, width: int, height: int):
+        self.width: int = width
+        self.height: int = height
+        self.size: int = width * height
+        self.full: int = (1 << self.size) - 1
+
+        first_col = last_col = 0
+        for row in range(height):
+            first_col |= 1 << (row * width)
+            last_col |= 1 << (row * width + width - 1)
+
+        # (décalage, masque) pour chaque direction : le masque retire les
+        # bits qui ont débordé d'un bord à l'autre de la ligne
+        self.shifts: List[Tuple[int, int]] = []
+        for d_row, d_col in DIRECTIONS:
+            mask = self.full
+            if d_col == 1:
+                mask &= ~first_col
+            elif d_col == -1:
+                mask &= ~last_col
+            self.shifts.append((d_row * width + d_col, mask))
+
+        # cases voisines et cases alignées (les 8 rayons) de chaque case
+        self.neighbours: List[int] = []
+        self.lines: List[int] = []
+        for row in range(height):
+            for col in range(width):
+                neighbours = lines = 0
+                for d_row, d_col in DIRECTIONS:
+                    i, j = row + d_row, col + d_col
+                    if 0 <= i < height and 0 <= j < width:
+                        neighbours |= 1 << (i * width + j)
+                    while 0 <= i < height and 0 <= j < width:
+                        lines |= 1 << (i * width + j)
+                        i, j = i + d_row, j + d_col
+                self.neighbours.append(neighbours)
+                self.lines.append(lines)
+
+    def index(self, row: int, col: int) -> int:
+        return row * self.width + col
+
+    def pose(self, index: int) -> list:
+        return [index // self.width, index % self.width]
+
+
+_GEOMETRIES: dict = {}
+
+
+def get_geometry(width: int, height: int) -> Geometry:
+    """
+    Retourne la géométrie (partagée) pour une taille de plateau
+
+    :param int width: Board width
+    :param int height: Board height
+    :return: Geometry
+    """
+    geometry = _GEOMETRIES.get((width, height))
+    if geometry is None:
+        geometry = _GEOMETRIES[(width, height)] = Geometry(width, height)
+    return geometry
+
+
+def legal_moves(geometry: Geometry, own: int, opp: int) -> int:
+    """
+    Calcule les coups légaux de `own` par propagation dans les 8 directions
+
+    :param Geometry geometry: Board geometry
+    :param int own: Bitboard of the player to move
+    :param int opp: Bitboard of the opponent
+    :return: int - Bitboard of the legal moves
+    """
+    empty = geometry.full & ~(own | opp)
+    moves = 0
+    for shift, mask in geometry.shifts:
+        through = opp & mask
+        if shift > 0:
+            run = (own << shift) & through
+            while run:
+                step = (run << shift) & mask
+                moves |= step & empty
+                run = step & through
+        else:
+            shift = -shift
+            run = (own >> shift) & through
+            while run:
+                step = (run >> shift) & mask
+                moves |= step & empty
+                run = step & through
+    return moves
+
+
+def flips(geometry: Geometry, own: int, opp: int, index: int) -> int:
+    """
+    Calcule les pions retournés si `own` joue sur la case `index`
+
+    :param Geometry geometry: Board geometry
+    :param int own: Bitboard of the player to move
+    :param int opp: Bitboard of the opponent
+    :param int index: Square index where the pawn is placed
+    :return: int - Bitboard of the flipped pawns
+    """
+    bit = 1 << index
+    flipped = 0
+    for shift, mask in geometry.shifts:
+        line = 0
+        if shift > 0:
+            step = (bit << shift) & mask
+            while step & opp:
+                line |= step
+                step = (step << shift) & mask
+        else:
+            shift = -shift
+            step = (bit >> shift) & mask
+            while step & opp:
+                line |= step
+                step = (step >> shift) & mask
+        if step & own:
+            flipped |= line
+    return flipped
+
+
+def is_legal(geometry: Geometry, own: int, opp: int, index: int) -> bool:
+    """
+    Retourne True si `own` peut jouer sur la case vide `index`
+
+    :param Geometry geometry: Board geometry
+    :param int own: Bitboard of the player to move
+    :param int opp: Bitboard of the opponent
+    :param int index: Empty square index to check
+    :return: bool
+    """
+    bit = 1 << index
+    for shift, mask in geometry.shifts:
+        if shift > 0:
+            step = (bit << shift) & mask
+            if not step & opp:
+                continue
+            while step & opp:
+                step = (step << shift) & mask
+        else:
+            shift = -shift
+            step = (bit >> shift) & mask
+            if not step & opp:
+                continue
+            while step & opp:
+                step = (step >> shift) & mask
+        if step & own:
+            return True
+    return False
+
+
+def iter_bits(bits: int) -> Iterator[int]:
+    """
+    Parcours les index des bits à 1
+
+    :param int bits: Bitboard
+    :return: Iterator[int] - Indexes of the set bits, lowest first
+    """
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
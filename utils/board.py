@@ -1,22 +1,82 @@
 import string
 from typing import Union
 
+from .bitboard import DIRECTIONS, flips, get_geometry, is_legal, \
+    iter_bits, legal_moves, popcount
 from .pawn import Pawn
+from .zobrist import get_keys
+from . import vector
 
 
 class Board:
-    __slots__ = ('width', 'height', 'grid', 'hints')
+    """Plateau de jeu stocké sous forme de bitboards
 
-    DIRECTIONS = [
-        (-1, -1), (0, -1), (1, -1),
-        (-1, 0), (1, 0),
-        (-1, 1), (0, 1), (1, 1)]
+    **Bitboards**:
+        - bits[0] = pions du joueur X
+        - bits[1] = pions du joueur O
+        - valid = coups possibles du joueur `turn`
+
+    Le nombre de pions, la frontière (cases vides voisines d'un pion), les
+    coups possibles de chaque joueur et le hash de Zobrist sont tenus à jour
+    par `make_move`, qui empile dans `stack` de quoi annuler le coup avec
+    `unmake_move`.
+
+    **Backends** (génération des coups possibles):
+        - bitboard = décalages et masques sur des entiers Python
+        - numpy = tableaux NumPy, si le module est installé (sinon bitboard)
+    """
+    __slots__ = ('width', 'height', 'hints', 'geometry', 'bits', 'valid',
+                 'turn', 'counts', 'frontier', 'moves', 'keys', 'hash',
+                 'stack', 'backend')
+
+    BACKENDS = ('bitboard', 'numpy')
+
+    # entiers empilés par coup : case, pions retournés, frontière,
+    # coups possibles de X et de O, hash, coups affichés
+    FRAME_SIZE = 7
+
+    DIRECTIONS = DIRECTIONS
+    PLAYERS = ('x', 'o')
+
+    def __init__(self, width: int, height: int, backend: str = 'bitboard'):
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unknown backend: {backend}")
 
-    def __init__(self, width: int, height: int):
         self.width: int = width
         self.height: int = height
-        self.grid: list = []
         self.hints: bool = False
+        self.backend: str = backend if vector.np is not None else 'bitboard'
+
+        self.geometry = get_geometry(width, height)
+        self.bits: list = [0, 0]
+        self.valid: int = 0
+        self.turn: Union[str, None] = None
+
+        self.counts: list = [0, 0]
+        self.frontier: int = 0
+        self.moves: list = [0, 0]
+
+        self.keys = get_keys(self.geometry)
+        self.hash: int = 0
+        self.stack: list = []
+
+    def copy(self) -> 'Board':
+        """
+        Retourne une copie indépendante du plateau (sans l'historique des
+        coups)
+
+        :return: Board
+        """
+        board = Board(self.width, self.height, self.backend)
+        board.hints = self.hints
+        board.bits = list(self.bits)
+        board.valid = self.valid
+        board.turn = self.turn
+        board.counts = list(self.counts)
+        board.frontier = self.frontier
+        board.moves = list(self.moves)
+        board.hash = self.hash
+        return board
 
     def make_board(self) -> None:
         """
@@ -24,73 +84,111 @@ class Board:
 
         :return: None
         """
-        self.grid = [
-            [Pawn('.') for _ in range(self.width)]
-            for _ in range(self.height)
-        ]
-
         middle_inf, middle_sup = int((self.width / 2) - 1), int(self.width / 2)
+        index = self.geometry.index
 
-        self.grid[middle_inf][middle_inf] = Pawn('x')
-        self.grid[middle_inf][middle_sup] = Pawn('o')
-        self.grid[middle_sup][middle_inf] = Pawn('o')
-        self.grid[middle_sup][middle_sup] = Pawn('x')
+        self.bits = [
+            (1 << index(middle_inf, middle_inf))
+            | (1 << index(middle_sup, middle_sup)),
+            (1 << index(middle_inf, middle_sup))
+            | (1 << index(middle_sup, middle_inf))
+        ]
+        self.valid = 0
+        self.turn = None
+        self.stack = []
+        self.refresh()
 
-    def set_valid_poses(self, player: str) -> bool:
+    def refresh(self) -> None:
         """
-        Définie les positions valides et retourne True s'il y en a
+        Recalcule entièrement les compteurs, la frontière et les coups
+        possibles à partir des bitboards
 
-        :param str player: Player who need positions
-        :return: bool - True if there is/are valid position(s)
+        :return: None
         """
-        adv = 'x' if player == 'o' else 'o'
+        geometry = self.geometry
+        occupied = self.bits[0] | self.bits[1]
 
-        for i, row in enumerate(self.grid):
-            for j, pawn in enumerate(row):
-                if pawn.status == 'p':
-                    self.grid[i][j] = Pawn('.')
+        frontier = 0
+        for index in iter_bits(occupied):
+            frontier |= geometry.neighbours[index]
 
-        valid = False
-        for i, row in enumerate(self.grid):
-            for j, pawn in enumerate(row):
-                if self.grid[i][j].status == adv:
-                    for direction in self.DIRECTIONS:
-                        vector = [i + direction[0], j + direction[1]]
-                        opposite_vector = [i - direction[0], j - direction[1]]
-                        if self.is_on_board(vector) and self.is_on_board(opposite_vector):
-                            if self.grid[vector[0]][vector[1]].status == '.':
-                                if self.grid[opposite_vector[0]][opposite_vector[1]].status == player:
-                                    self.grid[vector[0]][vector[1]] = Pawn('p')
-                                    valid = True
-                                elif self.grid[opposite_vector[0]][opposite_vector[1]].status == adv:
-                                    if self.browse_vector(opposite_vector, direction, player):
-                                        self.grid[vector[0]][vector[1]] = Pawn('p')
-                                        valid = True
-        return valid
-
-    def get_valid_poses(self):
-        poses = []
-        for i, row in enumerate(self.grid):
-            for j, pawn in enumerate(row):
-                if pawn.status == 'p':
-                    poses.append([i, j])
-        return poses
+        self.counts = [popcount(self.bits[0]), popcount(self.bits[1])]
+        self.frontier = frontier & ~occupied
+        self.moves = self.compute_moves()
+        self.hash = self.keys.hash(self.bits[0], self.bits[1])
 
-    def browse_vector(self, pose: list, vector: tuple, player: str) -> bool:
+    def compute_moves(self) -> list:
         """
-        Parcours le tableau en partant de `pose` et en suivant le `vector`
-        pour voir s'il y a un piont de `player` dans cette direction
+        Calcule entièrement les coups possibles des deux joueurs
 
-        :param list pose: Start position
-        :param tuple vector: Vector to follow
-        :param str player: Player to search
-        :return: bool - True if there is a same player pawn
+        :return: list - Legal moves bitboards of X and O
         """
-        while self.is_on_board([pose[0] - vector[0], pose[1] - vector[1]]) and self.grid[pose[0]][pose[1]].status != '.':
-            pose = [pose[0] - vector[0], pose[1] - vector[1]]
-            if self.grid[pose[0]][pose[1]].status == player:
-                return True
-        return False
+        x_bits, o_bits = self.bits
+        if self.backend == 'numpy':
+            x_array = vector.to_array(self.geometry, x_bits)
+            o_array = vector.to_array(self.geometry, o_bits)
+            moves = vector.legal_moves(vector.np.stack([x_array, o_array]),
+                                       vector.np.stack([o_array, x_array]))
+            return [vector.to_bits(moves[0]), vector.to_bits(moves[1])]
+        return [legal_moves(self.geometry, x_bits, o_bits),
+                legal_moves(self.geometry, o_bits, x_bits)]
+
+    def update(self, index: int, flipped: int) -> None:
+        """
+        Met à jour les compteurs, la frontière et les coups possibles après
+        la pose en `index` : seules les cases alignées avec une case modifiée
+        peuvent changer de statut
+
+        :param int index: Square index where the pawn was placed
+        :param int flipped: Bitboard of the flipped pawns
+        :return: None
+        """
+        geometry = self.geometry
+        bit = 1 << index
+        own = 0 if self.bits[0] & bit else 1
+        flipped_count = popcount(flipped)
+
+        self.counts[own] += 1 + flipped_count
+        self.counts[1 - own] -= flipped_count
+
+        self.hash ^= self.keys.squares[own][index] \
+            ^ self.keys.flip_hash(flipped)
+
+        self.frontier = (self.frontier | geometry.neighbours[index]) \
+            & ~(self.bits[0] | self.bits[1])
+
+        if self.backend == 'numpy':
+            # recalcul complet, en un seul appel pour les deux joueurs
+            self.moves = self.compute_moves()
+            return
+
+        lines = geometry.lines
+        affected = lines[index]
+        for square in iter_bits(flipped):
+            affected |= lines[square]
+        candidates = affected & self.frontier
+
+        for player in (0, 1):
+            player_bits, adv_bits = self.bits[player], self.bits[1 - player]
+            moves = self.moves[player] & ~(affected | bit)
+            for square in iter_bits(candidates):
+                if is_legal(geometry, player_bits, adv_bits, square):
+                    moves |= 1 << square
+            self.moves[player] = moves
+
+    def set_valid_poses(self, player: str) -> bool:
+        """
+        Définie les positions valides et retourne True s'il y en a
+
+        :param str player: Player who need positions
+        :return: bool - True if there is/are valid position(s)
+        """
+        self.valid = self.moves[self.PLAYERS.index(player)]
+        self.turn = player
+        return self.valid != 0
+
+    def get_valid_poses(self) -> list:
+        return [self.geometry.pose(index) for index in iter_bits(self.valid)]
 
     def is_on_board(self, pose: list) -> bool:
         """
@@ -99,7 +197,7 @@ class Board:
         :param pose: position to check
         :return: bool - True or False if the emplacement is on board or not
         """
-        return 0 <= pose[0] < self.width and 0 <= pose[1] < self.height
+        return 0 <= pose[0] < self.height and 0 <= pose[1] < self.width
 
     def is_valid_move(self, move: str) -> bool:
         """
@@ -110,8 +208,24 @@ class Board:
         """
         pose = self.parser(move)
 
-        return pose and self.is_on_board(pose) and self.grid[pose[0]][
-            pose[1]].status == 'p'
+        return bool(pose) and self.is_on_board(pose) \
+            and bool(self.valid >> self.geometry.index(*pose) & 1)
+
+    def get_status(self, pose: list) -> str:
+        """
+        Retourne le statut de la case ('x', 'o', 'p' ou '.')
+
+        :param list pose: Position to check
+        :return: str
+        """
+        bit = 1 << self.geometry.index(*pose)
+        if self.bits[0] & bit:
+            return 'x'
+        elif self.bits[1] & bit:
+            return 'o'
+        elif self.valid & bit:
+            return 'p'
+        return '.'
 
     def move(self, move: str, player: str, is_parsed: bool) -> list:
         """
@@ -123,28 +237,68 @@ class Board:
         :return: list: Count of new pawns for each player
         """
         pose = self.parser(move) if not is_parsed else move
-        self.grid[pose[0]][pose[1]] = Pawn(player)
-        self.flip(pose, player)
+        self.make_move(self.geometry.index(*pose), player)
         return self.count()
 
-    def flip(self, pose: list, player: str) -> None:
+    def make_move(self, index: int, player: str) -> int:
         """
-        Retourne tous les pions en partant d'une position donnée
+        Pose un pion de `player` sur la case `index`, retourne les pions
+        encadrés et empile de quoi annuler le coup
 
-        :param list pose: Start position
-        :param str player: Player to search
-        :return: None
+        :param int index: Square index where the pawn is placed
+        :param str player: Player to move
+        :return: int - Bitboard of the flipped pawns
+        """
+        own = self.PLAYERS.index(player)
+        bit = 1 << index
+        flipped = flips(self.geometry, self.bits[own], self.bits[1 - own],
+                        index)
+
+        self.stack.extend((index, flipped, self.frontier, self.moves[0],
+                           self.moves[1], self.hash, self.valid))
+
+        self.bits[own] |= flipped | bit
+        self.bits[1 - own] &= ~flipped
+        self.valid &= ~bit
+        self.update(index, flipped)
+        return flipped
+
+    def unmake_move(self) -> int:
+        """
+        Annule le dernier coup joué avec `make_move`
+
+        :return: int - Square index of the cancelled move
+        """
+        stack = self.stack
+        valid = stack.pop()
+        self.hash = stack.pop()
+        self.moves[1] = stack.pop()
+        self.moves[0] = stack.pop()
+        self.frontier = stack.pop()
+        flipped = stack.pop()
+        index = stack.pop()
+
+        own = 0 if self.bits[0] >> index & 1 else 1
+        flipped_count = popcount(flipped)
+        self.bits[own] ^= flipped | (1 << index)
+        self.bits[1 - own] |= flipped
+        self.counts[own] -= 1 + flipped_count
+        self.counts[1 - own] += flipped_count
+        self.valid = valid
+        return index
+
+    @property
+    def ply(self) -> int:
+        return len(self.stack) // self.FRAME_SIZE
+
+    def get_hash(self, player: str) -> int:
+        """
+        Retourne le hash de Zobrist de la position avec `player` au trait
+
+        :param str player: Player to move
+        :return: int - 64 bits hash
         """
-        for direction in self.DIRECTIONS:
-            if self.browse_vector(pose, (0 - direction[0], 0 - direction[1]), player):
-                checked_pose = [pose[0] + direction[0], pose[1] + direction[1]]
-                while self.is_on_board(checked_pose):
-                    if self.grid[checked_pose[0]][checked_pose[1]].status in ['.', player, 'p']:
-                        break
-                    else:
-                        self.grid[checked_pose[0]][checked_pose[1]] = Pawn(player)
-                    checked_pose = [checked_pose[0] + direction[0],
-                                    checked_pose[1] + direction[1]]
+        return self.hash ^ self.keys.side if player == 'o' else self.hash
 
     def count(self) -> list:
         """
@@ -152,16 +306,7 @@ class Board:
 
         :return: list - X's pawns at index 0, O's pawns at index 1
         """
-        pawns = [0, 0]
-
-        for row in self.grid:
-            for pawn in row:
-                if pawn.status == 'x':
-                    pawns[0] += 1
-                elif pawn.status == 'o':
-                    pawns[1] += 1
-
-        return pawns
+        return list(self.counts)
 
     def toggle_hints(self) -> None:
         """
@@ -197,12 +342,56 @@ class Board:
             return [row, col]
         return False
 
+    @staticmethod
+    def notation(pose: list) -> str:
+        """
+        Retourne la saisie utilisateur correspondant à une position
+        (inverse de `parser`)
+
+        :param list pose: Pose in the grid
+        :return: str - Entered pose (ex: D3)
+        """
+        return f"{string.ascii_uppercase[pose[1]]}{pose[0] + 1}"
+
+    def cells(self) -> bytearray:
+        """
+        Retourne le statut de chaque case ('x', 'o', 'p' ou '.') dans un
+        tableau d'octets, ligne par ligne
+
+        :return: bytearray
+        """
+        cells = bytearray(b'.') * self.geometry.size
+        for bits, code in ((self.valid, ord('p')), (self.bits[0], ord('x')),
+                           (self.bits[1], ord('o'))):
+            for index in iter_bits(bits):
+                cells[index] = code
+        return cells
+
+    def to_bytes(self) -> bytes:
+        """
+        Encode la position : bitboard de X puis bitboard de O
+
+        :return: bytes - 2 * ceil(width * height / 8) bytes
+        """
+        length = (self.geometry.size + 7) // 8
+        return self.bits[0].to_bytes(length, 'little') \
+            + self.bits[1].to_bytes(length, 'little')
+
+    def from_bytes(self, data: bytes) -> None:
+        """
+        Charge une position encodée par `to_bytes`
+
+        :param bytes data: Encoded position
+        :return: None
+        """
+        length = (self.geometry.size + 7) // 8
+        self.load_bits(int.from_bytes(data[:length], 'little'),
+                       int.from_bytes(data[length:2 * length], 'little'))
+
     def export(self) -> dict:
-        grid = []
-        for i, row in enumerate(self.grid):
-            grid.append([])
-            for pawn in row:
-                grid[i].append(pawn.status)
+        cells = self.cells().decode()
+        grid = [list(cells[i * self.width:(i + 1) * self.width])
+                for i in range(self.height)]
 
         return {
             'grid': grid
@@ -210,24 +399,70 @@ class Board:
 
     def load(self, data: dict) -> None:
         grid = data.get('grid')
+        bits = [0, 0]
+        valid = 0
 
         for i, row in enumerate(grid):
             for j, pawn in enumerate(row):
-                self.grid[i][j] = Pawn(pawn)
+                bit = 1 << self.geometry.index(i, j)
+                if pawn == 'x':
+                    bits[0] |= bit
+                elif pawn == 'o':
+                    bits[1] |= bit
+                elif pawn == 'p':
+                    valid |= bit
+
+        self.bits = bits
+        self.valid = valid
+        self.stack = []
+        self.refresh()
+
+    def load_bits(self, x_bits: int, o_bits: int) -> None:
+        """
+        Charge une position à partir des bitboards des deux joueurs
 
-    def __str__(self):
+        :param int x_bits: Bitboard of X
+        :param int o_bits: Bitboard of O
+        :return: None
+        """
+        self.bits = [x_bits, o_bits]
+        self.valid = 0
+        self.turn = None
+        self.stack = []
+        self.refresh()
+
+    def rows(self, labels: Union[dict, None] = None) -> list:
+        """
+        Retourne le rendu du plateau ligne par ligne, chaque ligne étant
+        une liste de cellules (pour le rendu différentiel)
+
+        :param dict labels: Glyph replacing the hint of some squares
+            (square index -> glyph of width 1), ex: rank of the move
+        :return: list - Lines of cells
+        """
         header = '   \33[33m' \
                  + ' '.join([string.ascii_uppercase[i]
                              for i in range(self.width)]
                             )
-        board = f"{header}\n"
+        lines = [[header]]
+
+        glyphs = {ord(status): Pawn.glyph(status, self.hints)
+                  for status in ('x', 'o', 'p', '.')}
+        statuses = self.cells()
+        index = 0
+        for i in range(1, self.height + 1):
+            cells = [(' ' if i < 10 else '') + f"\33[33m{i}\33[37m "]
+            for j in range(1, self.width + 1):
+                if labels and self.hints and index in labels:
+                    cells.append(labels[index])
+                else:
+                    cells.append(glyphs[statuses[index]])
+                if j != self.width:
+                    cells.append(' ')
+                index += 1
+            lines.append(cells)
+
+        return lines
 
-        for i, row in enumerate(self.grid, start=1):
-            board += ' ' if i < 10 else ''
-            board += f"\33[33m{i}\33[37m "
-            for j, pawn in enumerate(row, start=1):
-                pawn.set_visible(self.hints)
-                board += str(f"{pawn} " if j != len(row) else pawn)
-            board += '\n'
-
-        return board[:-1]
+    def __str__(self):
+        return '\n'.join(''.join(cells) for cells in self.rows())
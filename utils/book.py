@@ -0,0 +1,365 @@
+"""Livre d'ouvertures : coup à jouer dans les premières positions connues.
+
+Un fichier ``.book`` commence par un en-tête (``MAGIC``, largeur, hauteur,
+nombre d'entrées) suivi d'entrées de taille fixe triées par hash de Zobrist
+(trait compris) : hash, case du coup, score. Il est lu avec `mmap` et une
+recherche dichotomique : l'ouverture ne charge rien, quelle que soit la
+taille du livre. Un livre symétrique (``MAGIC_SYMMETRIC``) est indexé par
+position canonique (voir `utils.symmetry`), ses coups dans le repère
+canonique : les positions images l'une de l'autre partagent une entrée.
+
+Usage :
+    ``python -m utils.selfplay -n 5000 --output games.jsonl``
+    ``python -m utils.book games.jsonl games/ --output books/8x8.book``
+    ``python -m utils.book games.jsonl --symmetric --output books/8x8.book``
+    ``python main.py alphabeta:book=books/8x8.book``
+"""
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+from typing import Tuple, Union
+
+from .bitboard import get_geometry
+from .board import Board
+from .record import EXTENSION, PASS, GameRecord
+from .search import SearchResult
+from .symmetry import get_symmetry
+
+
+MAGIC = b'RVB1'
+MAGIC_SYMMETRIC = b'RVS1'
+HEADER = struct.Struct('<4sHHI')
+# hash (Q) + case du coup (H) + score (i)
+ENTRY = struct.Struct('<QHi')
+KEY = struct.Struct('<Q')
+
+
+class OpeningBook:
+    """Livre d'ouvertures en lecture seule, projeté en mémoire"""
+    __slots__ = ('path', 'file', 'data', 'width', 'height', 'count',
+                 'symmetric')
+
+    def __init__(self, path: str):
+        self.path: str = path
+        self.file = open(path, 'rb')
+        try:
+            size = os.fstat(self.file.fileno()).st_size
+            if size < HEADER.size:
+                raise ValueError(f"Not an opening book: {path}")
+            self.data = mmap.mmap(self.file.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            self.file.close()
+            raise
+
+        magic, self.width, self.height, self.count = \
+            HEADER.unpack_from(self.data, 0)
+        if magic not in (MAGIC, MAGIC_SYMMETRIC):
+            self.close()
+            raise ValueError(f"Not an opening book: {path}")
+        if size != HEADER.size + self.count * ENTRY.size:
+            self.close()
+            raise ValueError(f"Truncated opening book: {path}")
+        self.symmetric: bool = magic == MAGIC_SYMMETRIC
+
+    def lookup(self, key: int) -> Union[Tuple[int, int], None]:
+        """
+        Cherche une position par dichotomie dans le fichier
+
+        :param int key: Zobrist hash of the position (with the side to move)
+        :return: tuple - (square index, score) or None if unknown
+        """
+        data = self.data
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            offset = HEADER.size + middle * ENTRY.size
+            found = KEY.unpack_from(data, offset)[0]
+            if found < key:
+                low = middle + 1
+            elif found > key:
+                high = middle
+            else:
+                _, move, score = ENTRY.unpack_from(data, offset)
+                return move, score
+        return None
+
+    def probe(self, board: Board, player: str) -> Union[Tuple[int, int], None]:
+        """
+        Retourne le coup du livre pour `player` s'il est jouable
+
+        :param Board board: Position
+        :param str player: Player to move
+        :return: tuple - (square index, score) or None
+        """
+        if board.width != self.width or board.height != self.height:
+            return None
+        if self.symmetric:
+            symmetry = get_symmetry(board.geometry)
+            key, transform = symmetry.board_hash(board, player)
+            entry = self.lookup(key)
+            if entry is None:
+                return None
+            entry = (symmetry.restore(entry[0], transform), entry[1])
+        else:
+            entry = self.lookup(board.get_hash(player))
+        if entry is None:
+            return None
+        # un hash de 64 bits peut (très rarement) désigner une autre position
+        if not board.moves[Board.PLAYERS.index(player)] >> entry[0] & 1:
+            return None
+        return entry
+
+    def close(self) -> None:
+        self.data.close()
+        self.file.close()
+
+    def __len__(self):
+        return self.count
+
+
+class BookPlayer:
+    """Joue le coup du livre tant que la position y figure, sinon laisse
+    chercher `player`"""
+    __slots__ = ('book', 'player')
+
+    def __init__(self, book: OpeningBook, player):
+        self.book: OpeningBook = book
+        self.player = player
+
+    def search(self, board: Board, player: str) -> SearchResult:
+        start = time.perf_counter()
+        entry = self.book.probe(board, player)
+        if entry is None:
+            return self.player.search(board, player)
+        move, score = entry
+        return SearchResult(board.geometry.pose(move), score, 0, 0,
+                            time.perf_counter() - start)
+
+    def close(self) -> None:
+        """
+        Ferme le livre et libère le joueur qui cherche hors du livre
+
+        :return: None
+        """
+        self.book.close()
+        if hasattr(self.player, 'close'):
+            self.player.close()
+
+
+class BookBuilder:
+    """Construit un livre à partir de parties et de recherches
+
+    Les positions des `plies` premiers coups de chaque partie sont
+    comptées. Le coup retenu est celui de la recherche s'il y en a eu une
+    (score de la recherche), sinon le meilleur coup des parties (score en
+    pourcentage de victoires). Avec `symmetric`, les positions et les
+    coups sont comptés dans le repère canonique.
+    """
+    __slots__ = ('width', 'height', 'plies', 'symmetric', 'stats',
+                 'positions', 'searched')
+
+    def __init__(self, width: int, height: int, plies: int = 20,
+                 symmetric: bool = False):
+        self.width: int = width
+        self.height: int = height
+        self.plies: int = plies
+        self.symmetric: bool = symmetric
+        # hash -> {coup: [parties, points du joueur au trait]}
+        self.stats: dict = {}
+        # hash -> (bitboard X, bitboard O, joueur au trait)
+        self.positions: dict = {}
+        # hash -> (coup, score) trouvés par la recherche
+        self.searched: dict = {}
+
+    def add_game(self, moves: list, winner: Union[str, None],
+                 first: str = 'o') -> None:
+        """
+        Compte les positions du début d'une partie
+
+        :param list moves: Square indexes (None for a pass)
+        :param str winner: 'x', 'o' or None for a draw
+        :param str first: Player who started
+        :return: None
+        """
+        board = Board(self.width, self.height)
+        board.make_board()
+        symmetry = get_symmetry(board.geometry)
+        player = first
+        for move in moves[:self.plies]:
+            adv = 'x' if player == 'o' else 'o'
+            if move is PASS:
+                player = adv
+                continue
+            if not board.moves[Board.PLAYERS.index(player)] >> move & 1:
+                pose = board.geometry.pose(move)
+                raise ValueError(f"Invalid move: {Board.notation(pose)}")
+
+            if self.symmetric:
+                x_bits, o_bits, transform = symmetry.canonical(*board.bits)
+                key, _ = symmetry.canonical_hash(x_bits, o_bits, player)
+                entry_move = symmetry.transform(move, transform)
+            else:
+                x_bits, o_bits = board.bits
+                key, entry_move = board.get_hash(player), move
+            if key not in self.positions:
+                self.positions[key] = (x_bits, o_bits, player)
+            stats = self.stats.setdefault(key, {}).setdefault(entry_move,
+                                                              [0, 0.0])
+            stats[0] += 1
+            stats[1] += 0.5 if winner is None else float(winner == player)
+
+            board.make_move(move, player)
+            player = adv
+
+    def add_result(self, result: dict) -> None:
+        """
+        Ajoute une partie de `utils.selfplay` (coups en notation D3)
+
+        :param dict result: Self-play game result
+        :return: None
+        """
+        geometry = get_geometry(self.width, self.height)
+        moves = [PASS if move == 'pass'
+                 else geometry.index(*Board.parser(move))
+                 for move in result['moves'][:self.plies]]
+        self.add_game(moves, result['winner'])
+
+    def add_record(self, record: GameRecord) -> None:
+        """
+        Ajoute une partie enregistrée (fichier .rvr)
+
+        :param GameRecord record: Game record
+        :return: None
+        """
+        board, _ = record.board_at(len(record))
+        pawns = board.count()
+        winner = None if pawns[0] == pawns[1] \
+            else ('x' if pawns[0] > pawns[1] else 'o')
+        self.add_game(record.moves, winner, record.player)
+
+    def search(self, player, min_games: int = 1) -> int:
+        """
+        Fait chercher le coup des positions jouées au moins `min_games` fois
+
+        :param player: Player with a `search(board, player)` method
+        :param int min_games: Minimum number of games of a position
+        :return: int - Number of positions searched
+        """
+        board = Board(self.width, self.height)
+        board.make_board()
+        searched = 0
+        for key, stats in self.stats.items():
+            if key in self.searched \
+                    or sum(games for games, _ in stats.values()) < min_games:
+                continue
+            x_bits, o_bits, to_move = self.positions[key]
+            board.load_bits(x_bits, o_bits)
+            result = player.search(board, to_move)
+            self.searched[key] = (board.geometry.index(*result.move),
+                                  result.score)
+            searched += 1
+        return searched
+
+    def entries(self, min_games: int = 1) -> list:
+        """
+        Retourne les entrées du livre triées par hash
+
+        :param int min_games: Minimum number of games of a position
+        :return: list - (hash, square index, score)
+        """
+        entries = []
+        for key, stats in self.stats.items():
+            if key in self.searched:
+                entries.append((key,) + self.searched[key])
+                continue
+            if sum(games for games, _ in stats.values()) < min_games:
+                continue
+            # moyenne lissée : un coup joué une fois ne passe pas devant
+            # un coup souvent gagnant
+            move = max(stats, key=lambda index: (stats[index][1] + 1)
+                       / (stats[index][0] + 2))
+            games, points = stats[move]
+            entries.append((key, move, round(100 * points / games)))
+        entries.sort()
+        return entries
+
+    def write(self, path: str, min_games: int = 1) -> int:
+        """
+        Ecrit le livre
+
+        :param str path: Book file
+        :param int min_games: Minimum number of games of a position
+        :return: int - Number of entries
+        """
+        entries = self.entries(min_games)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'wb') as fp:
+            fp.write(HEADER.pack(MAGIC_SYMMETRIC if self.symmetric
+                                 else MAGIC, self.width, self.height,
+                                 len(entries)))
+            for entry in entries:
+                fp.write(ENTRY.pack(*entry))
+        return len(entries)
+
+
+def main() -> None:
+    # import local : `players` importe ce module pour l'option `book`
+    from .players import make_player
+
+    parser = argparse.ArgumentParser(description="Construit un livre "
+                                                 "d'ouvertures")
+    parser.add_argument('inputs', nargs='+', help="résultats de "
+                        "utils.selfplay (.jsonl), parties .rvr ou dossiers")
+    parser.add_argument('-o', '--output', required=True)
+    parser.add_argument('-s', '--size', type=int, default=8)
+    parser.add_argument('--plies', type=int, default=20)
+    parser.add_argument('--symmetric', action='store_true', help="indexe "
+                        "les positions à une symétrie du plateau près")
+    parser.add_argument('--min-games', type=int, default=2)
+    parser.add_argument('--search', metavar='PLAYER', help="joueur qui "
+                        "choisit le coup de chaque position "
+                        "(ex: alphabeta:depth=6)")
+    args = parser.parse_args()
+
+    builder = BookBuilder(args.size, args.size, args.plies, args.symmetric)
+    games = 0
+    for path in args.inputs:
+        if os.path.isdir(path):
+            paths = [os.path.join(path, name)
+                     for name in sorted(os.listdir(path))
+                     if name.endswith(EXTENSION)]
+        else:
+            paths = [path]
+
+        for path in paths:
+            if path.endswith(EXTENSION):
+                record = GameRecord.open(path)
+                if (record.width, record.height) == (args.size, args.size):
+                    builder.add_record(record)
+                    games += 1
+                continue
+            with open(path) as fp:
+                for line in fp:
+                    result = json.loads(line)
+                    if result.get('size', [8, 8]) == [args.size, args.size]:
+                        builder.add_result(result)
+                        games += 1
+
+    searched = 0
+    if args.search:
+        searched = builder.search(make_player(args.search), args.min_games)
+    entries = builder.write(args.output, args.min_games)
+    print(f"{games} games, {len(builder.stats)} positions, {searched} "
+          f"searched, {entries} entries written to {args.output}",
+          file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
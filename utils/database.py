@@ -0,0 +1,397 @@
+"""Base de parties SQLite indexée par position.
+
+Chaque partie est stockée une fois, ses coups encodés comme dans les
+fichiers ``.rvr`` (un varint par coup). Chaque position traversée est
+indexée par son hash de Zobrist (trait compris) avec le coup joué et le
+résultat pour le joueur au trait : la table `positions` est rangée par
+hash, si bien que les parties passées par une position et les statistiques
+de chaque réponse se lisent d'un seul parcours d'index, sans jointure.
+
+Les clés de Zobrist étant tirées pour chaque taille de plateau, une même
+base peut contenir des parties de tailles différentes.
+
+Usage :
+    ``python -m utils.database games.db ingest games/ games.jsonl``
+    ``python -m utils.database games.db query D3 C5``
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from typing import Iterator, Tuple, Union
+
+from .bitboard import flips, get_geometry, popcount
+from .board import Board
+from .record import EXTENSION, PASS, GameRecord, convert_snapshots, \
+    decode_varint, encode_varint
+from .zobrist import get_keys
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    source TEXT UNIQUE,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    x_bits BLOB NOT NULL,
+    o_bits BLOB NOT NULL,
+    player TEXT NOT NULL,
+    moves BLOB NOT NULL,
+    winner TEXT,
+    x_pawns INTEGER NOT NULL,
+    o_pawns INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS positions (
+    hash INTEGER NOT NULL,
+    game INTEGER NOT NULL,
+    ply INTEGER NOT NULL,
+    move INTEGER,
+    result INTEGER NOT NULL,
+    PRIMARY KEY (hash, game, ply)
+) WITHOUT ROWID;
+"""
+
+# coup d'une passe dans `positions` (NULL = fin de la partie)
+PASS_MOVE = -1
+# parties par transaction pendant l'import
+BATCH_SIZE = 1000
+
+
+def to_signed(key: int) -> int:
+    """
+    Convertit un hash de 64 bits en entier signé (INTEGER de SQLite)
+
+    :param int key: 64 bits hash
+    :return: int
+    """
+    return key - (1 << 64) if key >= 1 << 63 else key
+
+
+class GameDatabase:
+    """Base de parties avec index des positions"""
+    __slots__ = ('path', 'connection', 'pending')
+
+    def __init__(self, path: str):
+        self.path: str = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+        self.pending: int = 0
+
+    def add_game(self, source: Union[str, None], width: int, height: int,
+                 x_bits: int, o_bits: int, player: str,
+                 moves: list) -> bool:
+        """
+        Ajoute une partie et indexe ses positions
+
+        :param str source: Unique name of the game (None = no check)
+        :param int width: Board width
+        :param int height: Board height
+        :param int x_bits: Bitboard of X at the start
+        :param int o_bits: Bitboard of O at the start
+        :param str player: Player who starts
+        :param list moves: Square indexes (None for a pass)
+        :return: bool - False if `source` is already in the database
+        """
+        cursor = self.connection.cursor()
+        if source is not None and cursor.execute(
+                "SELECT 1 FROM games WHERE source = ?",
+                (source,)).fetchone():
+            return False
+
+        # rejeu direct sur les bitboards : la mise à jour incrémentale des
+        # coups possibles de `Board.make_move` coûterait 10 fois plus
+        geometry = get_geometry(width, height)
+        keys = get_keys(geometry)
+        bits = [x_bits, o_bits]
+        key = keys.hash(x_bits, o_bits)
+        color = Board.PLAYERS.index(player)
+        # (hash, ply, coup, joueur au trait), le résultat est connu à la fin
+        plies = []
+        for ply, move in enumerate(moves):
+            to_move = key ^ keys.side if color else key
+            if move is PASS:
+                plies.append((to_move, ply, PASS_MOVE, color))
+            else:
+                own, opp = bits[color], bits[1 - color]
+                flipped = flips(geometry, own, opp, move) \
+                    if not (own | opp) >> move & 1 else 0
+                if not flipped:
+                    pose = Board.notation(geometry.pose(move))
+                    raise ValueError(f"Invalid move at ply {ply}: {pose}")
+                plies.append((to_move, ply, move, color))
+                bits[color] = own | flipped | (1 << move)
+                bits[1 - color] = opp & ~flipped
+                key ^= keys.squares[color][move] ^ keys.flip_hash(flipped)
+            color = 1 - color
+        plies.append((key ^ keys.side if color else key, len(moves), None,
+                      color))
+
+        pawns = [popcount(bits[0]), popcount(bits[1])]
+        winner = None if pawns[0] == pawns[1] else (0 if pawns[0] > pawns[1]
+                                                    else 1)
+        length = (width * height + 7) // 8
+        cursor.execute(
+            "INSERT INTO games (source, width, height, x_bits, o_bits, "
+            "player, moves, winner, x_pawns, o_pawns) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (source, width, height, x_bits.to_bytes(length, 'little'),
+             o_bits.to_bytes(length, 'little'), player,
+             b''.join(encode_varint(0 if move is PASS else move + 1)
+                      for move in moves),
+             None if winner is None else Board.PLAYERS[winner], pawns[0],
+             pawns[1]))
+        game = cursor.lastrowid
+        cursor.executemany(
+            "INSERT OR IGNORE INTO positions VALUES (?, ?, ?, ?, ?)",
+            [(to_signed(key), game, ply, move,
+              0 if winner is None else (1 if winner == to_move else -1))
+             for key, ply, move, to_move in plies])
+
+        self.pending += 1
+        if self.pending >= BATCH_SIZE:
+            self.commit()
+        return True
+
+    def add_record(self, record: GameRecord,
+                   source: Union[str, None] = None) -> bool:
+        """
+        Ajoute une partie enregistrée (fichier .rvr ou sauvegardes JSON
+        converties)
+
+        :param GameRecord record: Game record
+        :param str source: Unique name of the game
+        :return: bool - False if already in the database
+        """
+        x_bits, o_bits, player = record.position_at(0)
+        return self.add_game(source, record.width, record.height, x_bits,
+                             o_bits, player, record.moves)
+
+    def add_result(self, result: dict,
+                   source: Union[str, None] = None) -> bool:
+        """
+        Ajoute une partie de `utils.selfplay` ou `utils.tournament` (coups
+        en notation D3, O commence)
+
+        :param dict result: Game result
+        :param str source: Unique name of the game
+        :return: bool - False if already in the database
+        """
+        width, height = result.get('size', [8, 8])
+        geometry = get_geometry(width, height)
+        board = Board(width, height)
+        board.make_board()
+        moves = [PASS if move == 'pass'
+                 else geometry.index(*Board.parser(move))
+                 for move in result['moves']]
+        return self.add_game(source, width, height, board.bits[0],
+                             board.bits[1], 'o', moves)
+
+    def ingest(self, path: str) -> Iterator[Tuple[str, bool]]:
+        """
+        Importe un fichier .rvr, un fichier JSON lines de résultats, un
+        dossier de sauvegardes JSON (``games/<time>/``) ou un dossier qui
+        en contient, une partie à la fois
+
+        :param str path: File or directory
+        :return: Iterator[tuple] - (source, added) for each game
+        """
+        path = os.path.normpath(path)
+        if os.path.isdir(path):
+            names = os.listdir(path)
+            if any(name.endswith('.json') and name[:-5].isdigit()
+                   for name in names):
+                try:
+                    record = convert_snapshots(path)
+                except (ValueError, OSError) as error:
+                    # partie interrompue ou sauvegarde abîmée : on continue
+                    print(f"Skipped {path}: {error}", file=sys.stderr)
+                    return
+                yield path, self.add_record(record, path)
+                return
+            for name in sorted(names):
+                yield from self.ingest(os.path.join(path, name))
+        elif path.endswith(EXTENSION):
+            yield path, self.add_record(GameRecord.open(path), path)
+        elif path.endswith(('.jsonl', '.json')):
+            with open(path) as fp:
+                for number, line in enumerate(fp, 1):
+                    if line.strip():
+                        source = f"{path}#{number}"
+                        yield source, self.add_result(json.loads(line),
+                                                      source)
+
+    def games_at(self, board: Board, player: str,
+                 limit: Union[int, None] = None) -> list:
+        """
+        Parties passées par la position
+
+        :param Board board: Position
+        :param str player: Player to move
+        :param int limit: Maximum number of games
+        :return: list - (game id, source, ply)
+        """
+        query = "SELECT p.game, g.source, p.ply FROM positions p " \
+                "JOIN games g ON g.id = p.game WHERE p.hash = ?"
+        parameters = (to_signed(board.get_hash(player)),)
+        if limit is not None:
+            query += " LIMIT ?"
+            parameters += (limit,)
+        return self.connection.execute(query, parameters).fetchall()
+
+    def replies(self, board: Board, player: str) -> list:
+        """
+        Statistiques de chaque coup joué depuis la position, du point de
+        vue de `player`, du plus joué au moins joué
+
+        :param Board board: Position
+        :param str player: Player to move
+        :return: list - dicts (move, games, wins, draws, losses, win_rate),
+            move being 'pass' or a notation like D3
+        """
+        rows = self.connection.execute(
+            "SELECT move, COUNT(*), SUM(result = 1), SUM(result = 0) "
+            "FROM positions WHERE hash = ? AND move IS NOT NULL "
+            "GROUP BY move", (to_signed(board.get_hash(player)),))
+        replies = []
+        for move, games, wins, draws in rows:
+            replies.append({
+                'move': 'pass' if move == PASS_MOVE
+                else Board.notation(board.geometry.pose(move)),
+                'games': games,
+                'wins': wins,
+                'draws': draws,
+                'losses': games - wins - draws,
+                'win_rate': (wins + draws / 2) / games
+            })
+        replies.sort(key=lambda reply: (-reply['games'], reply['move']))
+        return replies
+
+    def game(self, ident: int) -> GameRecord:
+        """
+        Relit une partie
+
+        :param int ident: Game id
+        :return: GameRecord
+        """
+        row = self.connection.execute(
+            "SELECT width, height, x_bits, o_bits, player, moves "
+            "FROM games WHERE id = ?", (ident,)).fetchone()
+        if row is None:
+            raise KeyError(ident)
+        width, height, x_bits, o_bits, player, data = row
+        record = GameRecord(width, height, player)
+        offset = 0
+        while offset < len(data):
+            value, offset = decode_varint(data, offset)
+            record.moves.append(PASS if value == 0 else value - 1)
+        record.cursor = len(record.moves)
+
+        start = Board(width, height)
+        start.make_board()
+        bits = [int.from_bytes(x_bits, 'little'),
+                int.from_bytes(o_bits, 'little')]
+        if bits != start.bits or player != 'o':
+            record.checkpoints[0] = (bits[0], bits[1], player)
+        return record
+
+    def commit(self) -> None:
+        self.connection.commit()
+        self.pending = 0
+
+    def close(self) -> None:
+        self.commit()
+        self.connection.close()
+
+    def __len__(self):
+        return self.connection.execute(
+            "SELECT COUNT(*) FROM games").fetchone()[0]
+
+
+def replay(width: int, height: int, moves: list) -> Tuple[Board, str]:
+    """
+    Joue des coups depuis la position de départ (O commence), les passes
+    étant ajoutées quand un joueur ne peut pas jouer
+
+    :param list moves: Moves (ex: ['D3', 'C5'])
+    :return: tuple - (Board, player to move)
+    """
+    board = Board(width, height)
+    board.make_board()
+    player = 'o'
+    for move in moves:
+        if move.lower() == 'pass':
+            player = 'x' if player == 'o' else 'o'
+            continue
+        if not board.set_valid_poses(player):
+            player = 'x' if player == 'o' else 'o'
+            board.set_valid_poses(player)
+        if not board.is_valid_move(move):
+            raise ValueError(f"Invalid move: {move}")
+        board.move(move, player, False)
+        player = 'x' if player == 'o' else 'o'
+    return board, player
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Base de parties")
+    parser.add_argument('database', help="fichier SQLite")
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    ingest = commands.add_parser('ingest', help="importe des parties")
+    ingest.add_argument('paths', nargs='+', help="fichiers .rvr, .jsonl ou "
+                        "dossiers de sauvegardes")
+
+    query = commands.add_parser('query', help="statistiques d'une position")
+    query.add_argument('moves', nargs='*', help="coups depuis le départ "
+                       "(ex: D3 C5)")
+    query.add_argument('-s', '--size', type=int, default=8)
+    query.add_argument('--games', type=int, default=10,
+                       help="nombre de parties listées")
+    args = parser.parse_args()
+
+    database = GameDatabase(args.database)
+    try:
+        if args.command == 'ingest':
+            start = time.perf_counter()
+            added = skipped = 0
+            for _, new in (game for path in args.paths
+                           for game in database.ingest(path)):
+                if new:
+                    added += 1
+                else:
+                    skipped += 1
+            database.commit()
+            print(f"{added} games added, {skipped} already present in "
+                  f"{time.perf_counter() - start:.2f}s, {len(database)} "
+                  f"games in {args.database}")
+            return
+
+        board, player = replay(args.size, args.size, args.moves)
+        start = time.perf_counter()
+        replies = database.replies(board, player)
+        games = database.games_at(board, player, args.games)
+        elapsed = time.perf_counter() - start
+
+        total = sum(reply['games'] for reply in replies)
+        print(f"{total} games continued from this position, "
+              f"{player} to move ({1000 * elapsed:.1f} ms)")
+        for reply in replies:
+            print(f"{reply['move']:>5} {reply['games']:>8} games "
+                  f"{100 * reply['win_rate']:5.1f}% "
+                  f"(+{reply['wins']} ={reply['draws']} -{reply['losses']})")
+        for ident, source, ply in games:
+            print(f"game {ident} ply {ply}: {source}")
+    finally:
+        database.close()
+
+
+if __name__ == '__main__':
+    main()
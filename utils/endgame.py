@@ -0,0 +1,346 @@
+"""Résolution exacte des fins de partie.
+
+Quand il reste peu de cases vides, la recherche va jusqu'à la fin de la
+partie : le score est la différence de pions finale, le coup retourné est
+le meilleur possible. Les coups sont triés du plus restrictif pour
+l'adversaire au moins restrictif (fastest-first), puis par parité des
+régions, et les dernières cases vides sont jouées sans générer les coups.
+"""
+import time
+from typing import Union
+
+from .bitboard import DIRECTIONS, Geometry, iter_bits, legal_moves, popcount
+from .board import Board
+from .search import SearchResult
+from .transposition import EXACT, LOWER, NO_MOVE, UPPER, TranspositionTable
+from .zobrist import ZobristKeys
+
+
+# au-delà, tri fastest-first (coûteux) ; en deçà, tri par parité
+FASTEST_FIRST_EMPTIES = 6
+# en deçà, parcours direct de la liste des cases vides
+SHALLOW_EMPTIES = 5
+# en deçà, pas de table de transposition
+TABLE_EMPTIES = 6
+
+
+def get_quadrants(geometry: Geometry) -> list:
+    """
+    Découpe le plateau en 4 régions pour la parité
+
+    :param Geometry geometry: Board geometry
+    :return: list - 4 bitboards
+    """
+    quadrants = [0, 0, 0, 0]
+    for row in range(geometry.height):
+        for col in range(geometry.width):
+            quadrant = 2 * (row >= geometry.height // 2) \
+                + (col >= geometry.width // 2)
+            quadrants[quadrant] |= 1 << geometry.index(row, col)
+    return quadrants
+
+
+def get_rays(geometry: Geometry) -> list:
+    """
+    Rayons de chaque case : pour chaque direction où un retournement est
+    possible (au moins 2 cases), les bits des cases dans l'ordre
+
+    :param Geometry geometry: Board geometry
+    :return: list - Tuple of rays for each square index
+    """
+    rays = []
+    for row in range(geometry.height):
+        for col in range(geometry.width):
+            square = []
+            for d_row, d_col in DIRECTIONS:
+                ray = []
+                i, j = row + d_row, col + d_col
+                while 0 <= i < geometry.height and 0 <= j < geometry.width:
+                    ray.append(1 << geometry.index(i, j))
+                    i, j = i + d_row, j + d_col
+                if len(ray) >= 2:
+                    square.append(tuple(ray))
+            rays.append(tuple(square))
+    return rays
+
+
+def ray_flips(rays: tuple, own: int, opp: int) -> int:
+    """
+    Equivalent de `utils.bitboard.flips` sur les rayons d'une case : les
+    directions sans pion adverse voisin sont écartées dès la première case,
+    ce qui est environ 3 fois plus rapide sur un plateau 8x8
+
+    :param tuple rays: Rays of the square (see `get_rays`)
+    :param int own: Bitboard of the player to move
+    :param int opp: Bitboard of the opponent
+    :return: int - Bitboard of the flipped pawns
+    """
+    flipped = 0
+    for ray in rays:
+        if not ray[0] & opp:
+            continue
+        line = 0
+        for bit in ray:
+            if bit & opp:
+                line |= bit
+            else:
+                if bit & own:
+                    flipped |= line
+                break
+    return flipped
+
+
+class EndgameSolver:
+    """Solveur exact des fins de partie (negamax alpha-beta sur la
+    différence de pions)
+
+    Avec un joueur `player`, les positions ayant plus de `threshold` cases
+    vides lui sont laissées : le solveur ne prend la main qu'en fin de
+    partie. Le score du résultat est la différence de pions finale du
+    joueur au trait avec le meilleur jeu des deux côtés.
+    """
+    __slots__ = ('threshold', 'player', 'table', 'geometry', 'keys',
+                 'quadrants', 'rays', 'nodes')
+
+    def __init__(self, threshold: int = 14, player=None,
+                 table: Union[TranspositionTable, None] = None):
+        self.threshold: int = threshold
+        self.player = player
+        self.table: TranspositionTable = table if table is not None \
+            else TranspositionTable(memory=4 * 1024 * 1024)
+
+        self.geometry: Union[Geometry, None] = None
+        self.keys: Union[ZobristKeys, None] = None
+        self.quadrants: list = []
+        self.rays: list = []
+        self.nodes: int = 0
+
+    def search(self, board: Board, player: str) -> SearchResult:
+        """
+        Résout la position si elle a au plus `threshold` cases vides,
+        sinon laisse chercher `player`
+
+        :param Board board: Position
+        :param str player: Player to move ('x' or 'o')
+        :return: SearchResult
+        """
+        empties = board.geometry.size - sum(board.counts)
+        if self.player is not None and empties > self.threshold:
+            return self.player.search(board, player)
+        return self.solve(board, player)
+
+    def solve(self, board: Board, player: str) -> SearchResult:
+        """
+        Résout exactement la position
+
+        :param Board board: Position
+        :param str player: Player to move ('x' or 'o')
+        :return: SearchResult - Best move (None if player must pass) and
+            final disc difference
+        """
+        start = time.perf_counter()
+        if board.geometry is not self.geometry:
+            self.geometry = board.geometry
+            self.quadrants = get_quadrants(board.geometry)
+            self.rays = get_rays(board.geometry)
+        self.keys = board.keys
+        self.table.new_search()
+        self.nodes = 0
+
+        color = Board.PLAYERS.index(player)
+        own, opp = board.bits[color], board.bits[1 - color]
+        empty = self.geometry.full & ~(own | opp)
+        moves = legal_moves(self.geometry, own, opp)
+        if not moves:
+            return SearchResult(None, 0, 0, 0, time.perf_counter() - start)
+
+        key = board.get_hash(player)
+        keys = self.keys
+        squares = keys.squares[color]
+        best_move, alpha = NO_MOVE, -self.geometry.size - 1
+        for index, flipped, child_moves in self.order(own, opp, moves, empty,
+                                                      NO_MOVE):
+            child = key ^ squares[index] ^ keys.flip_hash(flipped) ^ keys.side
+            new_own = own | flipped | (1 << index)
+            new_opp = opp & ~flipped
+            new_empty = empty & ~(1 << index)
+            if best_move == NO_MOVE:
+                score = -self.negamax(new_opp, new_own, 1 - color, child,
+                                      -self.geometry.size - 1, -alpha,
+                                      new_empty, child_moves)
+            else:
+                score = -self.negamax(new_opp, new_own, 1 - color, child,
+                                      -alpha - 1, -alpha, new_empty,
+                                      child_moves)
+                if score > alpha:
+                    score = -self.negamax(new_opp, new_own, 1 - color, child,
+                                          -self.geometry.size - 1, -score,
+                                          new_empty, child_moves)
+            if score > alpha or best_move == NO_MOVE:
+                best_move, alpha = index, score
+        self.table.store(key, popcount(empty), EXACT, alpha, best_move)
+
+        return SearchResult(self.geometry.pose(best_move), alpha,
+                            popcount(empty), self.nodes,
+                            time.perf_counter() - start)
+
+    def negamax(self, own: int, opp: int, color: int, key: int, alpha: int,
+                beta: int, empty: int, moves: Union[int, None] = None) -> int:
+        count = popcount(empty)
+        if count <= SHALLOW_EMPTIES:
+            return self.shallow(own, opp, alpha, beta,
+                                self.parity_order(empty), False)
+
+        self.nodes += 1
+        geometry = self.geometry
+        if moves is None:
+            moves = legal_moves(geometry, own, opp)
+        if not moves:
+            if not legal_moves(geometry, opp, own):
+                return popcount(own) - popcount(opp)
+            return -self.negamax(opp, own, 1 - color, key ^ self.keys.side,
+                                 -beta, -alpha, empty)
+
+        table = self.table if count >= TABLE_EMPTIES else None
+        hint = NO_MOVE
+        if table is not None:
+            entry = table.probe(key)
+            if entry is not None:
+                _, bound, score, hint = entry
+                if bound == EXACT \
+                        or (bound == LOWER and score >= beta) \
+                        or (bound == UPPER and score <= alpha):
+                    return score
+
+        keys = self.keys
+        squares = keys.squares[color]
+        original_alpha = alpha
+        best, best_move = -geometry.size - 1, NO_MOVE
+        for index, flipped, child_moves in self.order(own, opp, moves, empty,
+                                                      hint):
+            child = key ^ squares[index] ^ keys.flip_hash(flipped) ^ keys.side
+            new_own = own | flipped | (1 << index)
+            new_opp = opp & ~flipped
+            new_empty = empty & ~(1 << index)
+            if best_move == NO_MOVE:
+                score = -self.negamax(new_opp, new_own, 1 - color, child,
+                                      -beta, -alpha, new_empty, child_moves)
+            else:
+                # fenêtre nulle : il suffit de montrer que le coup est moins
+                # bon que le meilleur, sinon on le recherche entièrement
+                score = -self.negamax(new_opp, new_own, 1 - color, child,
+                                      -alpha - 1, -alpha, new_empty,
+                                      child_moves)
+                if alpha < score < beta:
+                    score = -self.negamax(new_opp, new_own, 1 - color, child,
+                                          -beta, -score, new_empty,
+                                          child_moves)
+            if score > best:
+                best, best_move = score, index
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+
+        if table is not None:
+            if best <= original_alpha:
+                bound = UPPER
+            elif best >= beta:
+                bound = LOWER
+            else:
+                bound = EXACT
+            table.store(key, count, bound, best, best_move)
+        return best
+
+    def shallow(self, own: int, opp: int, alpha: int, beta: int,
+                empties: list, passed: bool) -> int:
+        """
+        Fin de la recherche sur les dernières cases vides : chaque case est
+        essayée directement, sans générer les coups ni trier
+
+        :param list empties: Indexes of the empty squares
+        :param bool passed: Did the previous player pass ?
+        :return: int - Final disc difference for `own`
+        """
+        self.nodes += 1
+        neighbours = self.geometry.neighbours
+        rays = self.rays
+        best = None
+        for position, index in enumerate(empties):
+            if not neighbours[index] & opp:
+                continue
+            flipped = ray_flips(rays[index], own, opp)
+            if not flipped:
+                continue
+
+            new_own = own | flipped | (1 << index)
+            new_opp = opp & ~flipped
+            if len(empties) == 1:
+                score = popcount(new_own) - popcount(new_opp)
+            else:
+                score = -self.shallow(new_opp, new_own, -beta, -alpha,
+                                      empties[:position]
+                                      + empties[position + 1:], False)
+            if best is None or score > best:
+                best = score
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+
+        if best is None:
+            if passed:
+                return popcount(own) - popcount(opp)
+            return -self.shallow(opp, own, -beta, -alpha, empties, True)
+        return best
+
+    def parity_order(self, empty: int) -> list:
+        """
+        Cases vides des régions impaires d'abord : y jouer laisse
+        l'adversaire sans dernier coup dans la région
+
+        :param int empty: Bitboard of the empty squares
+        :return: list - Square indexes
+        """
+        odd = even = 0
+        for quadrant in self.quadrants:
+            region = empty & quadrant
+            if popcount(region) & 1:
+                odd |= region
+            else:
+                even |= region
+        return list(iter_bits(odd)) + list(iter_bits(even))
+
+    def order(self, own: int, opp: int, moves: int, empty: int, hint: int):
+        """
+        Trie les coups : coup de la table d'abord, puis fastest-first
+        (mobilité de l'adversaire la plus faible) avec la parité en
+        départage, ou la parité seule près de la fin
+
+        :return: list - (square index, flipped pawns, legal moves of the
+            opponent after the move or None if not computed)
+        """
+        geometry = self.geometry
+        rays = self.rays
+        if popcount(empty) <= FASTEST_FIRST_EMPTIES:
+            return [(index, ray_flips(rays[index], own, opp), None)
+                    for index in self.parity_order(empty)
+                    if moves >> index & 1]
+
+        odd = 0
+        for quadrant in self.quadrants:
+            if popcount(empty & quadrant) & 1:
+                odd |= quadrant
+
+        scored = []
+        for index in iter_bits(moves):
+            flipped = ray_flips(rays[index], own, opp)
+            mobility = legal_moves(geometry, opp & ~flipped,
+                                   own | flipped | (1 << index))
+            if index == hint:
+                rank = -1
+            else:
+                rank = 2 * popcount(mobility) + 1 - (odd >> index & 1)
+            scored.append((rank, index, flipped, mobility))
+        scored.sort()
+        return [entry[1:] for entry in scored]
@@ -1,18 +1,29 @@
-import platform
 import time
-import random
 
 from modules.termcolor import colored
 
 from .board import Board
 from .menu import Menu
 from .misc import *
+from .record import EXTENSION, PASS, GameRecord
+from .render import Renderer
+from .endgame import EndgameSolver
+from .ponder import Ponderer
+from .search import AlphaBeta
+
+# coups classés affichés sur le plateau et dans le menu
+RANKED_HINTS = 9
+MENU_HINTS = 3
 
 
 class Engine:
-    __slots__ = ('board', 'is_playing', 'menu', 'time', 'players')
+    __slots__ = ('board', 'is_playing', 'menu', 'time', 'players', 'ai',
+                 'record', 'renderer', 'ponderer', 'reply')
+
+    CHECKPOINT_EVERY = 32
 
-    def __init__(self, board: Board, players: int):
+    def __init__(self, board: Board, players: int, ai=None,
+                 ponder: bool = False):
         self.board: Board = board
         self.is_playing: bool = False
 
@@ -28,6 +39,26 @@ class Engine:
 
         self.players = players
 
+        # n'importe quel objet avec une méthode `search(board, player)` ;
+        # par défaut dans ce processus (`alphabeta:workers=N` pour répartir
+        # la recherche)
+        self.ai = ai if ai is not None \
+            else EndgameSolver(player=AlphaBeta())
+
+        # l'historique est en mémoire, le fichier n'en est que la sauvegarde
+        self.record = GameRecord(self.board.width, self.board.height,
+                                 self.menu.player, self.CHECKPOINT_EVERY)
+        try:
+            self.record.attach(f"games/{self.time}{EXTENSION}")
+        except OSError:
+            pass  # dossier des parties inaccessible : partie non sauvegardée
+        self.renderer = Renderer()
+
+        # réflexion de l'IA pendant le tour de l'humain (contre l'IA)
+        self.ponderer = Ponderer(self.ai) if ponder and players == 1 \
+            else None
+        self.reply = None  # réponse déjà calculée au dernier coup humain
+
     def start(self) -> None:
         """
         Lance l'app en faisant le premier rendu
@@ -44,13 +75,21 @@ class Engine:
 
         :return: None
         """
+        if self.ponderer is not None:
+            self.ponderer.stop()
+        # processus de la recherche parallèle de l'IA et de ses délégués
+        player = self.ai
+        while player is not None:
+            if hasattr(player, 'close'):
+                player.close()
+            player = getattr(player, 'player', None)
         self.congratulation()
         self.is_playing = False
 
     def render(self) -> None:
         """
-        Fait le rendu du damier et du menu en faisant un clear pour
-        effacer les précédents rendus
+        Fait le rendu du damier et du menu, en ne réécrivant que ce qui a
+        changé depuis le rendu précédent
 
         :return: None
         """
@@ -59,24 +98,23 @@ class Engine:
         if not can_play:
             self.menu.player = 'x' if self.menu.player == 'o' else 'o'
             self.menu.turns += 1
-            self.board.set_valid_poses(self.menu.player)
+            self.record.append(PASS)
+            if not self.board.set_valid_poses(self.menu.player):
+                return self.stop()  # aucun des deux joueurs ne peut jouer
 
-        os.system('cls' if platform.system() == 'Windows' else 'clear')
-        flat_board = str(self.board).split('\n')
+        flat_board = self.board.rows(self.hint_labels())
         flat_menu = str(self.menu).split('\n')
 
         full = max(len(flat_board), len(flat_menu))
         if full == len(flat_board):
             flat_menu.extend(['' for _ in range(full - len(flat_menu))])
         else:
-            blank = ' ' * (len(
-                flat_board[0]) - 5)  # pourquoi -5 ? bonne question...
+            blank = [' ' * self.renderer.width(''.join(flat_board[0]))]
             flat_board.extend(
                 [blank for _ in range(full - len(flat_board))])
 
-        for i in range(full):
-            print(flat_board[i], ' ' * 6,
-                  flat_menu[i])
+        self.renderer.draw([flat_board[i] + [' ' * 8, flat_menu[i]]
+                            for i in range(full)])
 
         x = self.menu.pawns[0]
         y = self.menu.pawns[1]
@@ -114,6 +152,8 @@ class Engine:
         :return: None
         """
         if self.menu.player == 'o' or (self.menu.player == 'x' and self.players == 2):
+            if self.ponderer is not None:
+                self.ponderer.start(self.board, self.menu.player)
             print("Action:")
             action = input('')
             while action.upper() not in self.menu.get_commands():
@@ -132,6 +172,9 @@ class Engine:
         :param str action: Action to do
         :return: None
         """
+        if self.ponderer is not None and action in ['A', 'U', 'R']:
+            self.ponderer.stop()
+
         if action == 'A':
             self.stop()
         elif action == 'P':
@@ -160,58 +203,97 @@ class Engine:
                 if move == 'back':
                     del_top_line(2)
                     return self.get_action()
+                if self.ponderer is not None:
+                    pose = self.board.parser(move)
+                    self.reply = self.ponderer.stop(
+                        self.board.geometry.index(*pose))
             else:
+                reply, self.reply = self.reply, None
                 can_play = self.board.set_valid_poses('x')
                 if not can_play:
                     self.menu.player = 'o'
                     self.menu.turns += 1
-                    self.board.set_valid_poses(self.menu.player)
+                    self.record.append(PASS)
+                    return self.render()
+                elif reply is not None:
+                    # coup humain prévu : réponse calculée pendant sa saisie
+                    self.menu.search = f"{reply} (pondered)"
+                    move = reply.move
+                    already_parsed = True
                 else:
-                    move = random.choice(self.board.get_valid_poses())
+                    result = self.ai.search(self.board, self.menu.player)
+                    self.menu.search = str(result)
+                    move = result.move
                     already_parsed = True
 
-            backup = {
-                'board': self.board.export(),
-                'is_playing': self.is_playing,
-                'menu': self.menu.export(),
-                'time': self.time
-            }
-            save(f"games/{self.time}", backup)
-
-            self.menu.pawns = self.board.move(move, self.menu.player, already_parsed)
+            pose = move if already_parsed else self.board.parser(move)
+            self.menu.pawns = self.board.move(pose, self.menu.player, True)
+            self.record.append(self.board.geometry.index(*pose), self.board)
             self.menu.player = 'x' if self.menu.player == 'o' else 'o'
             self.menu.turns += 1
             self.render()
-
-            save(f"games/{self.time}", {
-                'board': self.board.export(),
-                'is_playing': self.is_playing,
-                'menu': self.menu.export(),
-                'time': self.time
-            })
         elif action == 'H':
             self.board.toggle_hints()
             self.menu.hints = self.board.hints
             self.render()
 
-        elif action == 'U':
-            to_undo = 1 if self.players == 2 else 2
-            undo = load(f"games/{self.time}", self.menu.turns - to_undo)
-            if undo:
-                self.menu.load(undo.get('menu'))
-                self.board.load(undo.get('board'))
+        elif action in ['U', 'R']:
+            plies = 1 if self.players == 2 else 2
+            ply = self.record.cursor + (plies if action == 'R' else -plies)
+            if 0 <= ply <= len(self.record):
+                self.goto(ply)
                 self.render()
             else:
                 del_top_line(2)
                 print(colored("No backup !", 'red'))
 
-        elif action == 'R':
-            to_redo = 1 if self.players == 2 else 2
-            redo = load(f"games/{self.time}", self.menu.turns + to_redo)
-            if redo:
-                self.menu.load(redo.get('menu'))
-                self.board.load(redo.get('board'))
-                self.render()
-            else:
-                del_top_line(2)
-                print(colored("No backup !", 'red'))
+    def hint_labels(self):
+        """
+        Rang des coups analysés par la réflexion de l'IA, affiché à la place
+        des indices, et les meilleurs coups dans le menu
+
+        :return: dict - Square index -> glyph (None without analysis)
+        """
+        self.menu.analysis = ''
+        ponderer = self.ponderer
+        if ponderer is None or not self.board.hints or ponderer.key \
+                != self.board.get_hash(self.menu.player):
+            return None
+
+        ranking = ponderer.ranking()
+        self.menu.analysis = ', '.join(
+            f"{Board.notation(self.board.geometry.pose(index))} {score:+d}"
+            for index, score in ranking[:MENU_HINTS])
+        return {index: colored(str(rank), 'cyan', attrs=['bold'])
+                for rank, (index, _) in enumerate(ranking[:RANKED_HINTS], 1)}
+
+    def goto(self, ply: int) -> None:
+        """
+        Replace la partie au ply donné de l'historique, en mémoire : les
+        coups sont annulés avec `Board.unmake_move` (pile des coups du
+        plateau) et rejoués avec `Board.make_move` depuis `record.moves`
+
+        :param int ply: Ply number (0 = starting position)
+        :return: None
+        """
+        record = self.record
+        played = sum(1 for move in record.moves[:record.cursor]
+                     if move is not PASS)
+        if played != self.board.ply:
+            # pile incomplète (position chargée) : reconstruction
+            x_bits, o_bits, _ = record.position_at(ply)
+            self.board.load_bits(x_bits, o_bits)
+            record.cursor = ply
+        while record.cursor > ply:
+            record.cursor -= 1
+            if record.moves[record.cursor] is not PASS:
+                self.board.unmake_move()
+        while record.cursor < ply:
+            move = record.moves[record.cursor]
+            if move is not PASS:
+                self.board.make_move(move, record.player_at(record.cursor))
+            record.cursor += 1
+
+        self.menu.turns = ply + 1
+        self.menu.player = record.player_at(ply)
+        self.menu.pawns = self.board.count()
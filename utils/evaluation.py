@@ -0,0 +1,443 @@
+"""Evaluation heuristique des positions.
+
+Une évaluation est une somme pondérée de termes, chacun étant une
+différence entre le joueur au trait et son adversaire. Les termes sont
+des fonctions enregistrées dans `TERMS` (et `BATCH_TERMS` pour leur version
+NumPy) : on peut en ajouter, ou en désactiver un avec un poids nul.
+"""
+from typing import Union
+
+from .bitboard import DIRECTIONS, Geometry, legal_moves, popcount
+from .vector import legal_moves as batch_legal_moves, np, shift
+
+
+DEFAULT_WEIGHTS = {
+    'corners': 25,
+    'x_squares': -10,
+    'c_squares': -4,
+    'edges': 2,
+    'mobility': 5,
+    'frontier': -2,
+    'stable': 8,
+    'parity': 3,
+}
+
+# termes dont le nombre de cases concernées grandit avec le plateau : leur
+# poids est ramené à celui d'un plateau 8x8
+SCALED_TERMS = ('edges', 'mobility', 'frontier', 'stable')
+
+# au-delà (plus de 10x10), `evaluate_batch` n'utilise plus NumPy
+BATCH_MAX_SIZE = 100
+
+
+class SquareClasses:
+    """Masques des cases par catégorie, du plus prometteur au moins bon
+
+    **Classes**:
+        - corners = coins
+        - edges = bords, hors cases C
+        - inner = intérieur, hors cases X
+        - c_squares = cases du bord adjacentes à un coin
+        - x_squares = cases en diagonale d'un coin
+    """
+    __slots__ = ('corners', 'edges', 'inner', 'c_squares', 'x_squares',
+                 'ordered')
+
+    def __init__(self, geometry: Geometry):
+        width, height = geometry.width, geometry.height
+        last_row, last_col = height - 1, width - 1
+
+        def bit(row: int, col: int) -> int:
+            return 1 << geometry.index(row, col)
+
+        corners = c_squares = x_squares = 0
+        for row, col, d_row, d_col in ((0, 0, 1, 1),
+                                       (0, last_col, 1, -1),
+                                       (last_row, 0, -1, 1),
+                                       (last_row, last_col, -1, -1)):
+            corners |= bit(row, col)
+            c_squares |= bit(row + d_row, col) | bit(row, col + d_col)
+            x_squares |= bit(row + d_row, col + d_col)
+
+        border = 0
+        for row in range(height):
+            for col in range(width):
+                if row in (0, last_row) or col in (0, last_col):
+                    border |= bit(row, col)
+
+        self.corners: int = corners
+        self.c_squares: int = c_squares & ~corners
+        self.x_squares: int = x_squares
+        self.edges: int = border & ~(corners | c_squares)
+        self.inner: int = geometry.full & ~(border | x_squares)
+        self.ordered: tuple = (self.corners, self.edges, self.inner,
+                               self.c_squares, self.x_squares)
+
+
+_CLASSES: dict = {}
+
+
+def get_square_classes(geometry: Geometry) -> SquareClasses:
+    classes = _CLASSES.get(geometry)
+    if classes is None:
+        classes = _CLASSES[geometry] = SquareClasses(geometry)
+    return classes
+
+
+def step(geometry: Geometry, bits: int, direction: int) -> int:
+    """
+    Décale des bits d'une case dans une direction, sans débordement
+
+    :param Geometry geometry: Board geometry
+    :param int bits: Bitboard
+    :param int direction: Index in DIRECTIONS / geometry.shifts
+    :return: int - Shifted bitboard
+    """
+    offset, mask = geometry.shifts[direction]
+    if offset > 0:
+        return (bits << offset) & mask
+    return (bits >> -offset) & mask
+
+
+class Evaluation:
+    """Fonction d'évaluation pour une taille de plateau
+
+    Les poids non indiqués sont ceux de `DEFAULT_WEIGHTS`, adaptés à la
+    taille du plateau pour les termes de `SCALED_TERMS`.
+    """
+    __slots__ = ('geometry', 'classes', 'weights', 'corners', 'axes',
+                 'parity_empties', 'arrays')
+
+    def __init__(self, geometry: Geometry,
+                 weights: Union[dict, None] = None):
+        self.geometry: Geometry = geometry
+        self.classes: SquareClasses = get_square_classes(geometry)
+
+        scale = 8 / max(geometry.width, geometry.height)
+        self.weights: dict = {
+            name: weight * scale if name in SCALED_TERMS else weight
+            for name, weight in DEFAULT_WEIGHTS.items()
+        }
+        self.weights.update(weights or {})
+        for name in self.weights:
+            if name not in TERMS:
+                raise ValueError(f"Unknown evaluation term: {name}")
+
+        # coin, case X et cases C de chaque coin
+        width, height = geometry.width, geometry.height
+        self.corners: list = []
+        for row, col, d_row, d_col in ((0, 0, 1, 1),
+                                       (0, width - 1, 1, -1),
+                                       (height - 1, 0, -1, 1),
+                                       (height - 1, width - 1, -1, -1)):
+            self.corners.append((
+                1 << geometry.index(row, col),
+                1 << geometry.index(row + d_row, col + d_col),
+                1 << geometry.index(row + d_row, col)
+                | 1 << geometry.index(row, col + d_col)))
+
+        # les 4 axes : directions opposées (index de geometry.shifts),
+        # lignes de l'axe et cases au bord de l'axe
+        self.axes: list = []
+        full = geometry.full
+        for forward, backward in ((6, 1), (4, 3), (7, 0), (5, 2)):
+            has_previous = step(geometry, full, forward)
+            lines = []
+            for start in range(geometry.size):
+                if has_previous >> start & 1:
+                    continue  # la ligne ne commence pas ici
+                line, bit = 0, 1 << start
+                while bit:
+                    line |= bit
+                    bit = step(geometry, bit, forward)
+                lines.append(line)
+            edges = full & ~(has_previous & step(geometry, full, backward))
+            self.axes.append((forward, backward, lines, edges))
+
+        self.parity_empties: int = geometry.size // 3
+        self.arrays: dict = {}
+
+    def evaluate(self, own: int, opp: int,
+                 moves: Union[int, None] = None) -> int:
+        """
+        Evalue une position
+
+        :param int own: Bitboard of the player to move
+        :param int opp: Bitboard of the opponent
+        :param int moves: Legal moves of the player to move, if known
+        :return: int - Score from the point of view of `own`
+        """
+        total = 0.0
+        for name, weight in self.weights.items():
+            if weight:
+                total += weight * TERMS[name](self, own, opp, moves)
+        return int(round(total))
+
+    def terms(self, own: int, opp: int) -> dict:
+        """
+        Détail de l'évaluation, terme par terme (avant pondération)
+
+        :param int own: Bitboard of the player to move
+        :param int opp: Bitboard of the opponent
+        :return: dict - Value of each term
+        """
+        return {name: TERMS[name](self, own, opp, None)
+                for name in self.weights}
+
+    def evaluate_batch(self, positions: list) -> list:
+        """
+        Evalue un lot de positions en un appel : avec NumPy, les termes de
+        `BATCH_TERMS` sont calculés sur tout le lot à la fois, les autres
+        position par position (tous au-delà de `BATCH_MAX_SIZE` cases, où
+        les bitboards sont plus rapides). Les scores sont ceux de
+        `evaluate`.
+
+        :param list positions: (own, opp) bitboards of each position
+        :return: list - Scores
+        """
+        positions = list(positions)
+        totals = [0.0] * len(positions)
+        arrays = None
+        vectorized = np is not None \
+            and self.geometry.size <= BATCH_MAX_SIZE
+        for name, weight in self.weights.items():
+            if not weight:
+                continue
+            batch = BATCH_TERMS.get(name) if vectorized else None
+            if batch is not None:
+                if arrays is None:
+                    arrays = self.to_arrays(positions)
+                values = batch(self, *arrays).tolist()
+            else:
+                term = TERMS[name]
+                values = [term(self, own, opp, None) for own, opp in positions]
+            for index, value in enumerate(values):
+                totals[index] += weight * value
+        return [int(round(total)) for total in totals]
+
+    def to_arrays(self, positions: list) -> tuple:
+        """
+        Convertit des positions en deux tableaux booléens
+        (len(positions), height, width)
+
+        :param list positions: (own, opp) bitboards
+        :return: tuple - (own, opp) arrays
+        """
+        geometry = self.geometry
+        length = (geometry.size + 7) // 8
+        shape = (len(positions), geometry.height, geometry.width)
+        arrays = []
+        for side in (0, 1):
+            data = b''.join(position[side].to_bytes(length, 'little')
+                            for position in positions)
+            bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8)
+                                 .reshape(len(positions), length),
+                                 axis=1, bitorder='little')
+            arrays.append(bits[:, :geometry.size].reshape(shape)
+                          .astype(bool))
+        return tuple(arrays)
+
+    def mask(self, bits: int):
+        """
+        Tableau booléen (height, width) d'un masque, gardé en cache
+
+        :param int bits: Bitboard
+        :return: Boolean array
+        """
+        array = self.arrays.get(bits)
+        if array is None:
+            array = self.arrays[bits] = self.to_arrays([(bits, 0)])[0][0]
+        return array
+
+
+def filled_axes(evaluation: Evaluation, occupied: int) -> list:
+    """
+    Pour chaque axe, cases dont la ligne est pleine ou qui touchent le bord
+
+    :param Evaluation evaluation: Evaluation of the board size
+    :param int occupied: Bitboard of the occupied squares
+    :return: list - (forward direction, backward direction, bitboard)
+    """
+    fixed = []
+    for forward, backward, lines, edges in evaluation.axes:
+        filled = edges
+        for line in lines:
+            if not line & ~occupied:
+                filled |= line
+        fixed.append((forward, backward, filled))
+    return fixed
+
+
+def stable_discs(evaluation: Evaluation, own: int, opp: int,
+                 fixed: Union[list, None] = None) -> int:
+    """
+    Pions de `own` qui ne pourront plus être retournés : sur chacun des 4
+    axes, la ligne est pleine, ou le pion touche le bord ou un pion stable
+    de sa couleur (calcul jusqu'à stabilisation, en partant des coins)
+
+    :param Evaluation evaluation: Evaluation of the board size
+    :param int own: Bitboard of the player
+    :param int opp: Bitboard of the opponent
+    :param list fixed: Result of `filled_axes`, if already computed
+    :return: int - Bitboard of the stable pawns of `own`
+    """
+    geometry = evaluation.geometry
+    if fixed is None:
+        fixed = filled_axes(evaluation, own | opp)
+
+    stable = 0
+    while True:
+        found = own
+        for forward, backward, filled in fixed:
+            found &= filled | step(geometry, stable, forward) \
+                | step(geometry, stable, backward)
+            if not found:
+                return stable
+        if found == stable:
+            return stable
+        stable = found
+
+
+def corners(evaluation: Evaluation, own: int, opp: int, moves) -> int:
+    squares = evaluation.classes.corners
+    return popcount(own & squares) - popcount(opp & squares)
+
+
+def x_squares(evaluation: Evaluation, own: int, opp: int, moves) -> int:
+    """Cases X dont le coin est encore vide"""
+    occupied = own | opp
+    value = 0
+    for corner, square, _ in evaluation.corners:
+        if not corner & occupied:
+            value += bool(own & square) - bool(opp & square)
+    return value
+
+
+def c_squares(evaluation: Evaluation, own: int, opp: int, moves) -> int:
+    """Cases C dont le coin est encore vide"""
+    occupied = own | opp
+    value = 0
+    for corner, _, squares in evaluation.corners:
+        if not corner & occupied:
+            value += popcount(own & squares) - popcount(opp & squares)
+    return value
+
+
+def edges(evaluation: Evaluation, own: int, opp: int, moves) -> int:
+    squares = evaluation.classes.edges
+    return popcount(own & squares) - popcount(opp & squares)
+
+
+def mobility(evaluation: Evaluation, own: int, opp: int, moves) -> int:
+    geometry = evaluation.geometry
+    if moves is None:
+        moves = legal_moves(geometry, own, opp)
+    return popcount(moves) - popcount(legal_moves(geometry, opp, own))
+
+
+def frontier(evaluation: Evaluation, own: int, opp: int, moves) -> int:
+    """Pions voisins d'une case vide"""
+    geometry = evaluation.geometry
+    empty = geometry.full & ~(own | opp)
+    near = 0
+    for direction in range(len(geometry.shifts)):
+        near |= step(geometry, empty, direction)
+    return popcount(own & near) - popcount(opp & near)
+
+
+def stable(evaluation: Evaluation, own: int, opp: int, moves) -> int:
+    """Pions stables (sans coin occupé, on néglige les rares pions stables
+    par lignes pleines, ce qui évite le calcul en début de partie)"""
+    occupied = own | opp
+    if not occupied & evaluation.classes.corners:
+        return 0
+    fixed = filled_axes(evaluation, occupied)
+    return popcount(stable_discs(evaluation, own, opp, fixed)) \
+        - popcount(stable_discs(evaluation, opp, own, fixed))
+
+
+def parity(evaluation: Evaluation, own: int, opp: int, moves) -> int:
+    """Dernier coup au joueur au trait si le nombre de cases vides est
+    impair (seulement en fin de partie)"""
+    empties = evaluation.geometry.size - popcount(own | opp)
+    if empties > evaluation.parity_empties:
+        return 0
+    return 1 if empties & 1 else -1
+
+
+TERMS = {
+    'corners': corners,
+    'x_squares': x_squares,
+    'c_squares': c_squares,
+    'edges': edges,
+    'mobility': mobility,
+    'frontier': frontier,
+    'stable': stable,
+    'parity': parity,
+}
+
+
+def batch_count(evaluation: Evaluation, own, opp, bits: int):
+    mask = evaluation.mask(bits)
+    return np.count_nonzero(own[:, mask], axis=1) \
+        - np.count_nonzero(opp[:, mask], axis=1)
+
+
+def batch_corner_squares(evaluation: Evaluation, own, opp, kind: int):
+    value = np.zeros(len(own), dtype=np.int64)
+    for squares in evaluation.corners:
+        corner = evaluation.mask(squares[0])
+        empty = ~(own[:, corner] | opp[:, corner])[:, 0]
+        value += empty * batch_count(evaluation, own, opp, squares[kind])
+    return value
+
+
+def batch_frontier(evaluation: Evaluation, own, opp):
+    empty = ~(own | opp)
+    near = np.zeros_like(empty)
+    for d_row, d_col in DIRECTIONS:
+        near |= shift(empty, d_row, d_col)
+    return (own & near).sum(axis=(1, 2)) - (opp & near).sum(axis=(1, 2))
+
+
+def batch_parity(evaluation: Evaluation, own, opp):
+    empties = evaluation.geometry.size - (own | opp).sum(axis=(1, 2))
+    return np.where(empties > evaluation.parity_empties, 0,
+                    np.where(empties & 1, 1, -1))
+
+
+# versions NumPy des termes, sur des tableaux (n, height, width)
+BATCH_TERMS = {
+    'corners': lambda evaluation, own, opp: batch_count(
+        evaluation, own, opp, evaluation.classes.corners),
+    'x_squares': lambda evaluation, own, opp: batch_corner_squares(
+        evaluation, own, opp, 1),
+    'c_squares': lambda evaluation, own, opp: batch_corner_squares(
+        evaluation, own, opp, 2),
+    'edges': lambda evaluation, own, opp: batch_count(
+        evaluation, own, opp, evaluation.classes.edges),
+    'mobility': lambda evaluation, own, opp: batch_legal_moves(
+        own, opp).sum(axis=(1, 2)) - batch_legal_moves(
+        opp, own).sum(axis=(1, 2)),
+    'frontier': batch_frontier,
+    'parity': batch_parity,
+}
+
+
+_EVALUATIONS: dict = {}
+
+
+def get_evaluation(geometry: Geometry,
+                   weights: Union[dict, None] = None) -> Evaluation:
+    """
+    Retourne l'évaluation (partagée) d'une taille de plateau
+
+    :param Geometry geometry: Board geometry
+    :param dict weights: Weights replacing the default ones
+    :return: Evaluation
+    """
+    key = (geometry, tuple(sorted((weights or {}).items())))
+    evaluation = _EVALUATIONS.get(key)
+    if evaluation is None:
+        evaluation = _EVALUATIONS[key] = Evaluation(geometry, weights)
+    return evaluation
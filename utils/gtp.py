@@ -0,0 +1,269 @@
+"""Mode moteur non interactif, sur le modèle du protocole GTP.
+
+Les commandes sont lues sur l'entrée standard, une par ligne, et chaque
+réponse est écrite sur la sortie standard sans effacement d'écran ni code
+couleur : ``= résultat`` en cas de succès, ``? erreur`` sinon, suivi d'une
+ligne vide (avec le numéro de la commande s'il est fourni, ex: ``3 genmove
+o`` -> ``=3 D3``).
+
+**Commandes**:
+    - protocol_version, name, version, known_command, list_commands, quit
+    - boardsize N, clear_board
+    - play COULEUR COUP (ex: ``play o D3``, ``play x pass``)
+    - genmove COULEUR, analyze [COULEUR], undo
+    - showboard, final_score
+    - position CASES COULEUR (cases ligne par ligne, ``x``, ``o`` ou ``.``)
+    - player DESCRIPTION (IA utilisée, ex: ``player mcts:time=1``)
+
+Usage : ``python -m utils.gtp --player alphabeta:time=0.5``
+"""
+import argparse
+import inspect
+import string
+import sys
+from typing import Union
+
+from .board import Board
+from .endgame import EndgameSolver
+from .players import close_player, make_player
+from .record import PASS
+from .search import AlphaBeta
+
+
+NAME = 'reversi'
+VERSION = '1.0'
+PROTOCOL_VERSION = '2'
+
+
+class GTPError(Exception):
+    """Commande refusée, le message est renvoyé après ``?``"""
+
+
+class GTPEngine:
+    """Interprète des commandes texte sur une partie
+
+    `history` contient les coups joués (joueur, index de case ou None pour
+    une passe) : `undo` les annule avec `Board.unmake_move` et rend le
+    trait au joueur du coup annulé.
+    """
+    __slots__ = ('board', 'player', 'history', 'ai', 'running')
+
+    COMMANDS = ('protocol_version', 'name', 'version', 'known_command',
+                'list_commands', 'quit', 'boardsize', 'clear_board', 'play',
+                'genmove', 'analyze', 'undo', 'showboard', 'final_score',
+                'position', 'player')
+
+    def __init__(self, size: int = 8, ai=None):
+        self.ai = ai if ai is not None \
+            else EndgameSolver(player=AlphaBeta())
+        self.board: Board = Board(size, size)
+        self.player: str = 'o'
+        self.history: list = []
+        self.running: bool = True
+        self.clear_board()
+
+    def execute(self, line: str) -> Union[str, None]:
+        """
+        Exécute une ligne de commande
+
+        :param str line: Command line
+        :return: str - Response (None for an empty line or a comment)
+        """
+        line = line.split('#', 1)[0].strip()
+        if not line:
+            return None
+
+        words = line.split()
+        ident = ''
+        if words[0].isdigit():
+            ident = words.pop(0)
+        if not words:
+            return None
+
+        command, args = words[0].lower(), words[1:]
+        try:
+            if command not in self.COMMANDS:
+                raise GTPError("unknown command")
+            method = getattr(self, f"cmd_{command}")
+            try:
+                inspect.signature(method).bind(*args)
+            except TypeError:
+                raise GTPError("wrong number of arguments") from None
+            result = method(*args)
+        except (GTPError, ValueError, OSError) as error:
+            return f"?{ident} {error}\n\n"
+        return f"={ident} {result or ''}".rstrip() + "\n\n"
+
+    def run(self, stdin=None, stdout=None) -> None:
+        """
+        Lit les commandes jusqu'à `quit` ou la fin de l'entrée
+
+        :return: None
+        """
+        stdin = stdin if stdin is not None else sys.stdin
+        stdout = stdout if stdout is not None else sys.stdout
+        for line in stdin:
+            response = self.execute(line)
+            if response is not None:
+                stdout.write(response)
+                stdout.flush()
+            if not self.running:
+                break
+
+    def close(self) -> None:
+        """
+        Libère les ressources de l'IA (processus, livre)
+
+        :return: None
+        """
+        close_player(self.ai)
+
+    def clear_board(self) -> None:
+        self.board.make_board()
+        self.player = 'o'
+        self.history = []
+
+    def parse_color(self, color: str) -> str:
+        color = color.lower()
+        if color in ('x', 'black', 'b'):
+            return 'x'
+        if color in ('o', 'white', 'w'):
+            return 'o'
+        raise GTPError(f"invalid color: {color}")
+
+    def play(self, player: str, index: Union[int, None]) -> None:
+        """
+        Joue un coup (ou une passe) de `player`
+
+        :param str player: Player
+        :param index: Square index or None (pass)
+        :return: None
+        """
+        if index is not PASS:
+            self.board.make_move(index, player)
+        self.history.append((player, index))
+        self.player = 'x' if player == 'o' else 'o'
+
+    def cmd_protocol_version(self) -> str:
+        return PROTOCOL_VERSION
+
+    def cmd_name(self) -> str:
+        return NAME
+
+    def cmd_version(self) -> str:
+        return VERSION
+
+    def cmd_known_command(self, command: str) -> str:
+        return 'true' if command in self.COMMANDS else 'false'
+
+    def cmd_list_commands(self) -> str:
+        return '\n'.join(self.COMMANDS)
+
+    def cmd_quit(self) -> None:
+        self.running = False
+
+    def cmd_boardsize(self, size: str) -> None:
+        size = int(size)
+        if size < 4 or size > 26 or size % 2:
+            raise GTPError("size must be even, between 4 and 26")
+        self.board = Board(size, size)
+        self.clear_board()
+
+    def cmd_clear_board(self) -> None:
+        self.clear_board()
+
+    def cmd_play(self, color: str, move: str) -> None:
+        player = self.parse_color(color)
+        moves = self.board.moves[Board.PLAYERS.index(player)]
+        if move.lower() == 'pass':
+            if moves:
+                raise GTPError("illegal move: pass")
+            return self.play(player, PASS)
+
+        pose = Board.parser(move)
+        if not pose or not self.board.is_on_board(pose) \
+                or not moves >> self.board.geometry.index(*pose) & 1:
+            raise GTPError(f"illegal move: {move}")
+        self.play(player, self.board.geometry.index(*pose))
+
+    def cmd_genmove(self, color: str) -> str:
+        player = self.parse_color(color)
+        if not self.board.moves[Board.PLAYERS.index(player)]:
+            self.play(player, PASS)
+            return 'pass'
+        pose = self.ai.search(self.board, player).move
+        self.play(player, self.board.geometry.index(*pose))
+        return Board.notation(pose)
+
+    def cmd_analyze(self, color: Union[str, None] = None) -> str:
+        player = self.parse_color(color) if color else self.player
+        result = self.ai.search(self.board, player)
+        move = Board.notation(result.move) if result.move else 'pass'
+        return f"{move} score {result.score} depth {result.depth} " \
+               f"nodes {result.nodes} nps {result.nps} " \
+               f"time {result.elapsed:.3f}"
+
+    def cmd_undo(self) -> None:
+        if not self.history:
+            raise GTPError("cannot undo")
+        player, index = self.history.pop()
+        if index is not PASS:
+            self.board.unmake_move()
+        self.player = player
+
+    def cmd_showboard(self) -> str:
+        board = self.board
+        cells = board.cells().decode().replace('p', '.')
+        lines = ['   ' + ' '.join(string.ascii_uppercase[:board.width])]
+        for row in range(board.height):
+            line = cells[row * board.width:(row + 1) * board.width]
+            lines.append(f"{row + 1:>2} " + ' '.join(line))
+        pawns = board.count()
+        lines.append(f"x {pawns[0]} o {pawns[1]}, {self.player} to play")
+        return '\n' + '\n'.join(lines)
+
+    def cmd_final_score(self) -> str:
+        pawns = self.board.count()
+        if pawns[0] == pawns[1]:
+            return '0'
+        winner = 'X' if pawns[0] > pawns[1] else 'O'
+        return f"{winner}+{abs(pawns[0] - pawns[1])}"
+
+    def cmd_position(self, cells: str, color: str) -> None:
+        board = self.board
+        player = self.parse_color(color)
+        if len(cells) != board.geometry.size:
+            raise GTPError(f"expected {board.geometry.size} cells")
+        bits = [0, 0]
+        for index, cell in enumerate(cells.lower()):
+            if cell in 'xo':
+                bits[Board.PLAYERS.index(cell)] |= 1 << index
+            elif cell not in '.-':
+                raise GTPError(f"invalid cell: {cell}")
+        board.load_bits(*bits)
+        self.player = player
+        self.history = []
+
+    def cmd_player(self, spec: str) -> None:
+        ai = make_player(spec)  # description invalide : IA inchangée
+        self.close()
+        self.ai = ai
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Mode moteur (type GTP)")
+    parser.add_argument('--player', default=None, help="IA utilisée "
+                        "(ex: alphabeta:time=0.5, mcts:simulations=2000)")
+    parser.add_argument('-s', '--size', type=int, default=8)
+    args = parser.parse_args()
+
+    ai = make_player(args.player) if args.player else None
+    engine = GTPEngine(args.size, ai)
+    try:
+        engine.run()
+    finally:
+        engine.close()
+
+
+if __name__ == '__main__':
+    main()
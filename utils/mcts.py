@@ -0,0 +1,323 @@
+"""Recherche arborescente Monte-Carlo (UCT) avec parties aléatoires.
+
+Elle n'a pas besoin de fonction d'évaluation, ce qui la rend utile sur les
+grands plateaux. Avec plusieurs processus, chacun développe son propre arbre
+sur la même position (parallélisation à la racine) et les visites des coups
+de la racine sont additionnées : plus de coeurs, plus de parties simulées
+dans le même temps.
+"""
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Union
+
+from .bitboard import Geometry, flips, get_geometry, iter_bits, legal_moves, \
+    popcount
+from .board import Board
+from .search import SearchResult
+
+
+PASS = -1
+
+# profondeur (en plies) jusqu'où l'on cherche la nouvelle position dans
+# l'ancien arbre : notre coup, la réponse et une éventuelle passe
+REUSE_DEPTH = 3
+
+
+class Node:
+    """Noeud de l'arbre : une position et les statistiques de ses parties
+
+    `wins` est compté pour le joueur qui a joué le coup menant au noeud
+    (une nulle vaut une demi-victoire).
+    """
+    __slots__ = ('move', 'parent', 'children', 'untried', 'own', 'opp',
+                 'color', 'visits', 'wins')
+
+    def __init__(self, geometry: Geometry, own: int, opp: int, color: int,
+                 move: int = PASS, parent: Union['Node', None] = None):
+        self.move: int = move
+        self.parent: Union[Node, None] = parent
+        self.children: list = []
+        self.own: int = own
+        self.opp: int = opp
+        self.color: int = color
+        self.visits: int = 0
+        self.wins: float = 0.0
+
+        moves = legal_moves(geometry, own, opp)
+        if moves:
+            self.untried: list = list(iter_bits(moves))
+        elif legal_moves(geometry, opp, own):
+            self.untried = [PASS]
+        else:
+            self.untried = []  # fin de partie
+
+
+class MCTS:
+    """IA Monte-Carlo : sélection UCT, expansion d'un noeud par simulation,
+    partie aléatoire jusqu'à la fin puis rétro-propagation du résultat
+
+    Le budget est `time_limit` (secondes) et/ou `simulations` (parties). Le
+    sous-arbre de la position suivante est conservé d'un coup à l'autre.
+    Avec `workers` processus (un par défaut, None pour tous les coeurs),
+    chacun cherche de son côté et les statistiques de la racine sont
+    additionnées. Le score du résultat est le pourcentage de victoires du
+    coup choisi.
+    """
+    __slots__ = ('time_limit', 'simulations', 'exploration', 'workers',
+                 'seed', 'random', 'geometry', 'root', 'depth', 'executor')
+
+    def __init__(self, time_limit: Union[float, None] = 1.0,
+                 simulations: Union[int, None] = None,
+                 exploration: float = 1.4, workers: Union[int, None] = 1,
+                 seed: Union[int, str, None] = None):
+        self.time_limit: Union[float, None] = time_limit
+        self.simulations: Union[int, None] = simulations
+        self.exploration: float = exploration
+        self.workers: int = workers or os.cpu_count() or 1
+        self.seed: Union[int, str, None] = seed
+        self.random = random.Random(seed)
+
+        self.geometry: Union[Geometry, None] = None
+        self.root: Union[Node, None] = None
+        self.depth: int = 0
+        self.executor: Union[ProcessPoolExecutor, None] = None
+
+    def search(self, board: Board, player: str) -> SearchResult:
+        """
+        Cherche le meilleur coup de `player` dans le budget imparti
+
+        :param Board board: Position to search
+        :param str player: Player to move ('x' or 'o')
+        :return: SearchResult - Most visited move (None if player must pass)
+        """
+        start = time.perf_counter()
+        geometry = board.geometry
+        color = Board.PLAYERS.index(player)
+        own, opp = board.bits[color], board.bits[1 - color]
+        if not legal_moves(geometry, own, opp):
+            return SearchResult(None, 0, 0, 0, time.perf_counter() - start)
+
+        if self.workers > 1:
+            stats, simulations, depth = self.search_parallel(geometry, own,
+                                                             opp, color)
+        else:
+            deadline = start + self.time_limit \
+                if self.time_limit is not None else None
+            stats, simulations, depth = self.run(geometry, own, opp, color,
+                                                 deadline, self.simulations)
+
+        move = max(stats, key=lambda index: stats[index][0])
+        visits, wins = stats[move]
+        return SearchResult(geometry.pose(move), round(100 * wins / visits),
+                            depth, simulations, time.perf_counter() - start)
+
+    def search_parallel(self, geometry: Geometry, own: int, opp: int,
+                        color: int) -> tuple:
+        """
+        Lance une recherche par processus et additionne les statistiques des
+        coups de la racine
+
+        :return: tuple - (stats, simulations, depth), see `run`
+        """
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+
+        simulations = None
+        if self.simulations is not None:
+            simulations = -(-self.simulations // self.workers)
+        tasks = [(slot, geometry.width, geometry.height, own, opp, color,
+                  self.time_limit, simulations, self.exploration, self.seed)
+                 for slot in range(self.workers)]
+
+        stats, total, depth = {}, 0, 0
+        for result in self.executor.map(run_worker, tasks):
+            for index, (visits, wins) in result[0].items():
+                old_visits, old_wins = stats.get(index, (0, 0.0))
+                stats[index] = (old_visits + visits, old_wins + wins)
+            total += result[1]
+            depth = max(depth, result[2])
+        return stats, total, depth
+
+    def run(self, geometry: Geometry, own: int, opp: int, color: int,
+            deadline: Union[float, None],
+            simulations: Union[int, None]) -> tuple:
+        """
+        Simule des parties depuis la position jusqu'à épuisement du budget
+        (au moins une)
+
+        :param float deadline: perf_counter() value where the search stops
+        :param int simulations: Maximum number of simulations
+        :return: tuple - (stats, simulations, depth) where stats maps each
+            root move to (visits, wins)
+        """
+        root = self.reuse(geometry, own, opp, color)
+        self.depth = 0
+        done = 0
+        while not done \
+                or ((simulations is None or done < simulations)
+                    and (deadline is None
+                         or time.perf_counter() < deadline)):
+            self.simulate(root)
+            done += 1
+            if simulations is None and deadline is None:
+                break  # aucun budget : une seule simulation
+
+        stats = {child.move: (child.visits, child.wins)
+                 for child in root.children}
+        return stats, done, self.depth
+
+    def reuse(self, geometry: Geometry, own: int, opp: int,
+              color: int) -> Node:
+        """
+        Retourne le noeud de la position dans l'arbre précédent s'il existe,
+        sinon un nouvel arbre, et en fait la racine
+
+        :return: Node - New root
+        """
+        if self.root is not None and self.geometry is geometry:
+            nodes = [self.root]
+            for _ in range(REUSE_DEPTH + 1):
+                for node in nodes:
+                    if node.own == own and node.opp == opp \
+                            and node.color == color:
+                        node.parent = None
+                        self.root = node
+                        return node
+                nodes = [child for node in nodes for child in node.children]
+
+        self.geometry = geometry
+        self.root = Node(geometry, own, opp, color)
+        return self.root
+
+    def simulate(self, root: Node) -> None:
+        """
+        Une simulation : sélection, expansion, partie aléatoire et
+        rétro-propagation
+
+        :param Node root: Root of the tree
+        :return: None
+        """
+        node = root
+        depth = 0
+        while not node.untried and node.children:
+            node = self.select(node)
+            depth += 1
+        if node.untried:
+            node = self.expand(node)
+            depth += 1
+        if depth > self.depth:
+            self.depth = depth
+
+        winner = self.rollout(node.own, node.opp, node.color)
+        while node is not None:
+            node.visits += 1
+            if winner is None:
+                node.wins += 0.5
+            elif winner != node.color:  # le joueur qui a mené au noeud
+                node.wins += 1
+            node = node.parent
+
+    def select(self, node: Node) -> Node:
+        """
+        Choisit l'enfant qui maximise la borne UCT
+
+        :param Node node: Fully expanded node
+        :return: Node
+        """
+        log = math.log(node.visits)
+        exploration = self.exploration
+        return max(node.children,
+                   key=lambda child: child.wins / child.visits
+                   + exploration * math.sqrt(log / child.visits))
+
+    def expand(self, node: Node) -> Node:
+        """
+        Ajoute un enfant pour un coup pas encore essayé, tiré au hasard
+
+        :param Node node: Node with untried moves
+        :return: Node - New child
+        """
+        untried = node.untried
+        index = untried.pop(self.random.randrange(len(untried)))
+        if index == PASS:
+            child = Node(self.geometry, node.opp, node.own, 1 - node.color,
+                         PASS, node)
+        else:
+            flipped = flips(self.geometry, node.own, node.opp, index)
+            child = Node(self.geometry, node.opp & ~flipped,
+                         node.own | flipped | (1 << index), 1 - node.color,
+                         index, node)
+        node.children.append(child)
+        return child
+
+    def rollout(self, own: int, opp: int, color: int) -> Union[int, None]:
+        """
+        Joue une partie au hasard jusqu'à la fin
+
+        :param int own: Bitboard of the player to move
+        :param int opp: Bitboard of the opponent
+        :param int color: Index of the player to move
+        :return: int - Index of the winner (None for a draw)
+        """
+        geometry = self.geometry
+        randrange = self.random.randrange
+        passed = False
+        while True:
+            moves = legal_moves(geometry, own, opp)
+            if moves:
+                indexes = list(iter_bits(moves))
+                index = indexes[randrange(len(indexes))]
+                flipped = flips(geometry, own, opp, index)
+                own, opp = opp & ~flipped, own | flipped | (1 << index)
+                passed = False
+            elif passed:
+                break
+            else:
+                own, opp = opp, own
+                passed = True
+            color = 1 - color
+
+        # `color` joue les pions de `own`
+        diff = popcount(own) - popcount(opp)
+        if not diff:
+            return None
+        return color if diff > 0 else 1 - color
+
+    def close(self) -> None:
+        """
+        Arrête les processus de la recherche parallèle
+
+        :return: None
+        """
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+
+# arbres des processus de la recherche parallèle, un par numéro de processus
+# logique : conservés d'un coup à l'autre pour réutiliser les sous-arbres
+_TREES: dict = {}
+
+
+def run_worker(task: tuple) -> tuple:
+    """
+    Recherche dans un processus du pool
+
+    :param tuple task: (slot, width, height, own, opp, color, time limit,
+        simulations, exploration, seed)
+    :return: tuple - (stats, simulations, depth), see `MCTS.run`
+    """
+    start = time.perf_counter()
+    slot, width, height, own, opp, color, time_limit, simulations, \
+        exploration, seed = task
+
+    tree = _TREES.get(slot)
+    if tree is None or tree.exploration != exploration:
+        tree = _TREES[slot] = MCTS(time_limit, simulations, exploration, 1,
+                                   None if seed is None else f"{seed}-{slot}")
+    deadline = start + time_limit if time_limit is not None else None
+    return tree.run(get_geometry(width, height), own, opp, color, deadline,
+                    simulations)
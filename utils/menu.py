@@ -3,8 +3,12 @@ from modules.termcolor import colored
 from .pawn import Pawn
 
 
+COMMAND_REGEX = re.compile(r"(\*[A-Za-z]\*)", re.MULTILINE)
+
+
 class Menu:
-    __slots__ = ('turns', 'player', 'pawns', 'commands', 'hints', 'size')
+    __slots__ = ('turns', 'player', 'pawns', 'commands', 'hints', 'size',
+                 'search', 'analysis')
 
     def __init__(self, turns: int = 1, player: str = 'o', pawns=None,
                  commands=None, hints: bool = False, size: int = 8):
@@ -19,6 +23,8 @@ class Menu:
         self.commands: dict = commands
         self.hints: bool = hints
         self.size: int = size
+        self.search: str = ''
+        self.analysis: str = ''
 
     def add_command(self, name: str, description: str, disabled=False) -> None:
         """
@@ -73,8 +79,7 @@ class Menu:
         menu += "\n"
         menu += "Commands :\n"
         for name, description in self.commands.items():
-            regex = r"(\*[A-Za-z]\*)"
-            match = re.findall(regex, description, re.MULTILINE)[0]
+            match = COMMAND_REGEX.findall(description)[0]
             description = description.replace(match, colored(match, 'yellow'))
             description = description.replace('*', '')
             menu += f"   {colored(name, 'yellow')}: {description}\n"
@@ -82,5 +87,9 @@ class Menu:
         menu += "Hints : " + (
             colored("On", 'green') if self.hints else colored("Off", 'red')
         )
+        if self.hints and self.analysis:
+            menu += "\n" + colored("Best : ", 'yellow') + self.analysis
+        if self.search:
+            menu += "\n" + colored("AI : ", 'yellow') + self.search
 
         return menu
@@ -1,6 +1,10 @@
 from modules.termcolor import colored
 
 
+GLYPHS: dict = {}
+PAWNS: dict = {}
+
+
 class Pawn:
     """Class pour les pions
 
@@ -10,12 +14,22 @@ class Pawn:
         - o = pion du joueur O
         - h = indice
         - p = coup possible
+
+    Les pions sont immuables et partagés (`Pawn('x') is Pawn('x')`), l'affichage
+    des indices dépend du plateau (`Board.hints`) et non du pion.
     """
-    __slots__ = ('status', 'visible')
+    __slots__ = ('status',)
 
-    def __init__(self, status: str):
-        self.status: str = status
-        self.visible: bool = False
+    def __new__(cls, status: str):
+        pawn = PAWNS.get(status)
+        if pawn is None:
+            pawn = super().__new__(cls)
+            object.__setattr__(pawn, 'status', status)
+            PAWNS[status] = pawn
+        return pawn
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Pawn is immutable")
 
     def get_player(self) -> str:
         """
@@ -25,25 +39,35 @@ class Pawn:
         """
         return self.status
 
-    def set_visible(self, visibility: bool):
+    @staticmethod
+    def glyph(status: str, visible: bool) -> str:
         """
-        Affiche ou non les coups possibles
+        Retourne le caractère coloré d'un statut, mis en cache
 
-        :param bool visibility: is hint enabled ?
+        :param str status: Pawn status
+        :param bool visible: Are hints displayed ?
+        :return: str
         """
-        self.visible = visibility
+        glyph = GLYPHS.get((status, visible))
+        if glyph is None:
+            if status == 'x':
+                glyph = colored('X', 'red')
+            elif status == 'o':
+                glyph = colored('O', 'green')
+            elif status == 'p' and visible:
+                glyph = colored('?', 'cyan', attrs=['bold', 'blink'])
+            elif status == 'h' and visible:
+                glyph = colored('.', 'cyan', attrs=['bold', 'blink'])
+            else:
+                glyph = '.'
+            GLYPHS[(status, visible)] = glyph
+        return glyph
 
     def __str__(self):
-        if self.status == 'x':
-            return colored('X', 'red')
-        elif self.status == 'o':
-            return colored('O', 'green')
-        elif self.status == 'p' and self.visible:
-            return colored('?', 'cyan', attrs=['bold', 'blink'])
-        elif self.status == 'h' and self.visible:
-            return colored('.', 'cyan', attrs=['bold', 'blink'])
-        return '.'
+        return self.glyph(self.status, False)
+
+    def __reduce__(self):
+        return Pawn, (self.status,)
 
     def __repr__(self):
-        return "<utils.pawn.Pawn status='%s' visible='%s'>" \
-               % (self.status, self.visible)
+        return "<utils.pawn.Pawn status='%s'>" % self.status
@@ -0,0 +1,253 @@
+"""Perft : nombre de positions feuilles à la profondeur N depuis le départ.
+
+Sert de test de non-régression (les comptes doivent être exactement ceux de
+`REFERENCE`) et de banc d'essai du chemin critique du plateau.
+
+Usage :
+    ``python -m utils.perft --sizes 8 --depth 6``
+    ``python -m utils.perft --bench --save benchmarks/perft.json``
+    ``python -m utils.perft --bench --check benchmarks/perft.json``
+    ``python -m utils.perft --check`` (comptes de `REFERENCE` seulement)
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+from typing import Union
+
+from .bitboard import flips, iter_bits, legal_moves
+from .board import Board
+
+
+SIZES = list(range(4, 27, 2))
+
+# une passe compte pour un ply, une partie terminée avant la profondeur
+# demandée compte pour une feuille (comptes indiqués pour O qui commence)
+REFERENCE = {
+    4: [4, 12, 44, 128, 424, 1256, 3624, 9116],
+    6: [4, 12, 56, 244, 1364, 7604, 47740, 308716],
+    8: [4, 12, 56, 244, 1396, 8200, 55092, 390216],
+    10: [4, 12, 56, 244, 1396, 8200, 55180, 392268],
+    12: [4, 12, 56, 244, 1396, 8200, 55180, 392268],
+    14: [4, 12, 56, 244, 1396, 8200, 55180, 392268],
+    16: [4, 12, 56, 244, 1396, 8200, 55180, 392268],
+    18: [4, 12, 56, 244, 1396, 8200, 55180, 392268],
+    20: [4, 12, 56, 244, 1396, 8200, 55180, 392268],
+    22: [4, 12, 56, 244, 1396, 8200, 55180, 392268],
+    24: [4, 12, 56, 244, 1396, 8200, 55180, 392268],
+    26: [4, 12, 56, 244, 1396, 8200, 55180, 392268],
+}
+
+MODES = ('board', 'bitboard')
+
+
+def perft_board(board: Board, player: int, depth: int,
+                passed: bool = False) -> int:
+    """
+    Perft sur le chemin du jeu : `make_move`/`unmake_move` et coups
+    possibles tenus à jour par le plateau
+
+    :param Board board: Position
+    :param int player: Index of the player to move (0 = X, 1 = O)
+    :param int depth: Remaining depth
+    :param bool passed: Did the previous player pass ?
+    :return: int - Number of leaves
+    """
+    if depth == 0:
+        return 1
+
+    moves = board.moves[player]
+    if not moves:
+        if passed:
+            return 1
+        return perft_board(board, 1 - player, depth - 1, True)
+
+    if depth == 1:
+        return bin(moves).count('1')
+
+    name = Board.PLAYERS[player]
+    leaves = 0
+    for index in iter_bits(moves):
+        board.make_move(index, name)
+        leaves += perft_board(board, 1 - player, depth - 1)
+        board.unmake_move()
+    return leaves
+
+
+def perft_bitboard(geometry, own: int, opp: int, depth: int,
+                   passed: bool = False) -> int:
+    """
+    Perft directement sur les bitboards, comme la recherche alpha-beta
+
+    :return: int - Number of leaves
+    """
+    if depth == 0:
+        return 1
+
+    moves = legal_moves(geometry, own, opp)
+    if not moves:
+        if passed:
+            return 1
+        return perft_bitboard(geometry, opp, own, depth - 1, True)
+
+    if depth == 1:
+        return bin(moves).count('1')
+
+    leaves = 0
+    for index in iter_bits(moves):
+        flipped = flips(geometry, own, opp, index)
+        leaves += perft_bitboard(geometry, opp & ~flipped,
+                                 own | flipped | (1 << index), depth - 1)
+    return leaves
+
+
+def perft(size: int, depth: int, mode: str = 'board') -> int:
+    """
+    Compte les feuilles à `depth` plies de la position de départ
+
+    :param int size: Board size
+    :param int depth: Depth
+    :param str mode: 'board' (make/unmake) or 'bitboard'
+    :return: int - Number of leaves
+    """
+    board = Board(size, size)
+    board.make_board()
+    player = Board.PLAYERS.index('o')
+    if mode == 'board':
+        return perft_board(board, player, depth)
+    elif mode == 'bitboard':
+        return perft_bitboard(board.geometry, board.bits[player],
+                              board.bits[1 - player], depth)
+    raise ValueError(f"Unknown mode: {mode}")
+
+
+def bench(size: int, depth: int, mode: str,
+          min_time: float = 0.2) -> dict:
+    """
+    Mesure un perft : meilleur temps sur des passages répétés pendant au
+    moins `min_time` secondes, puis mémoire allouée dans un dernier passage
+    sous tracemalloc (qui ralentit trop pour mesurer le temps)
+
+    :return: dict - Benchmark result
+    """
+    gc.collect()
+    elapsed, runs, total = float('inf'), 0, 0.0
+    while total < min_time or not runs:
+        start = time.perf_counter()
+        leaves = perft(size, depth, mode)
+        spent = time.perf_counter() - start
+        elapsed = min(elapsed, spent)
+        total += spent
+        runs += 1
+
+    blocks = sys.getallocatedblocks()
+    tracemalloc.start()
+    perft(size, depth, mode)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    gc.collect()
+
+    return {
+        'size': size,
+        'depth': depth,
+        'mode': mode,
+        'leaves': leaves,
+        'runs': runs,
+        'elapsed': round(elapsed, 6),
+        'nps': int(leaves / elapsed),
+        'peak_bytes': peak,
+        'leaked_blocks': max(0, sys.getallocatedblocks() - blocks)
+    }
+
+
+def check(results: list, baseline: Union[dict, None],
+          tolerance: float) -> list:
+    """
+    Compare les résultats aux comptes de référence et à la base de temps
+
+    :param list results: Benchmark results
+    :param dict baseline: Saved results ('<mode>-<size>-<depth>' -> result)
+    :param float tolerance: Allowed slowdown (0.2 = 20 %)
+    :return: list - Regressions found (empty if none)
+    """
+    errors = []
+    for result in results:
+        size, depth = result['size'], result['depth']
+        if depth <= len(REFERENCE[size]) \
+                and result['leaves'] != REFERENCE[size][depth - 1]:
+            errors.append(f"{size}x{size} depth {depth} ({result['mode']}): "
+                          f"{result['leaves']} leaves, expected "
+                          f"{REFERENCE[size][depth - 1]}")
+
+        saved = (baseline or {}).get(f"{result['mode']}-{size}-{depth}")
+        if saved and result['nps'] < saved['nps'] * (1 - tolerance):
+            errors.append(f"{size}x{size} depth {depth} ({result['mode']}): "
+                          f"{result['nps']} n/s, baseline {saved['nps']} n/s")
+    return errors
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Perft et benchmark")
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--depth', type=int, default=None,
+                        help="profondeur (défaut : 6)")
+    parser.add_argument('--mode', choices=MODES + ('all',), default='all')
+    parser.add_argument('--bench', action='store_true',
+                        help="mesure aussi la mémoire allouée")
+    parser.add_argument('--save', metavar='PATH',
+                        help="enregistre les résultats comme référence")
+    parser.add_argument('--check', metavar='PATH', nargs='?', const='',
+                        help="compare à une référence enregistrée (sans "
+                        "fichier ou s'il manque : comptes de REFERENCE)")
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    args = parser.parse_args()
+
+    depth = args.depth or 6
+    modes = MODES if args.mode == 'all' else (args.mode,)
+
+    results = []
+    for size in args.sizes:
+        if size not in REFERENCE:
+            parser.error(f"size must be even, between 4 and 26: {size}")
+        for mode in modes:
+            if args.bench:
+                result = bench(size, depth, mode)
+            else:
+                start = time.perf_counter()
+                leaves = perft(size, depth, mode)
+                result = {'size': size, 'depth': depth, 'mode': mode,
+                          'leaves': leaves,
+                          'elapsed': round(time.perf_counter() - start, 6)}
+                result['nps'] = int(leaves / result['elapsed'])
+            results.append(result)
+            print(json.dumps(result))
+
+    # les comptes sont toujours comparés à `REFERENCE`, les temps
+    # seulement s'il y a une référence enregistrée (propre à la machine)
+    baseline = None
+    if args.check and os.path.isfile(args.check):
+        with open(args.check) as fp:
+            baseline = json.load(fp)
+    elif args.check:
+        print(f"No baseline {args.check}, checking leaf counts only",
+              file=sys.stderr)
+    errors = check(results, baseline, args.tolerance)
+
+    if args.save:
+        directory = os.path.dirname(args.save)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.save, 'w') as fp:
+            json.dump({f"{result['mode']}-{result['size']}-{result['depth']}":
+                       result for result in results}, fp, indent=4)
+
+    for error in errors:
+        print(f"REGRESSION: {error}", file=sys.stderr)
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+import random
+import time
+from typing import Union
+
+from .bitboard import flips, iter_bits, popcount
+from .board import Board
+from .book import BookPlayer, OpeningBook
+from .endgame import EndgameSolver
+from .mcts import MCTS
+from .search import AlphaBeta, SearchResult
+from .transposition import TranspositionTable
+
+
+class RandomPlayer:
+    """Joue un coup possible au hasard"""
+    __slots__ = ('random',)
+
+    def __init__(self, seed: Union[int, None] = None):
+        self.random = random.Random(seed)
+
+    def search(self, board: Board, player: str) -> SearchResult:
+        start = time.perf_counter()
+        board.set_valid_poses(player)
+        poses = board.get_valid_poses()
+        move = self.random.choice(poses) if poses else None
+        return SearchResult(move, 0, 0, 0, time.perf_counter() - start)
+
+
+class GreedyPlayer:
+    """Joue le coup qui retourne le plus de pions (au hasard parmi les
+    ex aequo)"""
+    __slots__ = ('random',)
+
+    def __init__(self, seed: Union[int, None] = None):
+        self.random = random.Random(seed)
+
+    def search(self, board: Board, player: str) -> SearchResult:
+        start = time.perf_counter()
+        color = Board.PLAYERS.index(player)
+        own, opp = board.bits[color], board.bits[1 - color]
+        best, moves = -1, []
+        for index in iter_bits(board.moves[color]):
+            count = popcount(flips(board.geometry, own, opp, index))
+            if count > best:
+                best, moves = count, [index]
+            elif count == best:
+                moves.append(index)
+        if not moves:
+            return SearchResult(None, 0, 0, 0, time.perf_counter() - start)
+        move = board.geometry.pose(self.random.choice(moves))
+        return SearchResult(move, best, 1, len(moves),
+                            time.perf_counter() - start)
+
+
+PLAYERS = {
+    'random': RandomPlayer,
+    'greedy': GreedyPlayer,
+    'alphabeta': AlphaBeta,
+    'mcts': MCTS,
+}
+
+# noms courts des options de `make_player`
+OPTIONS = {
+    'time': ('time_limit', float),
+    'nodes': ('node_limit', int),
+    'depth': ('max_depth', int),
+    'simulations': ('simulations', int),
+    'exploration': ('exploration', float),
+    'workers': ('workers', int),
+    'memory': ('table', lambda value: TranspositionTable(
+        memory=int(float(value) * 1024 * 1024))),
+}
+
+# options acceptées par chaque joueur (`book` et `endgame` par tous)
+PLAYER_OPTIONS = {
+    'random': (),
+    'greedy': (),
+    'alphabeta': ('time', 'nodes', 'depth', 'workers', 'memory'),
+    'mcts': ('time', 'simulations', 'exploration', 'workers'),
+}
+
+
+def make_player(spec: str, seed: Union[int, None] = None):
+    """
+    Construit un joueur à partir de sa description, de la forme
+    `nom[:option=valeur,...]` (ex: `alphabeta:time=0.1,depth=4`, la table
+    de transposition `memory` étant en Mo, ou `mcts:simulations=2000`).
+    L'option `book=fichier` fait jouer d'abord le livre d'ouvertures,
+    `endgame=N` résout exactement les positions à N cases vides ou moins,
+    `workers=N` répartit la recherche sur N processus (alphabeta, mcts).
+
+    :param str spec: Player description
+    :param int seed: Seed of the random players
+    :return: Player with a `search(board, player)` method
+    """
+    name, _, options = spec.partition(':')
+    if name not in PLAYERS:
+        raise ValueError(f"Unknown player: {name}")
+
+    kwargs = {}
+    if name in ('random', 'greedy', 'mcts'):
+        kwargs['seed'] = seed
+
+    book = endgame = None
+    for option in filter(None, options.split(',')):
+        key, _, value = option.partition('=')
+        if key == 'book':
+            book = value
+            continue
+        if key == 'endgame':
+            endgame = int(value)
+            continue
+        if key not in PLAYER_OPTIONS[name]:
+            raise ValueError(f"Unknown option for {name}: {key}")
+        argument, cast = OPTIONS[key]
+        kwargs[argument] = None if value == 'none' else cast(value)
+
+    if ('node_limit' in kwargs or 'simulations' in kwargs) \
+            and 'time_limit' not in kwargs:
+        kwargs['time_limit'] = None  # budget en noeuds uniquement
+
+    player = PLAYERS[name](**kwargs)
+    if endgame is not None:
+        player = EndgameSolver(endgame, player)
+    if book is not None:
+        return BookPlayer(OpeningBook(book), player)
+    return player
+
+
+def close_player(player) -> None:
+    """
+    Libère les ressources (processus, livre) d'un joueur et des joueurs
+    auxquels il délègue
+
+    :param player: Player built by `make_player`
+    :return: None
+    """
+    while player is not None:
+        if hasattr(player, 'close'):
+            player.close()
+        player = getattr(player, 'player', None)
@@ -0,0 +1,153 @@
+"""Réflexion pendant le tour du joueur humain.
+
+Pendant que l'humain choisit son coup, un thread cherche avec l'IA la
+réponse à chacun de ses coups possibles, du plus prometteur au moins
+prometteur pour lui. Chaque recherche donne à la fois le score du coup
+humain (classement des indices) et la réponse de l'IA, jouée aussitôt si
+l'humain choisit ce coup.
+
+`input()` libère le GIL : le thread a le processeur pour lui pendant la
+saisie.
+"""
+import threading
+from typing import Union
+
+from .bitboard import iter_bits, popcount
+from .board import Board
+from .evaluation import get_evaluation
+from .search import FINAL_SCALE, SearchResult
+
+
+def interrupt(ai) -> None:
+    """
+    Fait s'arrêter au plus vite la recherche en cours de `ai` et des
+    joueurs auxquels il délègue (échéance dépassée)
+
+    :param ai: Player with a `search(board, player)` method
+    :return: None
+    """
+    player = ai
+    while player is not None:
+        if hasattr(player, 'deadline'):
+            player.deadline = 0.0
+        player = getattr(player, 'player', None)
+
+
+class Ponderer:
+    """Analyse en arrière-plan des coups du joueur au trait
+
+    `results` associe à chaque coup analysé (index de case) son score du
+    point de vue du joueur humain et la réponse de l'IA (None si l'IA doit
+    passer).
+    """
+    __slots__ = ('ai', 'board', 'player', 'key', 'results', 'thread',
+                 'stopped', 'lock')
+
+    def __init__(self, ai):
+        self.ai = ai
+        self.board: Union[Board, None] = None
+        self.player: Union[str, None] = None
+        self.key: Union[int, None] = None
+        self.results: dict = {}
+        self.thread: Union[threading.Thread, None] = None
+        self.stopped: bool = True
+        self.lock = threading.Lock()
+
+    def start(self, board: Board, player: str) -> None:
+        """
+        Commence l'analyse de la position, sauf si elle est déjà en cours
+
+        :param Board board: Position (copied)
+        :param str player: Human player to move
+        :return: None
+        """
+        key = board.get_hash(player)
+        if key == self.key and (self.thread is not None and
+                                self.thread.is_alive() or self.done()):
+            return
+        self.stop()
+        self.board = board.copy()
+        self.player = player
+        self.key = key
+        self.results = {}
+        self.stopped = False
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self) -> None:
+        """
+        Cherche la réponse de l'IA à chaque coup du joueur, dans l'ordre de
+        l'évaluation statique
+
+        :return: None
+        """
+        board, human = self.board, self.player
+        color = Board.PLAYERS.index(human)
+        adv = 'x' if human == 'o' else 'o'
+        evaluation = get_evaluation(board.geometry)
+
+        children = []
+        for index in iter_bits(board.moves[color]):
+            child = board.copy()
+            child.make_move(index, human)
+            own, opp = child.bits[1 - color], child.bits[color]
+            # score de l'adversaire : le plus faible d'abord
+            children.append((evaluation.evaluate(own, opp,
+                                                 child.moves[1 - color]),
+                             index, child))
+        children.sort(key=lambda entry: entry[:2])
+
+        for _, index, child in children:
+            if self.stopped:
+                return
+            reply = None
+            if child.moves[1 - color]:
+                reply = self.ai.search(child, adv)
+                score = -reply.score
+            elif child.moves[color]:
+                score = self.ai.search(child, human).score
+            else:
+                pawns = child.count()
+                score = (pawns[color] - pawns[1 - color]) * FINAL_SCALE
+            if self.stopped:
+                return  # recherche interrompue, résultat incomplet
+            with self.lock:
+                self.results[index] = (score, reply)
+
+    def stop(self, index: Union[int, None] = None) \
+            -> Union[SearchResult, None]:
+        """
+        Arrête l'analyse et retourne la réponse prévue au coup `index`
+
+        :param int index: Square index played by the human (optional)
+        :return: SearchResult - AI reply, or None if it was not analysed
+        """
+        self.stopped = True
+        thread = self.thread
+        while thread is not None and thread.is_alive():
+            interrupt(self.ai)
+            thread.join(0.01)
+        self.thread = None
+
+        entry = self.results.get(index) if index is not None else None
+        if index is not None:
+            self.results = {}
+            self.key = None
+        return entry[1] if entry is not None else None
+
+    def ranking(self) -> list:
+        """
+        Coups analysés du meilleur au moins bon pour le joueur
+
+        :return: list - (square index, score)
+        """
+        with self.lock:
+            ranked = [(index, score)
+                      for index, (score, _) in self.results.items()]
+        ranked.sort(key=lambda entry: (-entry[0], entry[1]))
+        return ranked
+
+    def done(self) -> bool:
+        return self.board is not None \
+            and len(self.results) == popcount(
+                self.board.moves[Board.PLAYERS.index(self.player)])
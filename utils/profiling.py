@@ -0,0 +1,367 @@
+"""Instrumentation optionnelle du chemin critique d'une partie.
+
+Un `Profiler` remplace, le temps de la partie, les méthodes mesurées par
+des versions chronométrées (génération des coups, coups joués,
+enregistrement, rendu, recherche de l'IA) puis remet les originales en
+place : sans profiler, le code exécuté est exactement le même, sans aucun
+test ni appel supplémentaire.
+
+Les temps sont inclusifs (le rendu compte la génération des coups qu'il
+appelle). Le rapport donne, tour par tour et pour la partie, le nombre
+d'appels et le temps de chaque point de mesure, les pions retournés, les
+noeuds par seconde et le taux de succès des tables de transposition de
+l'IA. Le mode `cprofile` enregistre en plus un profil complet (fichier
+``.prof``), le mode `tracemalloc` la mémoire à chaque tour et les lignes
+qui allouent le plus.
+
+Usage : ``python main.py --profile report.json [--capture cprofile]``
+"""
+import cProfile
+import csv
+import functools
+import json
+import os
+import time
+import tracemalloc
+from typing import Union
+
+from .bitboard import popcount
+from .board import Board
+from .record import GameRecord
+from .render import Renderer
+
+
+CAPTURES = ('cprofile', 'tracemalloc')
+
+# lignes les plus coûteuses en mémoire gardées dans le rapport
+TOP_ALLOCATIONS = 10
+
+
+class Profiler:
+    """Chronomètres et compteurs posés sur des méthodes de classes
+
+    `timers` associe à chaque point de mesure [appels, secondes],
+    `counters` des quantités (pions retournés...). Un tour commence et se
+    termine autour de la méthode donnée à `track_turns`.
+    """
+    __slots__ = ('capture', 'timers', 'counters', 'searches', 'tables',
+                 'turns', 'patches', 'depth', 'snapshot', 'started',
+                 'elapsed', 'profile', 'allocations')
+
+    def __init__(self, capture: Union[str, None] = None):
+        if capture is not None and capture not in CAPTURES:
+            raise ValueError(f"Unknown capture mode: {capture}")
+
+        self.capture: Union[str, None] = capture
+        self.timers: dict = {}
+        self.counters: dict = {}
+        # recherches de l'IA : dict par recherche
+        self.searches: list = []
+        self.tables: list = []
+        self.turns: list = []
+        # (classe, nom, méthode d'origine) à remettre en place
+        self.patches: list = []
+        self.depth: int = 0
+        self.snapshot: Union[tuple, None] = None
+        self.started: Union[float, None] = None
+        self.elapsed: float = 0.0
+        self.profile: Union[cProfile.Profile, None] = None
+        self.allocations: list = []
+
+    def instrument(self, cls: type, name: str, label: str,
+                   count=None) -> None:
+        """
+        Chronomètre la méthode `name` de `cls`
+
+        :param type cls: Class
+        :param str name: Method name
+        :param str label: Name of the timer
+        :param count: Function giving a quantity to add to the counter
+            `label` from the return value (optional)
+        :return: None
+        """
+        method = getattr(cls, name)
+        timer = self.timers.setdefault(label, [0, 0.0])
+        counters = self.counters
+        perf_counter = time.perf_counter
+
+        @functools.wraps(method)
+        def timed(*args, **kwargs):
+            start = perf_counter()
+            result = method(*args, **kwargs)
+            timer[1] += perf_counter() - start
+            timer[0] += 1
+            if count is not None:
+                counters[label] = counters.get(label, 0) + count(result)
+            return result
+
+        self.patch(cls, name, timed)
+
+    def instrument_ai(self, ai) -> None:
+        """
+        Chronomètre les recherches de l'IA et note pour chacune les noeuds,
+        la profondeur et les accès aux tables de transposition
+
+        :param ai: Player with a `search(board, player)` method
+        :return: None
+        """
+        # tables du joueur et des joueurs auxquels il délègue (livre,
+        # solveur de fin de partie)
+        player = ai
+        while player is not None:
+            table = getattr(player, 'table', None)
+            if table is not None and table not in self.tables:
+                self.tables.append(table)
+            player = getattr(player, 'player', None)
+
+        cls = type(ai)
+        method = cls.search
+        timer = self.timers.setdefault('ai', [0, 0.0])
+        searches = self.searches
+        tables = self.tables
+
+        @functools.wraps(method)
+        def search(this, board: Board, player: str):
+            probes = sum(table.probes for table in tables)
+            hits = sum(table.hits for table in tables)
+            start = time.perf_counter()
+            result = method(this, board, player)
+            elapsed = time.perf_counter() - start
+            timer[0] += 1
+            timer[1] += elapsed
+            probes = sum(table.probes for table in tables) - probes
+            hits = sum(table.hits for table in tables) - hits
+            searches.append({
+                'player': player,
+                'move': Board.notation(result.move) if result.move else None,
+                'score': result.score,
+                'depth': result.depth,
+                'nodes': result.nodes,
+                'elapsed': elapsed,
+                'nps': int(result.nodes / elapsed) if elapsed > 0 else 0,
+                'tt_probes': probes,
+                'tt_hits': hits,
+                'tt_hit_rate': hits / probes if probes else 0.0
+            })
+            return result
+
+        self.patch(cls, 'search', search)
+
+    def track_turns(self, cls: type, name: str, describe=None) -> None:
+        """
+        Fait de chaque appel (le plus externe) de `cls.name` un tour du
+        rapport
+
+        :param type cls: Class
+        :param str name: Method name
+        :param describe: Function giving extra fields of the turn from the
+            instance, called before the method (optional)
+        :return: None
+        """
+        method = getattr(cls, name)
+
+        @functools.wraps(method)
+        def turn(this, *args, **kwargs):
+            if self.depth:
+                return method(this, *args, **kwargs)
+            fields = describe(this) if describe is not None else {}
+            self.begin_turn()
+            self.depth += 1
+            try:
+                return method(this, *args, **kwargs)
+            finally:
+                self.depth -= 1
+                self.end_turn(fields)
+
+        self.patch(cls, name, turn)
+
+    def attach(self, engine) -> None:
+        """
+        Instrumente une partie de `utils.engine.Engine` : coups possibles,
+        coups joués, enregistrement, rendu et IA, un tour par action
+
+        :param Engine engine: Game engine
+        :return: None
+        """
+        self.instrument(Board, 'set_valid_poses', 'movegen')
+        self.instrument(Board, 'make_move', 'flip', popcount)
+        self.instrument(GameRecord, 'append', 'record')
+        self.instrument(type(engine), 'render', 'render')
+        self.instrument(Renderer, 'draw', 'draw')
+        self.instrument_ai(engine.ai)
+        self.track_turns(type(engine), 'get_action',
+                         lambda this: {'player': this.menu.player,
+                                       'ply': this.record.cursor})
+
+    def patch(self, cls: type, name: str, function) -> None:
+        self.patches.append((cls, name, cls.__dict__.get(name)))
+        setattr(cls, name, function)
+
+    def detach(self) -> None:
+        """
+        Remet en place les méthodes d'origine
+
+        :return: None
+        """
+        for cls, name, original in reversed(self.patches):
+            if original is None:
+                delattr(cls, name)  # méthode héritée
+            else:
+                setattr(cls, name, original)
+        self.patches = []
+
+    def start(self) -> None:
+        """
+        Démarre la mesure (et la capture cProfile ou tracemalloc)
+
+        :return: None
+        """
+        if self.capture == 'tracemalloc':
+            tracemalloc.start()
+        elif self.capture == 'cprofile':
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        self.started = time.perf_counter()
+
+    def stop(self) -> None:
+        """
+        Arrête la mesure et les captures, puis retire l'instrumentation
+
+        :return: None
+        """
+        if self.started is not None:
+            self.elapsed += time.perf_counter() - self.started
+            self.started = None
+        if self.profile is not None:
+            self.profile.disable()
+        if self.capture == 'tracemalloc' and tracemalloc.is_tracing():
+            statistics = tracemalloc.take_snapshot().statistics('lineno')
+            self.allocations = [
+                {'line': str(stat.traceback), 'size': stat.size,
+                 'count': stat.count}
+                for stat in statistics[:TOP_ALLOCATIONS]]
+            tracemalloc.stop()
+        self.detach()
+
+    def begin_turn(self) -> None:
+        self.snapshot = ({label: list(timer)
+                          for label, timer in self.timers.items()},
+                         dict(self.counters), len(self.searches),
+                         time.perf_counter())
+
+    def end_turn(self, fields: dict) -> None:
+        """
+        Ajoute au rapport ce qui a été mesuré depuis `begin_turn`
+
+        :param dict fields: Extra fields of the turn
+        :return: None
+        """
+        timers, counters, searches, start = self.snapshot
+        turn = {'turn': len(self.turns) + 1}
+        turn.update(fields)
+        turn['elapsed'] = time.perf_counter() - start
+        turn['timers'] = {
+            label: [timer[0] - timers.get(label, [0, 0.0])[0],
+                    timer[1] - timers.get(label, [0, 0.0])[1]]
+            for label, timer in self.timers.items()}
+        turn['counters'] = {label: value - counters.get(label, 0)
+                            for label, value in self.counters.items()}
+        turn['searches'] = self.searches[searches:]
+        if self.capture == 'tracemalloc' and tracemalloc.is_tracing():
+            turn['memory'], turn['memory_peak'] = \
+                tracemalloc.get_traced_memory()
+        self.turns.append(turn)
+
+    def totals(self) -> dict:
+        """
+        Totaux de la partie
+
+        :return: dict
+        """
+        nodes = sum(search['nodes'] for search in self.searches)
+        spent = sum(search['elapsed'] for search in self.searches)
+        probes = sum(search['tt_probes'] for search in self.searches)
+        hits = sum(search['tt_hits'] for search in self.searches)
+        elapsed = self.elapsed
+        if self.started is not None:
+            elapsed += time.perf_counter() - self.started
+        return {
+            'elapsed': elapsed,
+            'turns': len(self.turns),
+            'timers': {label: list(timer)
+                       for label, timer in self.timers.items()},
+            'counters': dict(self.counters),
+            'ai': {
+                'searches': len(self.searches),
+                'nodes': nodes,
+                'elapsed': spent,
+                'nps': int(nodes / spent) if spent > 0 else 0,
+                'tt_probes': probes,
+                'tt_hits': hits,
+                'tt_hit_rate': hits / probes if probes else 0.0
+            }
+        }
+
+    def report(self) -> dict:
+        report = {'game': self.totals(), 'turns': self.turns}
+        if self.allocations:
+            report['allocations'] = self.allocations
+        return report
+
+    def rows(self) -> list:
+        """
+        Une ligne par tour pour le rapport CSV (temps en secondes)
+
+        :return: list - Dicts with the same keys
+        """
+        labels = sorted(self.timers)
+        counters = sorted(self.counters)
+        rows = []
+        for turn in self.turns:
+            row = {'turn': turn['turn'], 'player': turn.get('player'),
+                   'ply': turn.get('ply'), 'elapsed': turn['elapsed']}
+            for label in labels:
+                calls, seconds = turn['timers'].get(label, [0, 0.0])
+                row[f"{label}_calls"] = calls
+                row[f"{label}_seconds"] = seconds
+            for label in counters:
+                row[label] = turn['counters'].get(label, 0)
+            searches = turn['searches']
+            nodes = sum(search['nodes'] for search in searches)
+            spent = sum(search['elapsed'] for search in searches)
+            probes = sum(search['tt_probes'] for search in searches)
+            hits = sum(search['tt_hits'] for search in searches)
+            row['nodes'] = nodes
+            row['nps'] = int(nodes / spent) if spent > 0 else 0
+            row['tt_hit_rate'] = hits / probes if probes else 0.0
+            if 'memory' in turn:
+                row['memory'] = turn['memory']
+                row['memory_peak'] = turn['memory_peak']
+            rows.append(row)
+        return rows
+
+    def write(self, path: str) -> None:
+        """
+        Ecrit le rapport : CSV (un tour par ligne) si `path` finit par
+        ``.csv``, JSON sinon ; le profil cProfile va dans ``<path>.prof``
+
+        :param str path: Report file
+        :return: None
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        if path.endswith('.csv'):
+            rows = self.rows()
+            fields = list(rows[0]) if rows else ['turn']
+            with open(path, 'w', newline='') as fp:
+                writer = csv.DictWriter(fp, fields, restval='')
+                writer.writeheader()
+                writer.writerows(rows)
+        else:
+            with open(path, 'w') as fp:
+                json.dump(self.report(), fp, indent=2)
+
+        if self.profile is not None:
+            self.profile.dump_stats(f"{os.path.splitext(path)[0]}.prof")
@@ -0,0 +1,391 @@
+"""Format compact des parties : taille de départ puis la liste des coups.
+
+Un fichier ``.rvr`` commence par un en-tête (``MAGIC``, largeur, hauteur,
+premier joueur) suivi d'enregistrements ajoutés au fil de la partie, chacun
+étant un entier variable (7 bits par octet) :
+
+    - 0 = le joueur passe
+    - 1 .. taille = coup sur la case ``valeur - 1`` (1 ou 2 octets)
+    - taille + 1 = point de reprise : ply, joueur au trait, bitboards X et O
+    - taille + 2 = retour au ply indiqué (coups annulés puis rejoués)
+"""
+import argparse
+import json
+import os
+import sys
+from typing import Tuple, Union
+
+from .bitboard import flips, get_geometry
+from .board import Board
+from .misc import load
+
+
+MAGIC = b'RVR1'
+EXTENSION = '.rvr'
+PASS = None
+
+
+def encode_varint(value: int) -> bytes:
+    data = bytearray()
+    while value >= 0x80:
+        data.append((value & 0x7F) | 0x80)
+        value >>= 7
+    data.append(value)
+    return bytes(data)
+
+
+def decode_varint(data: bytes, offset: int) -> Tuple[int, int]:
+    """
+    Lit un entier variable
+
+    :param bytes data: Encoded data
+    :param int offset: Position of the first byte
+    :return: tuple - (value, offset of the next record)
+    """
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, offset
+        shift += 7
+
+
+class GameRecord:
+    """Historique d'une partie sous forme de liste de coups
+
+    `moves` contient l'index de la case jouée à chaque ply (None pour une
+    passe). `cursor` est le ply de la position courante : les coups situés
+    après ont été annulés mais peuvent être rejoués tant qu'aucun nouveau
+    coup ne les remplace.
+    """
+    __slots__ = ('width', 'height', 'player', 'moves', 'cursor',
+                 'checkpoints', 'checkpoint_every', 'path')
+
+    def __init__(self, width: int, height: int, player: str = 'o',
+                 checkpoint_every: int = 0, path: Union[str, None] = None):
+        self.width: int = width
+        self.height: int = height
+        self.player: str = player
+        self.moves: list = []
+        self.cursor: int = 0
+        self.checkpoints: dict = {}
+        self.checkpoint_every: int = checkpoint_every
+        self.path: Union[str, None] = None
+
+        if path is not None:
+            self.attach(path)
+
+    @property
+    def geometry(self):
+        return get_geometry(self.width, self.height)
+
+    def attach(self, path: str) -> None:
+        """
+        Ecrit l'enregistrement complet dans `path`, puis y ajoute chaque
+        nouveau coup au fur et à mesure
+
+        :param str path: Record file
+        :return: None
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'wb') as fp:
+            fp.write(self.dumps())
+        self.path = path
+
+    def append(self, move: Union[int, None], board: Board = None) -> None:
+        """
+        Ajoute un coup (index de case ou None pour une passe) après la
+        position courante
+
+        :param move: Square index or None (pass)
+        :param Board board: Position after the move, used for checkpoints
+        :return: None
+        """
+        if self.cursor < len(self.moves) and self.moves[self.cursor] == move:
+            self.cursor += 1  # même coup que dans l'historique
+            return
+
+        data = b''
+        if self.cursor < len(self.moves):
+            del self.moves[self.cursor:]
+            for ply in [ply for ply in self.checkpoints if ply > self.cursor]:
+                del self.checkpoints[ply]
+            data += encode_varint(self.geometry.size + 2) \
+                + encode_varint(self.cursor)
+
+        self.moves.append(move)
+        self.cursor += 1
+        data += encode_varint(0 if move is PASS else move + 1)
+
+        if board is not None and self.checkpoint_every \
+                and self.cursor % self.checkpoint_every == 0:
+            checkpoint = (board.bits[0], board.bits[1],
+                          self.player_at(self.cursor))
+            self.checkpoints[self.cursor] = checkpoint
+            data += self.encode_checkpoint(self.cursor, checkpoint)
+
+        if self.path is not None:
+            try:
+                with open(self.path, 'ab') as fp:
+                    fp.write(data)
+            except OSError as error:
+                # fichier devenu inaccessible : la partie continue en mémoire
+                print(f"Game no longer saved to {self.path}: {error}",
+                      file=sys.stderr)
+                self.path = None
+
+    def player_at(self, ply: int) -> str:
+        """
+        Retourne le joueur au trait au ply donné
+
+        :param int ply: Ply number (0 = starting position)
+        :return: str
+        """
+        first = Board.PLAYERS.index(self.player)
+        return Board.PLAYERS[(first + ply) % 2]
+
+    def position_at(self, ply: int) -> Tuple[int, int, str]:
+        """
+        Reconstruit la position au ply donné en rejouant les coups depuis le
+        point de reprise le plus proche
+
+        :param int ply: Ply number (0 = starting position)
+        :return: tuple - (X bitboard, O bitboard, player to move)
+        """
+        if not 0 <= ply <= len(self.moves):
+            raise IndexError(f"No ply {ply} in this record")
+
+        start = max([0] + [checkpoint for checkpoint in self.checkpoints
+                           if checkpoint <= ply])
+        if start:
+            x_bits, o_bits, player = self.checkpoints[start]
+            bits = [x_bits, o_bits]
+            own = Board.PLAYERS.index(player)
+        else:
+            board = Board(self.width, self.height)
+            board.make_board()
+            bits = board.bits
+            own = Board.PLAYERS.index(self.player)
+            if 0 in self.checkpoints:
+                x_bits, o_bits, player = self.checkpoints[0]
+                bits = [x_bits, o_bits]
+                own = Board.PLAYERS.index(player)
+
+        geometry = self.geometry
+        for move in self.moves[start:ply]:
+            if move is not PASS:
+                flipped = flips(geometry, bits[own], bits[1 - own], move)
+                bits[own] |= flipped | (1 << move)
+                bits[1 - own] &= ~flipped
+            own = 1 - own
+
+        return bits[0], bits[1], Board.PLAYERS[own]
+
+    def board_at(self, ply: int) -> Tuple[Board, str]:
+        """
+        Retourne le plateau au ply donné et le joueur au trait
+
+        :param int ply: Ply number (0 = starting position)
+        :return: tuple - (Board, player to move)
+        """
+        x_bits, o_bits, player = self.position_at(ply)
+        board = Board(self.width, self.height)
+        board.load_bits(x_bits, o_bits)
+        return board, player
+
+    def encode_checkpoint(self, ply: int, checkpoint: tuple) -> bytes:
+        length = (self.geometry.size + 7) // 8
+        x_bits, o_bits, player = checkpoint
+        return encode_varint(self.geometry.size + 1) + encode_varint(ply) \
+            + bytes([Board.PLAYERS.index(player)]) \
+            + x_bits.to_bytes(length, 'little') \
+            + o_bits.to_bytes(length, 'little')
+
+    def dumps(self) -> bytes:
+        """
+        Encode l'enregistrement complet, coups annulés compris
+
+        :return: bytes
+        """
+        data = MAGIC + bytes([self.width, self.height,
+                              Board.PLAYERS.index(self.player)])
+        if 0 in self.checkpoints:
+            data += self.encode_checkpoint(0, self.checkpoints[0])
+        for ply, move in enumerate(self.moves, start=1):
+            data += encode_varint(0 if move is PASS else move + 1)
+            if ply in self.checkpoints:
+                data += self.encode_checkpoint(ply, self.checkpoints[ply])
+        return data
+
+    @classmethod
+    def loads(cls, data: bytes) -> 'GameRecord':
+        if data[:len(MAGIC)] != MAGIC:
+            raise ValueError("Not a game record")
+
+        offset = len(MAGIC)
+        width, height, first = data[offset:offset + 3]
+        offset += 3
+        record = cls(width, height, Board.PLAYERS[first])
+
+        size = record.geometry.size
+        length = (size + 7) // 8
+        while offset < len(data):
+            value, offset = decode_varint(data, offset)
+            if value <= size:
+                record.moves.append(PASS if value == 0 else value - 1)
+            elif value == size + 1:
+                ply, offset = decode_varint(data, offset)
+                player = Board.PLAYERS[data[offset]]
+                offset += 1
+                x_bits = int.from_bytes(data[offset:offset + length], 'little')
+                offset += length
+                o_bits = int.from_bytes(data[offset:offset + length], 'little')
+                offset += length
+                record.checkpoints[ply] = (x_bits, o_bits, player)
+            elif value == size + 2:
+                ply, offset = decode_varint(data, offset)
+                del record.moves[ply:]
+                for checkpoint in [checkpoint
+                                   for checkpoint in record.checkpoints
+                                   if checkpoint > ply]:
+                    del record.checkpoints[checkpoint]
+            else:
+                raise ValueError(f"Invalid record {value} at {offset}")
+
+        record.cursor = len(record.moves)
+        return record
+
+    @classmethod
+    def open(cls, path: str) -> 'GameRecord':
+        """
+        Charge un fichier et continue d'y ajouter les nouveaux coups
+
+        :param str path: Record file
+        :return: GameRecord
+        """
+        with open(path, 'rb') as fp:
+            record = cls.loads(fp.read())
+        record.path = path
+        return record
+
+    def __len__(self):
+        return len(self.moves)
+
+    def __repr__(self):
+        return "<utils.record.GameRecord size=%sx%s moves=%s cursor=%s>" \
+               % (self.width, self.height, len(self.moves), self.cursor)
+
+
+def convert_snapshots(path: str) -> GameRecord:
+    """
+    Convertit un dossier `games/<time>/` de sauvegardes JSON (une par tour)
+    en GameRecord, en déduisant chaque coup de la différence entre deux
+    tours consécutifs
+
+    :param str path: Directory of <turn>.json snapshots
+    :return: GameRecord
+    """
+    turns = sorted(int(name[:-5]) for name in os.listdir(path)
+                   if name.endswith('.json') and name[:-5].isdigit())
+    if not turns:
+        raise ValueError(f"No snapshot in {path}")
+
+    snapshots = [load(path, turn) for turn in turns]
+    for turn, snapshot in zip(turns, snapshots):
+        if not isinstance(snapshot, dict) \
+                or not isinstance(snapshot.get('board'), dict) \
+                or not snapshot['board'].get('grid') \
+                or not isinstance(snapshot.get('menu'), dict):
+            raise ValueError(f"Invalid snapshot {turn} in {path}")
+    first = snapshots[0]
+    grid = first.get('board').get('grid')
+
+    board = Board(len(grid[0]), len(grid))
+    board.load(first.get('board'))
+    record = GameRecord(board.width, board.height,
+                        first.get('menu').get('player'))
+
+    start = Board(board.width, board.height)
+    start.make_board()
+    if turns[0] != 1 or board.bits != start.bits:
+        record.checkpoints[0] = (board.bits[0], board.bits[1], record.player)
+
+    previous = board.bits
+    for turn, next_turn, snapshot in zip(turns, turns[1:], snapshots[1:]):
+        board.load(snapshot.get('board'))
+        placed = (board.bits[0] | board.bits[1]) & ~(previous[0] | previous[1])
+        plies = next_turn - turn
+
+        if placed & (placed - 1):
+            raise ValueError(f"More than one pawn placed between turns "
+                             f"{turn} and {next_turn} in {path}")
+        if not placed:
+            record.moves.extend([PASS] * plies)
+        else:
+            index = placed.bit_length() - 1
+            mover = 0 if board.bits[0] & placed else 1
+            # le joueur qui n'a pas posé de pion a passé son tour
+            passes = [PASS] * (plies - 1)
+            if record.player_at(len(record.moves)) == Board.PLAYERS[mover]:
+                record.moves.extend([index] + passes)
+            else:
+                record.moves.extend(passes + [index])
+        previous = board.bits
+
+    record.cursor = len(record.moves)
+    return record
+
+
+def convert_directory(games: str = 'games', remove: bool = False) -> list:
+    """
+    Convertit tous les dossiers de sauvegardes JSON de `games` en fichiers
+    `<time>.rvr` ; les dossiers vides ou invalides sont signalés et
+    laissés tels quels
+
+    :param str games: Games directory
+    :param bool remove: Remove the JSON snapshots once converted
+    :return: list - Paths of the written records
+    """
+    written = []
+    for name in sorted(os.listdir(games)):
+        directory = os.path.join(games, name)
+        if not os.path.isdir(directory):
+            continue
+
+        try:
+            record = convert_snapshots(directory)
+            record.attach(directory + EXTENSION)
+        except (ValueError, OSError) as error:
+            print(f"Skipped {directory}: {error}", file=sys.stderr)
+            continue
+        written.append(directory + EXTENSION)
+
+        if remove:
+            for snapshot in os.listdir(directory):
+                if snapshot.endswith('.json'):
+                    os.remove(os.path.join(directory, snapshot))
+            if not os.listdir(directory):
+                os.rmdir(directory)
+    return written
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Convertit les sauvegardes JSON en fichiers .rvr")
+    parser.add_argument('games', nargs='?', default='games')
+    parser.add_argument('--remove', action='store_true',
+                        help="supprime les sauvegardes JSON converties")
+    args = parser.parse_args()
+
+    for path in convert_directory(args.games, args.remove):
+        record = GameRecord.open(path)
+        print(json.dumps({'path': path, 'moves': len(record),
+                          'bytes': os.path.getsize(path)}))
+
+
+if __name__ == '__main__':
+    main()
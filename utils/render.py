@@ -0,0 +1,100 @@
+import platform
+import re
+import sys
+
+
+ANSI_REGEX = re.compile(r"\x1b\[[0-9;]*[A-Za-z]")
+
+CLEAR_SCREEN = "\x1b[2J\x1b[H"
+CLEAR_LINE_END = "\x1b[K"
+CLEAR_SCREEN_END = "\x1b[J"
+RESET = "\x1b[0m"
+
+
+def move_to(row: int, col: int) -> str:
+    return f"\x1b[{row + 1};{col + 1}H"
+
+
+class Renderer:
+    """Rendu différentiel dans le terminal
+
+    Une image est une liste de lignes, chaque ligne une liste de cellules
+    (chaînes avec leurs codes couleur). Seules les cellules qui ont changé
+    depuis l'image précédente sont réécrites, après un déplacement du
+    curseur, au lieu d'effacer et de tout réafficher.
+    """
+    __slots__ = ('stream', 'frame', 'widths')
+
+    def __init__(self, stream=None):
+        self.stream = stream if stream is not None else sys.stdout
+        self.frame: list = []
+        self.widths: dict = {}
+
+        if platform.system() == 'Windows':
+            import os
+            os.system('')  # active les séquences ANSI dans la console
+
+    def width(self, cell: str) -> int:
+        """
+        Retourne la largeur affichée d'une cellule (sans les codes couleur)
+
+        :param str cell: Cell to measure
+        :return: int
+        """
+        width = self.widths.get(cell)
+        if width is None:
+            if len(self.widths) > 4096:
+                self.widths.clear()
+            width = self.widths[cell] = len(ANSI_REGEX.sub('', cell))
+        return width
+
+    def reset(self) -> None:
+        """
+        Oublie l'image précédente : le prochain rendu sera complet
+
+        :return: None
+        """
+        self.frame = []
+
+    def draw(self, lines: list) -> None:
+        """
+        Affiche une nouvelle image en ne réécrivant que les différences avec
+        la précédente, puis place le curseur sous l'image
+
+        :param list lines: Lines of cells
+        :return: None
+        """
+        out = []
+        if not self.frame:
+            out.append(CLEAR_SCREEN)
+
+        for row, cells in enumerate(lines):
+            previous = self.frame[row] if row < len(self.frame) else None
+            if previous is None or len(previous) != len(cells):
+                out.append(move_to(row, 0) + RESET + ''.join(cells)
+                           + CLEAR_LINE_END)
+                continue
+
+            col = 0
+            writing = False
+            for position, (cell, old) in enumerate(zip(cells, previous)):
+                if cell != old:
+                    if not writing:
+                        out.append(move_to(row, col) + RESET)
+                        writing = True
+                    if self.width(cell) != self.width(old):
+                        # la suite de la ligne est décalée : on la réécrit
+                        out.append(''.join(cells[position:]) + CLEAR_LINE_END)
+                        break
+                    out.append(cell)
+                else:
+                    writing = False
+                col += self.width(cell)
+
+        for row in range(len(lines), len(self.frame)):
+            out.append(move_to(row, 0) + CLEAR_LINE_END)
+
+        out.append(move_to(len(lines), 0) + RESET + CLEAR_SCREEN_END)
+        self.stream.write(''.join(out))
+        self.stream.flush()
+        self.frame = [list(cells) for cells in lines]
@@ -0,0 +1,392 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Union
+
+from .bitboard import Geometry, flips, get_geometry, iter_bits, \
+    legal_moves, popcount
+from .board import Board
+from .evaluation import Evaluation, SquareClasses, get_evaluation, \
+    get_square_classes
+from .transposition import EXACT, LOWER, NO_MOVE, UPPER, TranspositionTable
+from .zobrist import ZobristKeys, get_keys
+
+
+INFINITY = 10 ** 9
+FINAL_SCALE = 10000
+
+
+class SearchTimeout(Exception):
+    """Levée quand le budget (temps ou noeuds) de la recherche est épuisé"""
+
+
+class SearchResult:
+    """Résultat d'une recherche : coup choisi et statistiques"""
+    __slots__ = ('move', 'score', 'depth', 'nodes', 'elapsed')
+
+    def __init__(self, move: Union[list, None], score: int, depth: int,
+                 nodes: int, elapsed: float):
+        self.move: Union[list, None] = move
+        self.score: int = score
+        self.depth: int = depth
+        self.nodes: int = nodes
+        self.elapsed: float = elapsed
+
+    @property
+    def nps(self) -> int:
+        return int(self.nodes / self.elapsed) if self.elapsed > 0 else 0
+
+    def export(self) -> dict:
+        return {
+            'move': self.move,
+            'score': self.score,
+            'depth': self.depth,
+            'nodes': self.nodes,
+            'elapsed': self.elapsed,
+            'nps': self.nps
+        }
+
+    def __str__(self):
+        return f"depth {self.depth}, {self.nodes} nodes, {self.nps} n/s"
+
+    def __repr__(self):
+        return "<utils.search.SearchResult move=%s score=%s depth=%s " \
+               "nodes=%s>" % (self.move, self.score, self.depth, self.nodes)
+
+
+class AlphaBeta:
+    """IA negamax avec élagage alpha-beta et approfondissement itératif
+
+    La recherche s'arrête à la fin de la dernière profondeur complète
+    lorsque `time_limit` (secondes) ou `node_limit` est atteint. La table de
+    transposition est conservée d'un coup à l'autre. Les feuilles sont
+    évaluées avec `utils.evaluation` (poids `weights`).
+
+    Avec `workers` processus, les coups de la racine sont répartis entre
+    eux à chaque profondeur (voir `search_parallel`) ; chaque processus
+    garde sa propre table de transposition de la taille de `table`.
+    """
+    __slots__ = ('time_limit', 'node_limit', 'max_depth', 'table',
+                 'weights', 'workers', 'geometry', 'classes', 'evaluation',
+                 'keys', 'nodes', 'deadline', 'limited', 'executor',
+                 'generation')
+
+    def __init__(self, time_limit: Union[float, None] = 1.0,
+                 node_limit: Union[int, None] = None, max_depth: int = 64,
+                 table: Union[TranspositionTable, None] = None,
+                 weights: Union[dict, None] = None, workers: int = 1):
+        self.time_limit: Union[float, None] = time_limit
+        self.node_limit: Union[int, None] = node_limit
+        self.max_depth: int = max_depth
+        self.table: TranspositionTable = table if table is not None \
+            else TranspositionTable()
+        self.weights: Union[dict, None] = weights
+        self.workers: int = workers or os.cpu_count() or 1
+
+        self.geometry: Union[Geometry, None] = None
+        self.classes: Union[SquareClasses, None] = None
+        self.evaluation: Union[Evaluation, None] = None
+        self.keys: Union[ZobristKeys, None] = None
+        self.nodes: int = 0
+        self.deadline: Union[float, None] = None
+        self.limited: bool = False
+        self.executor: Union[ProcessPoolExecutor, None] = None
+        # numéro de la recherche, pour vieillir les tables des processus
+        self.generation: int = 0
+
+    def setup(self, geometry: Geometry, start: float) -> None:
+        """
+        Prépare une recherche sur un plateau de taille `geometry`
+
+        :param Geometry geometry: Board geometry
+        :param float start: perf_counter() value at the start of the search
+        :return: None
+        """
+        self.geometry = geometry
+        self.classes = get_square_classes(geometry)
+        self.evaluation = get_evaluation(geometry, self.weights)
+        self.keys = get_keys(geometry)
+        self.table.new_search()
+        self.nodes = 0
+        self.deadline = start + self.time_limit \
+            if self.time_limit is not None else None
+
+    def search(self, board: Board, player: str) -> SearchResult:
+        """
+        Cherche le meilleur coup de `player` dans le budget imparti
+
+        :param Board board: Position to search
+        :param str player: Player to move ('x' or 'o')
+        :return: SearchResult - Best move found (None if player must pass)
+        """
+        start = time.perf_counter()
+        self.setup(board.geometry, start)
+
+        color = Board.PLAYERS.index(player)
+        own, opp = board.bits[color], board.bits[1 - color]
+        key = board.get_hash(player)
+
+        entry = self.table.probe(key)
+        root_moves = list(self.order(legal_moves(self.geometry, own, opp),
+                                     entry[3] if entry else NO_MOVE))
+        if not root_moves:
+            return SearchResult(None, 0, 0, 0, time.perf_counter() - start)
+
+        best_move, best_score, depth_reached = root_moves[0], 0, 0
+        for depth in range(1, self.max_depth + 1):
+            # la profondeur 1 est toujours terminée pour avoir un coup
+            self.limited = depth > 1
+            try:
+                if self.workers > 1 and len(root_moves) > 1:
+                    scores = self.search_parallel(own, opp, color, key,
+                                                  root_moves, depth)
+                else:
+                    scores = self.search_root(own, opp, color, key,
+                                              root_moves, depth)
+            except SearchTimeout:
+                break
+
+            root_moves.sort(key=lambda index: -scores[index])
+            best_move = root_moves[0]
+            best_score = scores[best_move]
+            depth_reached = depth
+            self.table.store(key, depth, EXACT, best_score, best_move)
+
+            if abs(best_score) >= FINAL_SCALE \
+                    or popcount(self.geometry.full & ~(own | opp)) <= depth:
+                break  # fin de partie atteinte sur toutes les variantes
+            if self.is_exhausted():
+                break
+
+        return SearchResult(self.geometry.pose(best_move), best_score,
+                            depth_reached, self.nodes,
+                            time.perf_counter() - start)
+
+    def search_root(self, own: int, opp: int, color: int, key: int,
+                    root_moves: list, depth: int) -> dict:
+        """
+        Evalue chaque coup de la racine a la profondeur `depth`
+
+        :return: dict - Score of each root move (index -> score)
+        """
+        keys = self.keys
+        squares = keys.squares[color]
+        scores = {}
+        alpha = -INFINITY
+        for index in root_moves:
+            flipped = flips(self.geometry, own, opp, index)
+            child = key ^ squares[index] ^ keys.flip_hash(flipped) ^ keys.side
+            score = -self.negamax(opp & ~flipped,
+                                  own | flipped | (1 << index),
+                                  1 - color, child,
+                                  depth - 1, -INFINITY, -alpha)
+            scores[index] = score
+            if score > alpha:
+                alpha = score
+            if self.limited and self.is_exhausted():
+                raise SearchTimeout
+        return scores
+
+    def search_parallel(self, own: int, opp: int, color: int, key: int,
+                        root_moves: list, depth: int) -> dict:
+        """
+        Evalue les coups de la racine dans les processus : le premier coup
+        (le meilleur de la profondeur précédente) avec une fenêtre complète,
+        puis tous les autres en parallèle avec une fenêtre nulle autour de
+        son score ; ceux qui le dépassent sont recherchés à nouveau
+
+        :return: dict - Score of each root move (index -> score, an upper
+            bound for the moves worse than the best one)
+        """
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        if depth == 1:
+            self.generation += 1
+
+        # échéance en temps absolu : perf_counter() n'a pas de référence
+        # commune entre processus
+        deadline = None
+        if self.limited and self.deadline is not None:
+            deadline = time.time() + self.deadline - time.perf_counter()
+        head = (self.geometry.width, self.geometry.height, own, opp, color,
+                key, depth, deadline)
+        tail = (self.weights, self.table.memory, self.generation)
+
+        def run(indexes: list, alpha: int, beta: int) -> dict:
+            # les noeuds restants sont partagés entre les coups lancés
+            # ensemble : au total, la recherche respecte `node_limit`
+            nodes = None
+            if self.limited and self.node_limit is not None:
+                nodes = max(1, (self.node_limit - self.nodes)
+                            // len(indexes))
+            futures = [self.executor.submit(
+                run_root_move, head + (nodes,) + tail + (index, alpha, beta))
+                for index in indexes]
+            results = {}
+            for index, future in zip(indexes, futures):
+                score, searched = future.result()
+                self.nodes += searched
+                if score is None:
+                    for other in futures:
+                        other.cancel()
+                    raise SearchTimeout
+                results[index] = score
+            return results
+
+        first = root_moves[0]
+        scores = run([first], -INFINITY, INFINITY)
+        alpha = scores[first]
+        scores.update(run(root_moves[1:], alpha, alpha + 1))
+        better = [index for index in root_moves[1:] if scores[index] > alpha]
+        if better:
+            scores.update(run(better, alpha, INFINITY))
+        if self.node_limit is not None and self.nodes >= self.node_limit \
+                and self.limited:
+            raise SearchTimeout
+        return scores
+
+    def close(self) -> None:
+        """
+        Arrête les processus de la recherche parallèle
+
+        :return: None
+        """
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def negamax(self, own: int, opp: int, color: int, key: int, depth: int,
+                alpha: int, beta: int) -> int:
+        self.nodes += 1
+        if self.limited and (self.nodes & 1023 == 0
+                             or self.node_limit is not None) \
+                and self.is_exhausted():
+            raise SearchTimeout
+
+        geometry = self.geometry
+        moves = legal_moves(geometry, own, opp)
+        if not moves:
+            if not legal_moves(geometry, opp, own):
+                return (popcount(own) - popcount(opp)) * FINAL_SCALE
+            return -self.negamax(opp, own, 1 - color, key ^ self.keys.side,
+                                 depth, -beta, -alpha)
+
+        if depth <= 0:
+            return self.evaluate(own, opp, moves)
+
+        table = self.table
+        hint = NO_MOVE
+        entry = table.probe(key)
+        if entry is not None:
+            entry_depth, bound, score, hint = entry
+            if entry_depth >= depth:
+                if bound == EXACT \
+                        or (bound == LOWER and score >= beta) \
+                        or (bound == UPPER and score <= alpha):
+                    return score
+
+        keys = self.keys
+        squares = keys.squares[color]
+        original_alpha = alpha
+        best, best_move = -INFINITY, NO_MOVE
+        for index in self.order(moves, hint):
+            flipped = flips(geometry, own, opp, index)
+            child = key ^ squares[index] ^ keys.flip_hash(flipped) ^ keys.side
+            score = -self.negamax(opp & ~flipped,
+                                  own | flipped | (1 << index),
+                                  1 - color, child,
+                                  depth - 1, -beta, -alpha)
+            if score > best:
+                best, best_move = score, index
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+
+        if best <= original_alpha:
+            bound = UPPER
+        elif best >= beta:
+            bound = LOWER
+        else:
+            bound = EXACT
+        table.store(key, depth, bound, best, best_move)
+        return best
+
+    def order(self, moves: int, hint: int = NO_MOVE):
+        """
+        Parcours les coups : le coup de la table de transposition d'abord,
+        puis par catégorie de case, coins d'abord et cases X en dernier
+
+        :param int moves: Bitboard of the legal moves
+        :param int hint: Best move known for this position
+        :return: Iterator[int] - Square indexes
+        """
+        if hint != NO_MOVE and moves >> hint & 1:
+            yield hint
+            moves &= ~(1 << hint)
+        for squares in self.classes.ordered:
+            yield from iter_bits(moves & squares)
+
+    def evaluate(self, own: int, opp: int, moves: int) -> int:
+        """
+        Evaluation heuristique d'une feuille (voir `utils.evaluation`)
+
+        :param int own: Bitboard of the player to move
+        :param int opp: Bitboard of the opponent
+        :param int moves: Legal moves of the player to move
+        :return: int - Score from the point of view of `own`
+        """
+        return self.evaluation.evaluate(own, opp, moves)
+
+    def is_exhausted(self) -> bool:
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            return True
+        return self.node_limit is not None and self.nodes >= self.node_limit
+
+
+# IA des processus de la recherche parallèle, une par taille de plateau :
+# leur table de transposition est conservée d'un coup à l'autre
+_SEARCHERS: dict = {}
+
+
+def run_root_move(task: tuple) -> tuple:
+    """
+    Evalue un coup de la racine dans un processus du pool
+
+    :param tuple task: (width, height, own, opp, color, key, depth,
+        deadline (time.time()), node limit, weights, table memory,
+        generation, square index, alpha, beta)
+    :return: tuple - (score or None if the budget ran out, nodes)
+    """
+    width, height, own, opp, color, key, depth, deadline, node_limit, \
+        weights, memory, generation, index, alpha, beta = task
+
+    geometry = get_geometry(width, height)
+    searcher = _SEARCHERS.get((width, height))
+    if searcher is None or searcher.weights != weights \
+            or searcher.table.memory != memory:
+        searcher = _SEARCHERS[width, height] = AlphaBeta(
+            None, table=TranspositionTable(memory), weights=weights)
+        searcher.generation = generation
+    if searcher.generation != generation:
+        searcher.generation = generation
+        searcher.table.new_search()
+    if searcher.geometry is not geometry:
+        searcher.setup(geometry, time.perf_counter())
+    searcher.nodes = 0
+    searcher.node_limit = node_limit
+    searcher.deadline = None
+    if deadline is not None:
+        searcher.deadline = time.perf_counter() + deadline - time.time()
+    searcher.limited = deadline is not None or node_limit is not None
+
+    keys = searcher.keys
+    flipped = flips(geometry, own, opp, index)
+    child = key ^ keys.squares[color][index] ^ keys.flip_hash(flipped) \
+        ^ keys.side
+    try:
+        score = -searcher.negamax(opp & ~flipped, own | flipped | (1 << index),
+                                  1 - color, child, depth - 1, -beta, -alpha)
+    except SearchTimeout:
+        return None, searcher.nodes
+    return score, searcher.nodes
@@ -0,0 +1,177 @@
+"""Parties IA contre IA sans affichage ni sauvegarde, sur plusieurs processus.
+
+Usage : ``python -m utils.selfplay -n 1000 -s 8 --output games.jsonl``
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, Union
+
+from .board import Board
+from .players import make_player
+
+
+def play_game(x_player, o_player, width: int, height: int,
+              first: str = 'o', opening: Union[list, None] = None) -> dict:
+    """
+    Joue une partie complète entre deux joueurs
+
+    :param x_player: Player of X (with a `search(board, player)` method)
+    :param o_player: Player of O
+    :param int width: Board width
+    :param int height: Board height
+    :param str first: Player who starts
+    :param list opening: Moves (ex: ['D3', 'C5']) played before the players
+    :return: dict - winner, pawns, moves and time per move
+    """
+    board = Board(width, height)
+    board.make_board()
+    players = {'x': x_player, 'o': o_player}
+    player = first
+    moves, times = [], []
+
+    for move in opening or []:
+        if not board.set_valid_poses(player):
+            moves.append('pass')
+            times.append(0.0)
+            player = 'x' if player == 'o' else 'o'
+            board.set_valid_poses(player)
+        if not board.is_valid_move(move):
+            raise ValueError(f"Invalid opening move: {move}")
+        board.move(move, player, False)
+        moves.append(move.upper())
+        times.append(0.0)
+        player = 'x' if player == 'o' else 'o'
+
+    while True:
+        adv = 'x' if player == 'o' else 'o'
+        if not board.set_valid_poses(player):
+            if not board.moves[Board.PLAYERS.index(adv)]:
+                break  # aucun des deux joueurs ne peut jouer
+            moves.append('pass')
+            times.append(0.0)
+        else:
+            start = time.perf_counter()
+            pose = players[player].search(board, player).move
+            times.append(time.perf_counter() - start)
+            board.move(pose, player, True)
+            moves.append(Board.notation(pose))
+        player = adv
+
+    pawns = board.count()
+    if pawns[0] != pawns[1]:
+        winner = 'x' if pawns[0] > pawns[1] else 'o'
+    else:
+        winner = None
+
+    return {
+        'winner': winner,
+        'pawns': pawns,
+        'moves': moves,
+        'times': [round(spent, 6) for spent in times]
+    }
+
+
+_PLAYERS: dict = {}
+
+
+def get_player(spec: str, seed: int):
+    """
+    Retourne le joueur décrit par `spec`, réutilisé d'une partie à l'autre
+    dans un même processus (sauf les joueurs aléatoires et gloutons,
+    initialisés avec la graine de la partie)
+
+    :param str spec: Player description (see utils.players.make_player)
+    :param int seed: Seed of the game
+    :return: Player
+    """
+    if spec.startswith(('random', 'greedy')):
+        return make_player(spec, seed)
+    if spec not in _PLAYERS:
+        _PLAYERS[spec] = make_player(spec)
+    return _PLAYERS[spec]
+
+
+def run_game(task: tuple) -> dict:
+    """
+    Joue une partie dans un processus du pool
+
+    :param tuple task: (game, width, height, x spec, o spec, seed)
+    :return: dict - Game result
+    """
+    game, width, height, x_spec, o_spec, seed = task
+    result = play_game(get_player(x_spec, seed), get_player(o_spec, seed + 1),
+                       width, height)
+    result.update({'game': game, 'size': [width, height],
+                   'x': x_spec, 'o': o_spec, 'seed': seed})
+    return result
+
+
+def run(games: int, width: int, height: int, x_spec: str = 'random',
+        o_spec: str = 'random', workers: Union[int, None] = None,
+        seed: int = 0) -> Iterator[dict]:
+    """
+    Joue `games` parties et renvoie les résultats au fur et à mesure
+
+    :param int games: Number of games
+    :param int width: Board width
+    :param int height: Board height
+    :param str x_spec: Player of X
+    :param str o_spec: Player of O
+    :param int workers: Number of processes (0 = in this process)
+    :param int seed: Seed of the first game
+    :return: Iterator[dict] - Game results, in order
+    """
+    tasks = [(game, width, height, x_spec, o_spec, seed + 2 * game)
+             for game in range(games)]
+    if workers == 0:
+        yield from map(run_game, tasks)
+        return
+
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, games // (workers * 16))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(run_game, tasks, chunksize=chunksize)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Parties IA contre IA")
+    parser.add_argument('-n', '--games', type=int, default=100)
+    parser.add_argument('-s', '--size', type=int, default=8)
+    parser.add_argument('--x', default='random', help="joueur X "
+                        "(ex: random, alphabeta:nodes=2000,memory=1)")
+    parser.add_argument('--o', default='random', help="joueur O")
+    parser.add_argument('--output', default='-',
+                        help="fichier JSON lines des résultats (- = stdout)")
+    parser.add_argument('-w', '--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.size < 4 or args.size > 26 or args.size % 2:
+        parser.error("size must be even, between 4 and 26")
+
+    output = sys.stdout if args.output == '-' else open(args.output, 'w')
+    start = time.perf_counter()
+    wins = {'x': 0, 'o': 0, None: 0}
+    try:
+        for result in run(args.games, args.size, args.size, args.x, args.o,
+                          args.workers, args.seed):
+            wins[result['winner']] += 1
+            output.write(json.dumps(result) + '\n')
+            output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"{args.games} games in {elapsed:.2f}s "
+          f"({args.games * 60 / elapsed:.0f} games/min) - "
+          f"X: {wins['x']}, O: {wins['o']}, draws: {wins[None]}",
+          file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,490 @@
+"""Serveur de parties asyncio : un processus, de nombreuses parties.
+
+Chaque client envoie des requêtes JSON, une par ligne, et reçoit une
+réponse par requête (avec le même `id` s'il est fourni) ; les autres
+clients d'une partie reçoivent un événement ``{"event": "state", ...}`` à
+chaque changement. Les coups de l'IA sont calculés dans un pool de
+processus pour ne pas bloquer la boucle.
+
+**Requêtes**:
+    - ``{"cmd": "join", "size": 8, "ai": "alphabeta:time=0.5"}`` = nouvelle
+      partie (le client joue O, l'IA éventuelle X)
+    - ``{"cmd": "join", "game": 1}`` = rejoint une partie (X, puis
+      spectateur)
+    - ``{"cmd": "move", "game": 1, "move": "D3"}``
+    - ``{"cmd": "undo", "game": 1}``
+    - ``{"cmd": "state", "game": 1}``
+    - ``{"cmd": "leave", "game": 1}``
+
+Usage : ``python -m utils.server --port 7777`` ou ``--unix /tmp/rvr.sock``
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import random
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Union
+
+from .board import Board
+from .players import PLAYER_OPTIONS, close_player, make_player
+from .record import PASS, GameRecord
+
+
+class GameError(Exception):
+    """Requête impossible (partie inconnue, coup invalide...)"""
+
+
+# joueurs qu'un client peut demander, et bornes de chaque option :
+# pas de livre (fichier du serveur) ni de recherche multi-processus, les
+# coups étant déjà calculés dans le pool
+CLIENT_PLAYERS = ('random', 'greedy', 'alphabeta', 'mcts')
+# temps par coup imposé quand le client n'en donne pas (sinon un budget en
+# noeuds ou en simulations serait sans limite de temps)
+CLIENT_TIME = 1.0
+CLIENT_OPTIONS = {
+    'time': (float, 0.0, 5.0),
+    'nodes': (int, 1, 1000000),
+    'depth': (int, 1, 16),
+    'simulations': (int, 1, 100000),
+    'exploration': (float, 0.0, 10.0),
+    'workers': (int, 1, 1),
+    'memory': (float, 0.0, 64.0),
+    'endgame': (int, 0, 16),
+}
+
+# joueurs gardés d'un coup à l'autre par chaque processus du pool (les
+# plus récemment utilisés)
+CACHED_PLAYERS = 4
+
+# octets en attente d'envoi au-delà desquels un client est déconnecté
+MAX_PENDING = 1024 * 1024
+
+
+def check_spec(spec) -> str:
+    """
+    Vérifie la description d'un joueur envoyée par un client (voir
+    `make_player`) sans construire le joueur, et la retourne sous forme
+    normalisée : options triées, valeurs converties, temps par coup
+    toujours présent
+
+    :param spec: Player description
+    :return: str - Normalized description
+    """
+    if not isinstance(spec, str):
+        raise GameError("ai must be a string")
+    name, _, options = spec.partition(':')
+    if name not in CLIENT_PLAYERS:
+        raise GameError(f"Unknown player: {name}")
+    values = {}
+    for option in filter(None, options.split(',')):
+        key, _, value = option.partition('=')
+        if key not in CLIENT_OPTIONS or (key not in PLAYER_OPTIONS[name]
+                                         and key != 'endgame'):
+            raise GameError(f"Option not allowed for {name}: {key}")
+        cast, minimum, maximum = CLIENT_OPTIONS[key]
+        values[key] = cast(value)
+        if not minimum <= values[key] <= maximum:
+            raise GameError(f"{key} must be between {minimum} and {maximum}")
+    if 'time' in PLAYER_OPTIONS[name]:
+        values.setdefault('time', CLIENT_TIME)
+    if not values:
+        return name
+    return name + ':' + ','.join(f"{key}={value}"
+                                 for key, value in sorted(values.items()))
+
+
+_PLAYERS: dict = {}
+
+
+def get_player(spec: str, seed: int):
+    """
+    Retourne le joueur décrit par `spec`, réutilisé d'un coup à l'autre
+    dans un même processus ; seuls les `CACHED_PLAYERS` derniers utilisés
+    sont gardés (sauf joueurs aléatoires et gloutons, initialisés avec la
+    graine du coup)
+
+    :param str spec: Player description normalized by `check_spec`
+    :param int seed: Seed of the move
+    :return: Player
+    """
+    if spec.startswith(('random', 'greedy')):
+        return make_player(spec, seed)
+    player = _PLAYERS.pop(spec, None)
+    if player is None:
+        player = make_player(spec)
+    _PLAYERS[spec] = player  # le plus récent en dernier
+    while len(_PLAYERS) > CACHED_PLAYERS:
+        close_player(_PLAYERS.pop(next(iter(_PLAYERS))))
+    return player
+
+
+def ai_move(task: tuple) -> Union[int, None]:
+    """
+    Calcule le coup de l'IA dans un processus du pool
+
+    :param tuple task: (player spec, width, height, X bits, O bits, player,
+        seed)
+    :return: int - Square index (None if the AI must pass)
+    """
+    spec, width, height, x_bits, o_bits, player, seed = task
+    board = Board(width, height)
+    board.load_bits(x_bits, o_bits)
+    move = get_player(spec, seed).search(board, player).move
+    return board.geometry.index(*move) if move is not None else None
+
+
+class Game:
+    """Partie hébergée par le serveur
+
+    Les coups sont rejoués dans `record` (en mémoire) : `undo` revient à
+    une position précédente. Comme dans `Engine.render`, un joueur sans
+    coup possible passe automatiquement.
+    """
+    __slots__ = ('ident', 'board', 'record', 'player', 'ai', 'sides',
+                 'clients', 'over', 'lock', 'random')
+
+    def __init__(self, ident: int, width: int, height: int,
+                 ai: Union[str, None] = None):
+        self.ident: int = ident
+        self.board: Board = Board(width, height)
+        self.board.make_board()
+        self.record: GameRecord = GameRecord(width, height, 'o')
+        self.player: str = 'o'
+        self.ai: Union[str, None] = ai
+        # côté -> client, l'IA joue X
+        self.sides: dict = {'x': 'ai'} if ai else {}
+        self.clients: set = set()
+        self.over: bool = False
+        self.lock = asyncio.Lock()
+        self.random = random.Random(ident)
+        self.board.set_valid_poses(self.player)
+
+    def join(self, client) -> Union[str, None]:
+        """
+        Ajoute un client et lui donne le premier côté libre
+
+        :param client: Connection of the client
+        :return: str - Side of the client (None for a spectator)
+        """
+        self.clients.add(client)
+        for side in ('o', 'x'):
+            if self.sides.get(side) is client:
+                return side
+            if side not in self.sides:
+                self.sides[side] = client
+                return side
+        return None
+
+    def leave(self, client) -> None:
+        self.clients.discard(client)
+        for side in [side for side, owner in self.sides.items()
+                     if owner is client]:
+            del self.sides[side]
+
+    def play(self, index: int) -> None:
+        """
+        Joue un coup du joueur au trait, puis passe la main
+
+        :param int index: Square index
+        :return: None
+        """
+        if self.over:
+            raise GameError("Game is over")
+        if not self.board.valid >> index & 1:
+            raise GameError("Invalid move")
+        self.board.make_move(index, self.player)
+        self.record.append(index, self.board)
+        self.player = 'x' if self.player == 'o' else 'o'
+        self.settle()
+
+    def settle(self) -> None:
+        """
+        Fait passer le joueur au trait s'il ne peut pas jouer, ou termine
+        la partie si aucun des deux ne le peut
+
+        :return: None
+        """
+        if self.board.set_valid_poses(self.player):
+            return
+        adv = 'x' if self.player == 'o' else 'o'
+        if not self.board.set_valid_poses(adv):
+            self.over = True
+            return
+        self.record.append(PASS)
+        self.player = adv
+
+    def undo(self, side: str) -> None:
+        """
+        Revient au coup précédent de `side` (un seul ply entre deux
+        joueurs, jusqu'au dernier coup humain contre l'IA)
+
+        :param str side: Side of the client asking
+        :return: None
+        """
+        record = self.record
+        ply = record.cursor - 1
+        while ply > 0 and (record.moves[ply] is PASS
+                           or (self.ai and record.player_at(ply) != side)):
+            ply -= 1
+        if ply < 0:
+            raise GameError("Nothing to undo")
+
+        x_bits, o_bits, player = record.position_at(ply)
+        self.board.load_bits(x_bits, o_bits)
+        record.cursor = ply
+        self.player = player
+        self.over = False
+        self.settle()
+
+    def state(self) -> dict:
+        cells = self.board.cells().decode()
+        width = self.board.width
+        pawns = self.board.count()
+        winner = None
+        if self.over and pawns[0] != pawns[1]:
+            winner = 'x' if pawns[0] > pawns[1] else 'o'
+        return {
+            'game': self.ident,
+            'size': [width, self.board.height],
+            'board': [cells[i * width:(i + 1) * width]
+                      for i in range(self.board.height)],
+            'player': self.player,
+            'pawns': pawns,
+            'moves': [Board.notation(pose)
+                      for pose in self.board.get_valid_poses()],
+            'ply': self.record.cursor,
+            'over': self.over,
+            'winner': winner
+        }
+
+
+class Client:
+    """Connexion d'un client : écriture des lignes JSON"""
+    __slots__ = ('writer', 'games')
+
+    def __init__(self, writer: asyncio.StreamWriter):
+        self.writer: asyncio.StreamWriter = writer
+        self.games: dict = {}  # partie -> côté
+
+    async def send(self, message: dict) -> None:
+        self.writer.write(json.dumps(message).encode() + b'\n')
+        await self.writer.drain()
+
+    def post(self, message: dict) -> None:
+        """
+        Envoie un message sans attendre qu'il parte ; un client qui ne lit
+        plus (plus de `MAX_PENDING` octets en attente) est déconnecté
+
+        :param dict message: Message
+        :return: None
+        """
+        if self.writer.is_closing():
+            return
+        self.writer.write(json.dumps(message).encode() + b'\n')
+        if self.writer.transport.get_write_buffer_size() > MAX_PENDING:
+            # sans attendre l'envoi du tampon : `Server.handle` voit la fin
+            # de la connexion et retire le client de ses parties
+            self.writer.transport.abort()
+
+
+class Server:
+    """Héberge les parties et répond aux requêtes des clients"""
+    __slots__ = ('games', 'executor', 'counter')
+
+    def __init__(self, executor: Union[Executor, None] = None):
+        self.games: dict = {}
+        self.executor: Union[Executor, None] = executor
+        self.counter: int = 0
+
+    async def handle(self, reader: asyncio.StreamReader,
+                     writer: asyncio.StreamWriter) -> None:
+        """
+        Traite les requêtes d'un client jusqu'à sa déconnexion
+
+        :return: None
+        """
+        client = Client(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                await client.send(await self.dispatch(client, line))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            for game in list(client.games):
+                self.leave(client, game)
+            writer.close()
+
+    async def dispatch(self, client: Client, line: bytes) -> dict:
+        """
+        Exécute une requête
+
+        :param Client client: Client sending the request
+        :param bytes line: JSON request
+        :return: dict - Response
+        """
+        ident = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise GameError("Request must be a JSON object")
+            ident = request.get('id')
+            command = request.get('cmd')
+            if command == 'join':
+                response = await self.join(client, request)
+            elif command in ('move', 'undo', 'state', 'leave'):
+                game = self.games.get(request.get('game'))
+                if game is None:
+                    raise GameError("Unknown game")
+                if command == 'leave':
+                    self.leave(client, game)
+                    response = {}
+                elif command == 'state':
+                    response = {'state': game.state()}
+                else:
+                    response = await getattr(self, command)(client, game,
+                                                            request)
+            else:
+                raise GameError(f"Unknown command: {command}")
+        except (GameError, ValueError, TypeError) as error:
+            response = {'ok': False, 'error': str(error)}
+        except (MemoryError, OSError, BrokenProcessPool) as error:
+            response = {'ok': False,
+                        'error': f"Server error: {type(error).__name__}"}
+        else:
+            response['ok'] = True
+
+        if ident is not None:
+            response['id'] = ident
+        return response
+
+    async def join(self, client: Client, request: dict) -> dict:
+        if 'game' in request:
+            game = self.games.get(request['game'])
+            if game is None:
+                raise GameError("Unknown game")
+        else:
+            size = int(request.get('size', 8))
+            if size < 4 or size > 26 or size % 2:
+                raise GameError("size must be even, between 4 and 26")
+            ai = request.get('ai')
+            if ai is not None:
+                ai = check_spec(ai)  # vérifie la description avant de créer
+            self.counter += 1
+            game = self.games[self.counter] = Game(self.counter, size, size,
+                                                   ai)
+
+        side = game.join(client)
+        client.games[game] = side
+        self.notify(game, client)
+        return {'side': side, 'state': game.state()}
+
+    async def move(self, client: Client, game: Game, request: dict) -> dict:
+        async with game.lock:
+            if client.games.get(game) != game.player:
+                raise GameError("Not your turn")
+            pose = Board.parser(str(request.get('move', '')))
+            if not pose or not game.board.is_on_board(pose):
+                raise GameError("Invalid move")
+            game.play(game.board.geometry.index(*pose))
+            self.notify(game, client)
+            await self.play_ai(game, client)
+        return {'state': game.state()}
+
+    async def undo(self, client: Client, game: Game, request: dict) -> dict:
+        async with game.lock:
+            side = client.games.get(game)
+            if side is None:
+                raise GameError("Spectators cannot undo")
+            game.undo(side)
+            self.notify(game, client)
+            await self.play_ai(game, client)
+        return {'state': game.state()}
+
+    async def play_ai(self, game: Game, client: Client) -> None:
+        """
+        Fait jouer l'IA tant que c'est son tour, dans le pool de processus
+
+        :param Game game: Game (locked)
+        :param Client client: Client who gets the state in his response
+        :return: None
+        """
+        loop = asyncio.get_running_loop()
+        while not game.over and game.sides.get(game.player) == 'ai':
+            board = game.board
+            task = (game.ai, board.width, board.height, board.bits[0],
+                    board.bits[1], game.player, game.random.getrandbits(32))
+            index = await loop.run_in_executor(self.executor, ai_move, task)
+            game.play(index)
+            self.notify(game, client)
+
+    def leave(self, client: Client, game: Game) -> None:
+        client.games.pop(game, None)
+        game.leave(client)
+        if not game.clients:
+            self.games.pop(game.ident, None)
+
+    def notify(self, game: Game, exclude: Union[Client, None] = None):
+        """
+        Envoie l'état de la partie aux autres clients, sans les attendre :
+        un client lent ne bloque pas la partie
+
+        :param Game game: Game which changed
+        :param Client exclude: Client who gets the state in his response
+        :return: None
+        """
+        message = {'event': 'state', 'state': game.state()}
+        for client in list(game.clients):
+            if client is not exclude:
+                client.post(message)
+
+
+async def serve(host: str = '127.0.0.1', port: int = 7777,
+                unix: Union[str, None] = None,
+                workers: Union[int, None] = None) -> None:
+    """
+    Lance le serveur jusqu'à son interruption
+
+    :param str host: TCP host
+    :param int port: TCP port
+    :param str unix: Unix socket path (replaces host and port)
+    :param int workers: Number of processes computing the AI moves
+    :return: None
+    """
+    # 'spawn' : des processus créés par fork hériteraient des sockets des
+    # clients déjà connectés, qui ne seraient plus fermées à leur départ
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers,
+                             mp_context=context) as executor:
+        server = Server(executor)
+        if unix is not None:
+            listener = await asyncio.start_unix_server(server.handle, unix)
+        else:
+            listener = await asyncio.start_server(server.handle, host, port)
+        async with listener:
+            await listener.serve_forever()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serveur de parties")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=7777)
+    parser.add_argument('--unix', metavar='PATH', help="socket Unix")
+    parser.add_argument('-w', '--workers', type=int, default=None,
+                        help="processus pour les coups de l'IA")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.unix, args.workers))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+"""Symétries du plateau et position canonique.
+
+Un plateau carré a 8 symétries (groupe diédral : 4 rotations, 4 réflexions),
+un plateau rectangulaire 4 (identité, demi-tour, 2 réflexions). Toutes les
+positions images l'une de l'autre ont le même représentant canonique : la
+plus petite paire de bitboards (X, O) parmi les images. Une table, un livre
+ou une base indexé par la position canonique stocke donc jusqu'à 8 fois
+moins d'entrées ; les coups y sont rangés dans le repère canonique et
+ramenés dans celui de la partie avec `Symmetry.restore`.
+
+Les images sont calculées octet par octet avec des tables pré-calculées :
+16 lectures de table par symétrie sur un plateau 8x8.
+"""
+from typing import Tuple
+
+from .bitboard import Geometry
+from .board import Board
+from .zobrist import get_keys
+
+
+# (ligne, colonne) -> image, pour un plateau de `height` lignes et `width`
+# colonnes ; les 4 dernières échangent lignes et colonnes (carré seulement)
+TRANSFORMS = (
+    ('identity', lambda row, col, height, width: (row, col)),
+    ('rotate180', lambda row, col, height, width: (height - 1 - row,
+                                                   width - 1 - col)),
+    ('flip_rows', lambda row, col, height, width: (height - 1 - row, col)),
+    ('flip_cols', lambda row, col, height, width: (row, width - 1 - col)),
+    ('rotate90', lambda row, col, height, width: (col, width - 1 - row)),
+    ('rotate270', lambda row, col, height, width: (height - 1 - col, row)),
+    ('transpose', lambda row, col, height, width: (col, row)),
+    ('antitranspose', lambda row, col, height, width: (height - 1 - col,
+                                                       width - 1 - row)),
+)
+
+
+class Symmetry:
+    """Symétries d'une taille de plateau
+
+    `moves[t][i]` est l'image de la case `i` par la symétrie `t`,
+    `inverse[t][i]` son antécédent. `tables[t][k][octet]` donne l'image des
+    bits de l'octet `k` d'un bitboard.
+    """
+    __slots__ = ('geometry', 'names', 'moves', 'inverse', 'tables')
+
+    def __init__(self, geometry: Geometry):
+        self.geometry: Geometry = geometry
+        width, height = geometry.width, geometry.height
+        transforms = TRANSFORMS if width == height else TRANSFORMS[:4]
+
+        self.names: list = [name for name, _ in transforms]
+        self.moves: list = []
+        self.inverse: list = []
+        self.tables: list = []
+        chunks = (geometry.size + 7) // 8
+        for _, transform in transforms:
+            moves = [geometry.index(*transform(row, col, height, width))
+                     for row in range(height) for col in range(width)]
+            inverse = [0] * geometry.size
+            for index, image in enumerate(moves):
+                inverse[image] = index
+            self.moves.append(moves)
+            self.inverse.append(inverse)
+
+            tables = []
+            for chunk in range(chunks):
+                bits = [1 << moves[index] if index < geometry.size else 0
+                        for index in range(8 * chunk, 8 * chunk + 8)]
+                table = [0] * 256
+                for byte in range(1, 256):
+                    low = byte & -byte
+                    table[byte] = table[byte ^ low] \
+                        | bits[low.bit_length() - 1]
+                tables.append(table)
+            self.tables.append(tables)
+
+    def apply(self, bits: int, transform: int) -> int:
+        """
+        Image d'un bitboard par une symétrie
+
+        :param int bits: Bitboard
+        :param int transform: Index of the symmetry
+        :return: int - Transformed bitboard
+        """
+        result = 0
+        for table in self.tables[transform]:
+            if not bits:
+                break
+            result |= table[bits & 255]
+            bits >>= 8
+        return result
+
+    def canonical(self, x_bits: int, o_bits: int) -> Tuple[int, int, int]:
+        """
+        Représentant canonique de la position : la plus petite image
+        (X, O)
+
+        :param int x_bits: Bitboard of X
+        :param int o_bits: Bitboard of O
+        :return: tuple - (X bits, O bits, index of the symmetry used)
+        """
+        best = (x_bits, o_bits, 0)
+        for transform in range(1, len(self.tables)):
+            x_image = self.apply(x_bits, transform)
+            if x_image > best[0]:
+                continue
+            o_image = self.apply(o_bits, transform)
+            if x_image < best[0] or o_image < best[1]:
+                best = (x_image, o_image, transform)
+        return best
+
+    def canonical_hash(self, x_bits: int, o_bits: int,
+                       player: str) -> Tuple[int, int]:
+        """
+        Hash de Zobrist de la position canonique (trait compris)
+
+        :param int x_bits: Bitboard of X
+        :param int o_bits: Bitboard of O
+        :param str player: Player to move
+        :return: tuple - (64 bits hash, index of the symmetry used)
+        """
+        x_image, o_image, transform = self.canonical(x_bits, o_bits)
+        keys = get_keys(self.geometry)
+        key = keys.hash(x_image, o_image)
+        return (key ^ keys.side if player == 'o' else key), transform
+
+    def board_hash(self, board: Board, player: str) -> Tuple[int, int]:
+        """
+        `canonical_hash` de la position d'un plateau
+
+        :return: tuple - (64 bits hash, index of the symmetry used)
+        """
+        return self.canonical_hash(board.bits[0], board.bits[1], player)
+
+    def transform(self, index: int, transform: int) -> int:
+        """
+        Case de la partie -> case dans le repère canonique
+
+        :param int index: Square index
+        :param int transform: Symmetry returned by `canonical`
+        :return: int
+        """
+        return self.moves[transform][index]
+
+    def restore(self, index: int, transform: int) -> int:
+        """
+        Case du repère canonique -> case de la partie
+
+        :param int index: Square index in the canonical frame
+        :param int transform: Symmetry returned by `canonical`
+        :return: int
+        """
+        return self.inverse[transform][index]
+
+    def __len__(self):
+        return len(self.tables)
+
+
+_SYMMETRIES: dict = {}
+
+
+def get_symmetry(geometry: Geometry) -> Symmetry:
+    symmetry = _SYMMETRIES.get(geometry)
+    if symmetry is None:
+        symmetry = _SYMMETRIES[geometry] = Symmetry(geometry)
+    return symmetry
@@ -0,0 +1,360 @@
+"""Tournois entre joueurs IA : classement Elo et intervalles de confiance.
+
+Chaque paire de joueurs joue des couples de parties depuis une même
+ouverture, chacun ayant les X dans l'une et les O dans l'autre, ce qui
+annule l'avantage du trait et de l'ouverture. En tournoi toutes rondes,
+chaque joueur affronte tous les autres ; en gauntlet, seul le premier
+affronte chacun des autres. Les parties sont réparties sur plusieurs
+processus.
+
+Les joueurs cherchent dans un seul processus par défaut : chaque partie
+occupe déjà un coeur, ``workers=N`` est à éviter ici.
+
+Usage : ``python -m utils.tournament random greedy alphabeta:time=0.05
+-n 20 --openings 10``
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Iterator, Tuple, Union
+
+from .board import Board
+from .selfplay import get_player, play_game
+
+
+# intervalle de confiance à 95 %
+Z_95 = 1.96
+# échelle Elo : 400 points d'écart = 10 contre 1
+ELO_SCALE = 400 / math.log(10)
+
+
+def make_openings(width: int, height: int, count: int, plies: int,
+                  seed: int = 0) -> list:
+    """
+    Tire au hasard des ouvertures distinctes de `plies` coups
+
+    :param int width: Board width
+    :param int height: Board height
+    :param int count: Number of openings (0 = only the initial position)
+    :param int plies: Moves of each opening
+    :param int seed: Seed
+    :return: list - Openings, lists of moves (ex: ['D3', 'C5'])
+    """
+    if count <= 0 or plies <= 0:
+        return [[]]
+
+    rand = random.Random(seed)
+    openings, seen = [], set()
+    attempts = 0
+    while len(openings) < count and attempts < count * 100:
+        attempts += 1
+        board = Board(width, height)
+        board.make_board()
+        player, moves = 'o', []
+        for _ in range(plies):
+            if not board.set_valid_poses(player):
+                break
+            pose = rand.choice(board.get_valid_poses())
+            board.move(pose, player, True)
+            moves.append(Board.notation(pose))
+            player = 'x' if player == 'o' else 'o'
+        if len(moves) == plies and tuple(moves) not in seen:
+            seen.add(tuple(moves))
+            openings.append(moves)
+    return openings
+
+
+def schedule(players: list, rounds: int, openings: list,
+             gauntlet: bool = False, seed: int = 0) -> list:
+    """
+    Prépare les parties du tournoi : pour chaque paire, `rounds` couples
+    de parties aux couleurs inversées, les ouvertures étant prises à tour
+    de rôle
+
+    :param list players: Player descriptions
+    :param int rounds: Pairs of games per pair of players
+    :param list openings: Openings (see `make_openings`)
+    :param bool gauntlet: Only the first player against the others
+    :param int seed: Seed of the first game
+    :return: list - Tasks for `run_match`
+    """
+    pairs = [(0, j) for j in range(1, len(players))] if gauntlet \
+        else [(i, j) for i in range(len(players))
+              for j in range(i + 1, len(players))]
+
+    tasks = []
+    for i, j in pairs:
+        for round_ in range(rounds):
+            opening = openings[round_ % len(openings)]
+            for x_spec, o_spec in ((players[i], players[j]),
+                                   (players[j], players[i])):
+                game = len(tasks)
+                tasks.append((game, x_spec, o_spec, opening,
+                              seed + 2 * game))
+    return tasks
+
+
+def run_match(task: tuple) -> dict:
+    """
+    Joue une partie du tournoi dans un processus du pool
+
+    :param tuple task: (game, x spec, o spec, opening, seed, width, height)
+    :return: dict - Game result (see `utils.selfplay.play_game`)
+    """
+    game, x_spec, o_spec, opening, seed, width, height = task
+    result = play_game(get_player(x_spec, seed), get_player(o_spec, seed + 1),
+                       width, height, opening=opening)
+    result.update({'game': game, 'size': [width, height], 'x': x_spec,
+                   'o': o_spec, 'opening': opening, 'seed': seed})
+    return result
+
+
+def run(tasks: list, width: int, height: int,
+        workers: Union[int, None] = None) -> Iterator[dict]:
+    """
+    Joue les parties et renvoie les résultats dans l'ordre où elles se
+    terminent
+
+    :param list tasks: Games (see `schedule`)
+    :param int width: Board width
+    :param int height: Board height
+    :param int workers: Number of processes (0 = in this process)
+    :return: Iterator[dict] - Game results
+    """
+    tasks = [task + (width, height) for task in tasks]
+    if workers == 0:
+        yield from map(run_match, tasks)
+        return
+
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # une partie par envoi : les durées varient beaucoup d'un joueur à
+        # l'autre et le coût d'un envoi est négligeable devant une partie
+        futures = [executor.submit(run_match, task) for task in tasks]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def elo_difference(score: float) -> float:
+    """
+    Ecart Elo correspondant à un score moyen
+
+    :param float score: Mean score, between 0 and 1
+    :return: float - Elo difference (infinite for 0 or 1)
+    """
+    if score <= 0:
+        return -math.inf
+    if score >= 1:
+        return math.inf
+    return -400 * math.log10(1 / score - 1)
+
+
+def pair_stats(wins: int, draws: int,
+               losses: int) -> Tuple[float, float]:
+    """
+    Ecart Elo d'un duel et demi-largeur de son intervalle de confiance à
+    95 % (variance calculée sur les victoires, nulles et défaites)
+
+    :return: tuple - (Elo difference, margin)
+    """
+    games = wins + draws + losses
+    if not games:
+        return 0.0, math.inf
+    score = (wins + draws / 2) / games
+    if score in (0, 1):
+        return elo_difference(score), math.inf
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2
+                + losses * score ** 2) / games
+    error = math.sqrt(variance / games)
+    low = elo_difference(score - Z_95 * error)
+    high = elo_difference(score + Z_95 * error)
+    return elo_difference(score), (high - low) / 2
+
+
+class Standings:
+    """Résultats d'un tournoi : duels, scores et classement Elo
+
+    Le classement est l'estimation du maximum de vraisemblance du modèle de
+    Bradley-Terry (une nulle vaut une demi-victoire), centré sur 0. Une
+    partie nulle fictive est ajoutée à chaque duel pour que les classements
+    restent finis quand un joueur gagne ou perd tout.
+    """
+    __slots__ = ('players', 'results', 'games', 'times', 'moves')
+
+    def __init__(self, players: list):
+        self.players: list = list(players)
+        # (joueur, adversaire) -> [victoires, nulles, défaites]
+        self.results: dict = {}
+        self.games: int = 0
+        # joueur -> temps de réflexion total et nombre de coups joués
+        self.times: dict = {player: 0.0 for player in players}
+        self.moves: dict = {player: 0 for player in players}
+
+    def add(self, result: dict) -> None:
+        """
+        Compte une partie
+
+        :param dict result: Game result (see `run_match`)
+        :return: None
+        """
+        skip = len(result.get('opening') or [])
+        for side in ('x', 'o'):
+            spec, adv = result[side], result['o' if side == 'x' else 'x']
+            stats = self.results.setdefault((spec, adv), [0, 0, 0])
+            if result['winner'] is None:
+                stats[1] += 1
+            else:
+                stats[0 if result['winner'] == side else 2] += 1
+
+        # coups des joueurs : le premier joueur est O, les coups alternent
+        for ply, spent in enumerate(result['times'][skip:], skip):
+            if result['moves'][ply] != 'pass':
+                spec = result['o' if ply % 2 == 0 else 'x']
+                self.times[spec] += spent
+                self.moves[spec] += 1
+        self.games += 1
+
+    def ratings(self, iterations: int = 1000) -> dict:
+        """
+        Calcule le classement Elo de chaque joueur et la demi-largeur de son
+        intervalle de confiance à 95 % (information de Fisher du modèle)
+
+        :param int iterations: Maximum number of iterations
+        :return: dict - Player -> (Elo, margin)
+        """
+        players = [player for player in self.players
+                   if any(pair[0] == player for pair in self.results)]
+        # victoires (nulles comptées pour moitié) et parties par duel, avec
+        # une nulle fictive par duel
+        points = {player: 0.0 for player in players}
+        games = {}
+        for (player, adv), (wins, draws, losses) in self.results.items():
+            points[player] += wins + draws / 2 + 0.5
+            games[player, adv] = wins + draws + losses + 1
+
+        strengths = {player: 1.0 for player in players}
+        for _ in range(iterations):
+            # algorithme MM de Hunter (2004)
+            new = {}
+            for player in players:
+                total = sum(count / (strengths[player] + strengths[adv])
+                            for (first, adv), count in games.items()
+                            if first == player)
+                new[player] = points[player] / total
+            mean = math.exp(sum(math.log(value) for value in new.values())
+                            / len(new))
+            new = {player: value / mean for player, value in new.items()}
+            change = max(abs(math.log(new[player] / strengths[player]))
+                         for player in players)
+            strengths = new
+            if change < 1e-9:
+                break
+
+        ratings = {}
+        for player in players:
+            information = 0.0
+            for (first, adv), count in games.items():
+                if first == player:
+                    expected = strengths[player] \
+                        / (strengths[player] + strengths[adv])
+                    information += count * expected * (1 - expected)
+            ratings[player] = (ELO_SCALE * math.log(strengths[player]),
+                               Z_95 * ELO_SCALE / math.sqrt(information))
+        return ratings
+
+    def report(self, elapsed: Union[float, None] = None) -> str:
+        """
+        Tableau du classement, puis des duels
+
+        :param float elapsed: Duration of the tournament (seconds)
+        :return: str
+        """
+        ratings = self.ratings()
+        width = max([len(player) for player in ratings] + [6])
+        lines = [f"{'Rank':<5}{'Player':<{width}} {'Elo':>6} {'+/-':>5} "
+                 f"{'Games':>6} {'Score':>6} {'ms/move':>8}"]
+        ranked = sorted(ratings, key=lambda player: -ratings[player][0])
+        for rank, player in enumerate(ranked, 1):
+            elo, margin = ratings[player]
+            wins = draws = losses = 0
+            for (first, _), stats in self.results.items():
+                if first == player:
+                    wins += stats[0]
+                    draws += stats[1]
+                    losses += stats[2]
+            games = wins + draws + losses
+            score = 100 * (wins + draws / 2) / games
+            per_move = 1000 * self.times[player] / max(self.moves[player], 1)
+            lines.append(f"{rank:<5}{player:<{width}} {elo:>6.0f} "
+                         f"{margin:>5.0f} {games:>6} {score:>5.1f}% "
+                         f"{per_move:>8.1f}")
+
+        lines.append('')
+        for i, player in enumerate(ranked):
+            for adv in ranked[i + 1:]:
+                stats = self.results.get((player, adv))
+                if stats is None:
+                    continue
+                elo, margin = pair_stats(*stats)
+                lines.append(f"{player} vs {adv}: +{stats[0]} ={stats[1]} "
+                             f"-{stats[2]}, Elo {elo:+.0f} +/- {margin:.0f}")
+
+        if elapsed is not None:
+            lines.append('')
+            lines.append(f"{self.games} games in {elapsed:.2f}s "
+                         f"({self.games / elapsed:.2f} games/s)")
+        return '\n'.join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Tournoi entre joueurs IA")
+    parser.add_argument('players', nargs='+', help="descriptions des "
+                        "joueurs (ex: random greedy alphabeta:time=0.05)")
+    parser.add_argument('-n', '--rounds', type=int, default=10,
+                        help="couples de parties par duel")
+    parser.add_argument('-s', '--size', type=int, default=8)
+    parser.add_argument('--gauntlet', action='store_true', help="le premier "
+                        "joueur contre chacun des autres")
+    parser.add_argument('--openings', type=int, default=10,
+                        help="nombre d'ouvertures tirées au hasard")
+    parser.add_argument('--opening-plies', type=int, default=4)
+    parser.add_argument('--output', help="fichier JSON lines des parties")
+    parser.add_argument('-w', '--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.size < 4 or args.size > 26 or args.size % 2:
+        parser.error("size must be even, between 4 and 26")
+    if len(set(args.players)) < 2 or len(set(args.players)) \
+            != len(args.players):
+        parser.error("at least two distinct players are required")
+
+    openings = make_openings(args.size, args.size, args.openings,
+                             args.opening_plies, args.seed)
+    tasks = schedule(args.players, args.rounds, openings, args.gauntlet,
+                     args.seed)
+    standings = Standings(args.players)
+    output = open(args.output, 'w') if args.output else None
+    start = time.perf_counter()
+    try:
+        for result in run(tasks, args.size, args.size, args.workers):
+            standings.add(result)
+            if output is not None:
+                output.write(json.dumps(result) + '\n')
+            print(f"\r{standings.games}/{len(tasks)} games", end='',
+                  file=sys.stderr, flush=True)
+    finally:
+        if output is not None:
+            output.close()
+    print(file=sys.stderr)
+
+    print(standings.report(time.perf_counter() - start))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+from array import array
+from typing import Union
+
+
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+NO_MOVE = -1
+
+# clé (Q) + score (i) + coup (h) + profondeur (b) + borne (b) + âge (B)
+ENTRY_SIZE = 8 + 4 + 2 + 1 + 1 + 1
+
+REPLACEMENT_POLICIES = ('depth', 'always')
+
+
+class TranspositionTable:
+    """Table de transposition de taille fixe, indexée par hash de Zobrist
+
+    Les entrées sont stockées dans des `array` pré-alloués : la mémoire
+    utilisée ne dépasse jamais `memory` octets, quelle que soit la durée
+    de l'analyse.
+
+    **Politiques de remplacement**:
+        - depth = garde l'entrée la plus profonde, sauf si elle date d'une
+          recherche précédente
+        - always = la nouvelle entrée remplace toujours l'ancienne
+    """
+    __slots__ = ('capacity', 'replacement', 'age', 'keys', 'scores',
+                 'moves', 'depths', 'bounds', 'ages', 'probes', 'hits',
+                 'stores')
+
+    def __init__(self, memory: int = 16 * 1024 * 1024,
+                 replacement: str = 'depth'):
+        if replacement not in REPLACEMENT_POLICIES:
+            raise ValueError(f"Unknown replacement policy: {replacement}")
+
+        self.capacity: int = max(1, memory // ENTRY_SIZE)
+        self.replacement: str = replacement
+        self.age: int = 0
+
+        self.keys = array('Q', bytes(8 * self.capacity))
+        self.scores = array('i', bytes(4 * self.capacity))
+        self.moves = array('h', [NO_MOVE]) * self.capacity
+        self.depths = array('b', [-1]) * self.capacity
+        self.bounds = array('b', bytes(self.capacity))
+        self.ages = array('B', bytes(self.capacity))
+
+        self.probes: int = 0
+        self.hits: int = 0
+        self.stores: int = 0
+
+    def new_search(self) -> None:
+        """
+        Signale une nouvelle recherche : les anciennes entrées deviennent
+        remplaçables
+
+        :return: None
+        """
+        self.age = (self.age + 1) & 0xFF
+
+    def probe(self, key: int) -> Union[tuple, None]:
+        """
+        Cherche une position dans la table
+
+        :param int key: 64 bits Zobrist hash
+        :return: tuple - (depth, bound, score, move) or None if not found
+        """
+        self.probes += 1
+        slot = key % self.capacity
+        if self.depths[slot] < 0 or self.keys[slot] != key:
+            return None
+        self.hits += 1
+        return (self.depths[slot], self.bounds[slot], self.scores[slot],
+                self.moves[slot])
+
+    def store(self, key: int, depth: int, bound: int, score: int,
+              move: int) -> None:
+        """
+        Enregistre le résultat d'une recherche selon la politique de
+        remplacement
+
+        :param int key: 64 bits Zobrist hash
+        :param int depth: Remaining depth of the search
+        :param int bound: EXACT, LOWER or UPPER
+        :param int score: Score found
+        :param int move: Best move (square index) or NO_MOVE
+        :return: None
+        """
+        slot = key % self.capacity
+        if self.replacement == 'depth' and self.keys[slot] != key \
+                and self.ages[slot] == self.age \
+                and self.depths[slot] > depth:
+            return
+
+        if move == NO_MOVE and self.keys[slot] == key:
+            move = self.moves[slot]  # garde le coup connu de la position
+
+        self.keys[slot] = key
+        self.depths[slot] = min(depth, 127)
+        self.bounds[slot] = bound
+        self.scores[slot] = score
+        self.moves[slot] = move
+        self.ages[slot] = self.age
+        self.stores += 1
+
+    def clear(self) -> None:
+        self.depths = array('b', [-1]) * self.capacity
+        self.probes = self.hits = self.stores = 0
+
+    @property
+    def memory(self) -> int:
+        return self.capacity * ENTRY_SIZE
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.probes if self.probes else 0.0
+
+    def __len__(self):
+        return sum(1 for depth in self.depths if depth >= 0)
+
+    def __repr__(self):
+        return "<utils.transposition.TranspositionTable capacity=%s " \
+               "replacement='%s'>" % (self.capacity, self.replacement)
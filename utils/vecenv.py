@@ -0,0 +1,161 @@
+from typing import Union
+
+from .board import Board
+from .vector import flips, legal_moves, np, to_bits
+
+
+class VecEnv:
+    """Lot de `count` parties de même taille jouées en parallèle avec NumPy
+
+    **Tableaux**:
+        - boards = pions (count, 2, height, width), index 0 = X, 1 = O
+        - player = joueur au trait de chaque partie (0 = X, 1 = O)
+        - done = parties terminées
+        - legal = coups possibles du joueur au trait (count, height, width)
+
+    Comme dans `Engine.render`, un joueur sans coup possible passe
+    automatiquement son tour ; la partie se termine quand aucun des deux ne
+    peut jouer.
+    """
+    __slots__ = ('count', 'width', 'height', 'first', 'boards', 'player',
+                 'done', 'legal', 'index')
+
+    def __init__(self, count: int, width: int, height: Union[int, None] = None,
+                 first: str = 'o'):
+        if np is None:
+            raise ImportError("VecEnv requires NumPy")
+
+        self.count: int = count
+        self.width: int = width
+        self.height: int = height if height is not None else width
+        self.first: int = Board.PLAYERS.index(first)
+
+        self.boards = np.zeros((count, 2, self.height, self.width), dtype=bool)
+        self.player = np.full(count, self.first, dtype=np.int8)
+        self.done = np.zeros(count, dtype=bool)
+        self.legal = np.zeros((count, self.height, self.width), dtype=bool)
+        self.index = np.arange(count)
+
+        self.reset()
+
+    def reset(self, envs=None):
+        """
+        Remet des parties (toutes par défaut) à la position de départ
+
+        :param envs: Indexes or boolean mask of the games to reset
+        :return: tuple - (boards, player)
+        """
+        envs = self.index if envs is None else self.index[envs]
+        middle_inf = self.width // 2 - 1
+        middle_sup = self.width // 2
+
+        self.boards[envs] = False
+        self.boards[envs, 0, middle_inf, middle_inf] = True
+        self.boards[envs, 0, middle_sup, middle_sup] = True
+        self.boards[envs, 1, middle_inf, middle_sup] = True
+        self.boards[envs, 1, middle_sup, middle_inf] = True
+        self.player[envs] = self.first
+        self.done[envs] = False
+
+        own, opp = self.sides(envs)
+        self.legal[envs] = legal_moves(own, opp)
+        return self.boards, self.player
+
+    def sides(self, envs=None) -> tuple:
+        """
+        Retourne les pions du joueur au trait et ceux de son adversaire
+
+        :param envs: Indexes of the games (all by default)
+        :return: tuple - (own, opp) arrays of shape (len(envs), height, width)
+        """
+        envs = self.index if envs is None else envs
+        player = self.player[envs]
+        return self.boards[envs, player], self.boards[envs, 1 - player]
+
+    def legal_moves(self):
+        """
+        Retourne les coups possibles du joueur au trait de chaque partie
+        (aucun pour les parties terminées)
+
+        :return: Boolean array (count, height, width)
+        """
+        return self.legal
+
+    def step(self, actions) -> tuple:
+        """
+        Joue un coup dans chaque partie en cours
+
+        :param actions: Square index (row * width + col) for each game,
+            ignored for finished games
+        :return: tuple - (boards, player, rewards, done) where the reward is
+            1 / -1 / 0 for the player who just moved when his game ends
+        """
+        actions = np.asarray(actions)
+        envs = self.index[~self.done]
+        rewards = np.zeros(self.count, dtype=np.int8)
+        if not len(envs):
+            return self.boards, self.player, rewards, self.done
+
+        rows, cols = np.divmod(actions[envs], self.width)
+        if not self.legal[envs, rows, cols].all():
+            raise ValueError("Illegal move in batch")
+
+        move = np.zeros((len(envs), self.height, self.width), dtype=bool)
+        move[np.arange(len(envs)), rows, cols] = True
+
+        player = self.player[envs]
+        own, opp = self.sides(envs)
+        flipped = flips(own, opp, move)
+        self.boards[envs, player] = own | flipped | move
+        self.boards[envs, 1 - player] = opp & ~flipped
+
+        # au tour de l'adversaire, qui passe s'il ne peut pas jouer
+        self.player[envs] = 1 - player
+        own, opp = self.sides(envs)
+        legal = legal_moves(own, opp)
+        blocked = ~legal.any(axis=(1, 2))
+        if blocked.any():
+            passing = envs[blocked]
+            self.player[passing] = player[blocked]
+            own, opp = self.sides(passing)
+            legal[blocked] = legal_moves(own, opp)
+
+            finished = blocked & ~legal.any(axis=(1, 2))
+            ended = envs[finished]
+            self.done[ended] = True
+            counts = self.boards[ended].sum(axis=(2, 3))
+            score = counts[:, 0] - counts[:, 1]
+            mover = player[finished]
+            rewards[ended] = np.sign(np.where(mover == 0, score, -score))
+
+        self.legal[envs] = legal
+        return self.boards, self.player, rewards, self.done
+
+    def counts(self):
+        """
+        Compte les pions de chaque joueur
+
+        :return: Int array (count, 2) - X's pawns at index 0, O's at index 1
+        """
+        return self.boards.sum(axis=(2, 3))
+
+    def score(self):
+        """
+        Différence de pions X - O de chaque partie
+
+        :return: Int array (count,)
+        """
+        counts = self.counts()
+        return counts[:, 0] - counts[:, 1]
+
+    def to_board(self, env: int) -> Board:
+        """
+        Convertit une partie du lot en `Board`
+
+        :param int env: Index of the game
+        :return: Board
+        """
+        board = Board(self.width, self.height)
+        board.load_bits(to_bits(self.boards[env, 0]),
+                        to_bits(self.boards[env, 1]))
+        return board
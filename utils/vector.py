@@ -0,0 +1,106 @@
+"""Génération des coups et retournements vectorisés avec NumPy (optionnel).
+
+Les plateaux sont des tableaux booléens de forme ``(..., height, width)`` :
+les mêmes fonctions traitent un plateau seul ou un lot de plateaux. Sans
+NumPy, `np` vaut None et `Board` reste sur les bitboards.
+"""
+from .bitboard import DIRECTIONS, Geometry
+
+try:
+    import numpy as np
+except ImportError:  # NumPy n'est pas indispensable
+    np = None
+
+
+def shift(array, d_row: int, d_col: int):
+    """
+    Décale les cases d'un tableau dans une direction, sans débordement
+
+    :param array: Boolean array (..., height, width)
+    :param int d_row: Row offset
+    :param int d_col: Column offset
+    :return: Shifted array
+    """
+    height, width = array.shape[-2:]
+    out = np.zeros_like(array)
+    out[..., max(0, d_row):height + min(0, d_row),
+        max(0, d_col):width + min(0, d_col)] = \
+        array[..., max(0, -d_row):height + min(0, -d_row),
+              max(0, -d_col):width + min(0, -d_col)]
+    return out
+
+
+def legal_moves(own, opp):
+    """
+    Calcule les coups légaux de `own` dans les 8 directions
+
+    :param own: Boolean array of the player to move (..., height, width)
+    :param opp: Boolean array of the opponent
+    :return: Boolean array of the legal moves
+    """
+    empty = ~(own | opp)
+    moves = np.zeros_like(own)
+    for d_row, d_col in DIRECTIONS:
+        run = shift(own, d_row, d_col) & opp
+        while run.any():
+            step = shift(run, d_row, d_col)
+            moves |= step & empty
+            run = step & opp
+    return moves
+
+
+def flips(own, opp, move):
+    """
+    Calcule les pions retournés par un coup (au plus un par plateau)
+
+    :param own: Boolean array of the player to move (..., height, width)
+    :param opp: Boolean array of the opponent
+    :param move: Boolean array with the placed pawn of each board (or none)
+    :return: Boolean array of the flipped pawns
+    """
+    flipped = np.zeros_like(own)
+    for d_row, d_col in DIRECTIONS:
+        line = np.zeros_like(own)
+        ray = shift(move, d_row, d_col) & opp
+        while ray.any():
+            line |= ray
+            step = shift(ray, d_row, d_col)
+            closed = (step & own).any(axis=(-2, -1), keepdims=True)
+            flipped |= line & closed
+            ray = step & opp
+    return flipped
+
+
+def to_array(geometry: Geometry, bits: int):
+    """
+    Convertit un bitboard en tableau booléen (height, width)
+
+    :param Geometry geometry: Board geometry
+    :param int bits: Bitboard
+    :return: Boolean array
+    """
+    data = np.frombuffer(bits.to_bytes((geometry.size + 7) // 8, 'little'),
+                         dtype=np.uint8)
+    return np.unpackbits(data, bitorder='little')[:geometry.size] \
+        .reshape(geometry.height, geometry.width).astype(bool)
+
+
+def to_bits(array) -> int:
+    """
+    Convertit un tableau booléen (height, width) en bitboard
+
+    :param array: Boolean array
+    :return: int - Bitboard
+    """
+    return int.from_bytes(np.packbits(array.ravel(), bitorder='little')
+                          .tobytes(), 'little')
+
+
+def legal_moves_bits(geometry: Geometry, own: int, opp: int) -> int:
+    """
+    Equivalent de `utils.bitboard.legal_moves` calculé avec NumPy
+
+    :return: int - Bitboard of the legal moves
+    """
+    return to_bits(legal_moves(to_array(geometry, own),
+                               to_array(geometry, opp)))
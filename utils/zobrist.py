@@ -0,0 +1,68 @@
+import random
+from typing import List
+
+from .bitboard import Geometry, iter_bits
+
+
+class ZobristKeys:
+    """Clés de Zobrist (64 bits) d'une taille de plateau
+
+    Les clés sont tirées d'un générateur initialisé avec la taille du
+    plateau : une même position a donc le même hash d'un processus à
+    l'autre (livre d'ouvertures, base de parties...).
+
+    **Clés**:
+        - squares[0][i] = pion X sur la case i
+        - squares[1][i] = pion O sur la case i
+        - flips[i] = retournement du pion de la case i
+        - side = c'est au joueur O de jouer
+    """
+    __slots__ = ('squares', 'flips', 'side')
+
+    def __init__(self, geometry: Geometry):
+        generator = random.Random(f"zobrist-{geometry.width}x{geometry.height}")
+
+        self.squares: List[List[int]] = [
+            [generator.getrandbits(64) for _ in range(geometry.size)]
+            for _ in range(2)
+        ]
+        self.flips: List[int] = [x ^ o for x, o in zip(*self.squares)]
+        self.side: int = generator.getrandbits(64)
+
+    def hash(self, x_bits: int, o_bits: int) -> int:
+        """
+        Calcule entièrement le hash d'une position (sans le trait)
+
+        :param int x_bits: Bitboard of X
+        :param int o_bits: Bitboard of O
+        :return: int - 64 bits hash
+        """
+        value = 0
+        for index in iter_bits(x_bits):
+            value ^= self.squares[0][index]
+        for index in iter_bits(o_bits):
+            value ^= self.squares[1][index]
+        return value
+
+    def flip_hash(self, flipped: int) -> int:
+        """
+        Retourne la valeur à combiner au hash pour retourner `flipped`
+
+        :param int flipped: Bitboard of the flipped pawns
+        :return: int
+        """
+        value = 0
+        keys = self.flips
+        for index in iter_bits(flipped):
+            value ^= keys[index]
+        return value
+
+
+_KEYS: dict = {}
+
+
+def get_keys(geometry: Geometry) -> ZobristKeys:
+    keys = _KEYS.get(geometry)
+    if keys is None:
+        keys = _KEYS[geometry] = ZobristKeys(geometry)
+    return keys